@@ -3,29 +3,50 @@ Analytics API Endpoints
 Handles dropout prediction and learning analytics
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from api.schemas import (
-    PredictDropoutRequest, DropoutPrediction, MLResponse
+    PredictDropoutRequest, DropoutPrediction, RecordInteractionsRequest, RecordDropoutOutcomesRequest,
+    MLResponse
 )
-from models.dropout_predictor import DropoutPredictor
+from models.registry import model_registry, UnknownModelError
+from models.feature_schema import DROPOUT_SCHEMA
 from training.data_preprocessing import DataPreprocessor
+from utils.micro_batcher import MicroBatcher
+from utils.inference_executor import inference_executor
+from utils.prediction_cache import prediction_cache
+from utils.interaction_log import interaction_log
+from utils.online_learning import online_dropout_learner
+from utils.json_response import FastJSONResponse, NDJSONStreamingResponse, ml_response, render_json
+from pydantic import ValidationError
+from typing import Optional
+import asyncio
 import logging
+import os
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
-# Initialize models
-dropout_model = DropoutPredictor()
+# Models are loaded lazily from the registry on first use
 preprocessor = DataPreprocessor()
 
-# Load model
-try:
-    dropout_model.load()
-    logger.info("Dropout predictor loaded")
-except Exception as e:
-    logger.warning(f"Could not load dropout predictor: {e}")
+# Records scored per model call by the streaming endpoint
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 1000))
+
+# Longest NDJSON record accepted by the streaming endpoint
+STREAM_MAX_LINE_BYTES = 1024 * 1024
+
+def _predict_dropout(X, feature_names, version):
+    """Score a feature matrix with the dropout predictor"""
+    return model_registry.get('dropout_predictor', version).predict_with_factors(X, list(feature_names))
+
+# Coalesce concurrent single-user predictions into one model call per
+# model version, executed off the event loop
+dropout_batcher = MicroBatcher(
+    lambda X, feature_names, version: inference_executor.run(_predict_dropout, X, feature_names, version),
+    name='dropout_predictor'
+)
 
 @router.post("/predict-dropout", response_model=MLResponse)
 async def predict_dropout(request: PredictDropoutRequest):
@@ -34,54 +55,31 @@ async def predict_dropout(request: PredictDropoutRequest):
     """
     try:
         logger.info(f"Predicting dropout risk for user {request.user_id}")
+        version = model_registry.resolve_version(request.model_version)
+        dropout_model = await model_registry.get_ready('dropout_predictor', version)
         
-        # Prepare data
-        engagement_data = [request.engagement_metrics]
-        
-        # Extract features
-        features = []
-        for record in engagement_data:
-            feature_dict = preprocessor.extract_dropout_features(record)
-            features.append(feature_dict)
-        
-        # Convert to array
-        X = np.array([list(features[0].values())])
-        feature_names = list(features[0].keys())
-        
-        # Predict dropout risk
-        if dropout_model.is_trained:
-            result = dropout_model.predict_with_factors(X, feature_names)[0]
+        # Predict dropout risk (rule-based until the model is ready)
+        if dropout_model is not None and dropout_model.is_trained:
+            # Extract features in the model's column layout
+            schema = dropout_model.feature_schema
+            X = await inference_executor.run(preprocessor.extract_features, schema, [_dropout_record(request)])
+            feature_names = schema.features
+            
+            row = X[0]
+            cache_key = prediction_cache.key(
+                'dropout_predictor', version, model_registry.generation('dropout_predictor', version),
+                row, feature_names
+            )
+            result = await prediction_cache.get_or_compute(
+                cache_key, lambda: dropout_batcher.submit(row, feature_names, version)
+            )
             method = "ml-model"
         else:
             # Fallback to rule-based
-            metrics = request.engagement_metrics
-            days_inactive = metrics.get('days_since_last_active', 0)
-            avg_score = metrics.get('avg_score', 0)
-            modules_completed = metrics.get('modules_completed', 0)
-            
-            risk = 0.3  # Base risk
-            if days_inactive > 7:
-                risk += 0.3
-            if avg_score < 50:
-                risk += 0.2
-            if modules_completed < 2:
-                risk += 0.2
-            
-            risk = min(risk, 0.95)
-            
-            result = {
-                'dropout_risk': risk,
-                'risk_level': 'high' if risk > 0.6 else 'medium' if risk > 0.3 else 'low',
-                'factors': [
-                    {'factor': 'days_since_last_active', 'contribution': days_inactive},
-                    {'factor': 'avg_score', 'contribution': avg_score},
-                    {'factor': 'modules_completed', 'contribution': modules_completed}
-                ],
-                'interventions': _generate_interventions(risk)
-            }
+            result = _rule_based_dropout(request.engagement_metrics)
             method = "rule-based-fallback"
         
-        prediction = DropoutPrediction(
+        prediction = DropoutPrediction.model_construct(
             dropout_risk=result['dropout_risk'],
             risk_level=result['risk_level'],
             factors=result['factors'],
@@ -89,17 +87,275 @@ async def predict_dropout(request: PredictDropoutRequest):
             confidence=0.75
         )
         
-        return MLResponse(
-            success=True,
-            data=prediction.dict(),
-            method=method,
-            confidence=0.75
-        )
+        return ml_response(prediction, method, 0.75)
         
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error predicting dropout: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/predict-dropout/stream")
+async def predict_dropout_stream(
+    request: Request,
+    chunk_size: int = Query(STREAM_CHUNK_SIZE, ge=1, le=10000),
+    model_version: Optional[str] = None
+):
+    """
+    Score an NDJSON stream of dropout prediction requests
+    
+    The request body holds one PredictDropoutRequest per line. Records are
+    parsed and scored chunk_size at a time, and one NDJSON result line per
+    record is streamed back as soon as its chunk is scored, so neither side
+    is buffered in full. Lines that fail validation produce an error line in
+    their place, so results come back in input order.
+    """
+    try:
+        version = model_registry.resolve_version(model_version)
+        dropout_model = await model_registry.get_ready('dropout_predictor', version)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    schema = dropout_model.feature_schema if dropout_model is not None and dropout_model.is_trained else None
+    logger.info(f"Streaming dropout predictions in chunks of {chunk_size} (model: {schema is not None})")
+    
+    return NDJSONStreamingResponse(_stream_dropout_predictions(request, version, schema, chunk_size))
+
+async def _stream_dropout_predictions(request: Request, version: str, schema, chunk_size: int):
+    """Parse NDJSON records from the request body and yield scored chunks (rule-based when schema is None)"""
+    # Parsed requests and error lines, in input order
+    pending = []
+    buffer = b''
+    skipping = False
+    line_number = 0
+    total = 0
+    
+    def parse(line):
+        line = line.strip()
+        if not line:
+            return
+        if len(line) > STREAM_MAX_LINE_BYTES:
+            pending.append({'line': line_number, 'error': f"Record exceeds {STREAM_MAX_LINE_BYTES} bytes"})
+            return
+        try:
+            pending.append(PredictDropoutRequest.model_validate_json(line))
+        except ValidationError as e:
+            pending.append({'line': line_number, 'error': str(e)})
+    
+    async def flush():
+        nonlocal pending, total
+        chunk, pending = pending, []
+        records = [item for item in chunk if isinstance(item, PredictDropoutRequest)]
+        total += len(records)
+        scored = iter(await inference_executor.run(_score_dropout_chunk, records, version, schema) if records else [])
+        return b''.join(
+            next(scored) if isinstance(item, PredictDropoutRequest) else render_json(item) + b'\n'
+            for item in chunk
+        )
+    
+    async for data in request.stream():
+        if skipping:
+            # Drop the rest of an oversized record
+            if b'\n' not in data:
+                continue
+            data = data.split(b'\n', 1)[1]
+            skipping = False
+        
+        *lines, buffer = (buffer + data).split(b'\n')
+        for line in lines:
+            line_number += 1
+            parse(line)
+            if len(pending) >= chunk_size:
+                yield await flush()
+        
+        if len(buffer) > STREAM_MAX_LINE_BYTES:
+            line_number += 1
+            pending.append({'line': line_number, 'error': f"Record exceeds {STREAM_MAX_LINE_BYTES} bytes"})
+            buffer = b''
+            skipping = True
+    
+    if buffer and not skipping:
+        line_number += 1
+        parse(buffer)
+    if pending:
+        yield await flush()
+    
+    logger.info(f"Streamed dropout predictions for {total} records")
+
+def _score_dropout_chunk(records: list, version: str, schema) -> list:
+    """Score a chunk of dropout requests and render one NDJSON line per request (rule-based when schema is None)"""
+    if schema is not None:
+        try:
+            X = preprocessor.extract_features(schema, [_dropout_record(r) for r in records])
+            results = model_registry.get('dropout_predictor', version).predict_with_factors(X, list(schema.features))
+            method = "ml-model"
+        except Exception as e:
+            logger.error(f"Error scoring dropout chunk: {e}", exc_info=True)
+            return [render_json({'user_id': r.user_id, 'error': str(e)}) + b'\n' for r in records]
+    else:
+        results = [_rule_based_dropout(r.engagement_metrics) for r in records]
+        method = "rule-based-fallback"
+    
+    return [
+        render_json({'user_id': r.user_id, **result, 'method': method}) + b'\n'
+        for r, result in zip(records, results)
+    ]
+
+def _dropout_record(request: PredictDropoutRequest) -> dict:
+    """Build the raw dropout record consumed by the preprocessor"""
+    return {
+        'engagement_metrics': request.engagement_metrics,
+        'performance_history': request.performance_history
+    }
+
+def _rule_based_dropout(metrics: dict) -> dict:
+    """Rule-based dropout estimate used when the predictor is unavailable"""
+    days_inactive = metrics.get('days_since_last_active', 0)
+    avg_score = metrics.get('avg_score', 0)
+    modules_completed = metrics.get('modules_completed', 0)
+    
+    risk = 0.3  # Base risk
+    if days_inactive > 7:
+        risk += 0.3
+    if avg_score < 50:
+        risk += 0.2
+    if modules_completed < 2:
+        risk += 0.2
+    
+    risk = min(risk, 0.95)
+    
+    return {
+        'dropout_risk': risk,
+        'risk_level': 'high' if risk > 0.6 else 'medium' if risk > 0.3 else 'low',
+        'factors': [
+            {'factor': 'days_since_last_active', 'contribution': days_inactive},
+            {'factor': 'avg_score', 'contribution': avg_score},
+            {'factor': 'modules_completed', 'contribution': modules_completed}
+        ],
+        'interventions': _generate_interventions(risk)
+    }
+
+@router.post("/interactions", response_model=MLResponse)
+async def record_interactions(request: RecordInteractionsRequest):
+    """
+    Record a batch of interaction events
+    
+    Events of any number of learners are appended to the interaction log in
+    one write and folded into each learner's running aggregates, which the
+    learning style and dropout models read instead of a full interaction
+    history.
+    """
+    try:
+        events = [event.model_dump() for event in request.events]
+        count = await asyncio.to_thread(interaction_log.append, events)
+        
+        return ml_response(
+            {'events': count, 'learners': len({event['user_id'] for event in events})},
+            "interaction-log"
+        )
+        
+    except Exception as e:
+        logger.error(f"Error recording interactions: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/predict-dropout/{user_id}", response_model=MLResponse)
+async def predict_dropout_from_interactions(user_id: str, model_version: Optional[str] = None):
+    """
+    Predict dropout risk from a learner's logged interactions
+    
+    Features are read from the learner's running aggregates as of now.
+    """
+    try:
+        aggregates = interaction_log.get_aggregates(user_id)
+        if aggregates is None:
+            raise HTTPException(status_code=404, detail=f"No interactions recorded for user {user_id}")
+        
+        version = model_registry.resolve_version(model_version)
+        dropout_model = await model_registry.get_ready('dropout_predictor', version)
+        
+        if dropout_model is not None and dropout_model.is_trained:
+            schema = dropout_model.feature_schema
+            row = interaction_log.features([user_id], schema)[0]
+            feature_names = schema.features
+            cache_key = prediction_cache.key(
+                'dropout_predictor', version, model_registry.generation('dropout_predictor', version),
+                row, feature_names
+            )
+            result = await prediction_cache.get_or_compute(
+                cache_key, lambda: dropout_batcher.submit(row, feature_names, version)
+            )
+            method = "ml-model"
+        else:
+            row = interaction_log.features([user_id], DROPOUT_SCHEMA)[0]
+            result = _rule_based_dropout(dict(zip(DROPOUT_SCHEMA.features, row.tolist())))
+            method = "rule-based-fallback"
+        
+        return ml_response({
+            'dropout_risk': result['dropout_risk'],
+            'risk_level': result['risk_level'],
+            'factors': result['factors'],
+            'interventions': result['interventions'],
+            'confidence': 0.75,
+            'aggregates': aggregates
+        }, method, 0.75)
+        
+    except HTTPException:
+        raise
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error predicting dropout from interactions: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/dropout-outcomes", response_model=MLResponse)
+async def record_dropout_outcomes(request: RecordDropoutOutcomesRequest):
+    """
+    Record observed dropout outcomes to update the dropout predictor online
+    
+    Outcomes are featurized from the engagement metrics sent with them, or
+    else from the learner's recorded interactions; learners with neither
+    are skipped. The live model is updated once enough outcomes are pending
+    (see OnlineDropoutLearner).
+    """
+    try:
+        version = model_registry.resolve_version(request.model_version)
+        dropout_model = await model_registry.get_ready('dropout_predictor', version)
+        if dropout_model is None or not dropout_model.is_trained:
+            raise HTTPException(status_code=503, detail="Dropout predictor is not ready for online updates")
+        schema = dropout_model.feature_schema
+        
+        with_metrics = [o for o in request.outcomes if o.engagement_metrics is not None]
+        logged = [o for o in request.outcomes if o.engagement_metrics is None and o.user_id in interaction_log]
+        skipped = [o.user_id for o in request.outcomes if o.engagement_metrics is None and o.user_id not in interaction_log]
+        
+        features = []
+        if with_metrics:
+            features.append(await inference_executor.run(
+                preprocessor.extract_features, schema, [_dropout_record(o) for o in with_metrics]
+            ))
+        if logged:
+            features.append(interaction_log.features([o.user_id for o in logged], schema))
+        
+        pending = 0
+        if features:
+            labels = [int(o.dropped_out) for o in with_metrics + logged]
+            pending = await asyncio.to_thread(online_dropout_learner.add, np.concatenate(features), labels, version)
+        
+        return ml_response({
+            'accepted': len(with_metrics) + len(logged),
+            'skipped': skipped,
+            'pending': pending,
+            'updates': online_dropout_learner.updates
+        }, "online-sgd")
+        
+    except HTTPException:
+        raise
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error recording dropout outcomes: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/user-analytics/{user_id}")
 async def get_user_analytics(user_id: str):
     """
@@ -121,11 +377,7 @@ async def get_user_analytics(user_id: str):
             'dropout_risk': 0.3
         }
         
-        return MLResponse(
-            success=True,
-            data=analytics,
-            method="database-query"
-        )
+        return ml_response(analytics, "database-query")
         
     except Exception as e:
         logger.error(f"Error getting user analytics: {e}", exc_info=True)
@@ -5,35 +5,49 @@ Handles competency assessment and learning style detection
 
 from fastapi import APIRouter, HTTPException, Depends, Header
 from api.schemas import (
-    AssessCompetencyRequest, CompetencyResult, MLResponse
+    AssessCompetencyRequest, BatchAssessCompetencyRequest, RecordResponsesRequest, MLResponse
 )
-from models.assessment_classifier import AssessmentClassifier
-from models.learning_style_detector import LearningStyleDetector
+from models.registry import model_registry, UnknownModelError
 from training.data_preprocessing import DataPreprocessor
+from utils.micro_batcher import MicroBatcher
+from utils.inference_executor import inference_executor
+from utils.prediction_cache import prediction_cache
+from utils.feature_store import feature_store
+from utils.interaction_log import interaction_log
+from utils.json_response import JSONFragment, FastJSONResponse, ml_response
+from typing import Optional
 import logging
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
-# Initialize models (will be loaded on startup)
-assessment_model = AssessmentClassifier()
-learning_style_model = LearningStyleDetector()
+# Models are loaded lazily from the registry on first use
 preprocessor = DataPreprocessor()
 
-# Load models
-try:
-    assessment_model.load()
-    logger.info("Assessment classifier loaded")
-except Exception as e:
-    logger.warning(f"Could not load assessment classifier: {e}")
+def _predict_competency(X, version):
+    """Score a feature matrix with the assessment classifier"""
+    return model_registry.get('assessment_classifier', version).predict_with_confidence(X)
 
-try:
-    learning_style_model.load()
-    logger.info("Learning style detector loaded")
-except Exception as e:
-    logger.warning(f"Could not load learning style detector: {e}")
+def _predict_learning_styles(X, version):
+    """Score a feature matrix with the learning style detector"""
+    return model_registry.get('learning_style_detector', version).predict_style(X)
+
+# Coalesce concurrent single-user predictions into one model call per
+# model version, executed off the event loop
+assessment_batcher = MicroBatcher(
+    lambda X, version: inference_executor.run(_predict_competency, X, version),
+    name='assessment_classifier'
+)
+learning_style_batcher = MicroBatcher(
+    lambda X, version: inference_executor.run(_predict_learning_styles, X, version),
+    name='learning_style_detector'
+)
+
+def _cache_key(name, version, row, *args):
+    """Prediction cache key for a feature row scored by the current model copy"""
+    return prediction_cache.key(name, version, model_registry.generation(name, version), row, *args)
 
 @router.post("/assess-competency", response_model=MLResponse)
 async def assess_competency(request: AssessCompetencyRequest):
@@ -44,107 +58,314 @@ async def assess_competency(request: AssessCompetencyRequest):
     """
     try:
         logger.info(f"Assessing competency for user {request.user_id}")
+        version = model_registry.resolve_version(request.model_version)
+        assessment_model = await model_registry.get_ready('assessment_classifier', version)
         
-        # Prepare data
-        assessment_data = [{
-            'responses': request.responses,
-            'timings': request.timings,
-            'confidence': request.confidence or [0.5] * len(request.responses)
-        }]
-        
-        # Extract features
-        features = []
-        for record in assessment_data:
-            feature_dict = preprocessor.extract_assessment_features(record)
-            features.append(feature_dict)
-        
-        # Convert to array
-        X = np.array([list(features[0].values())])
-        
-        # Predict competency
-        if assessment_model.is_trained:
-            result = assessment_model.predict_with_confidence(X)[0]
+        # Predict competency (rule-based until the model is ready)
+        if assessment_model is not None and assessment_model.is_trained:
+            # Extract features in the model's column layout
+            X = await inference_executor.run(
+                preprocessor.extract_features, assessment_model.feature_schema, [_assessment_record(request)]
+            )
+            result = await prediction_cache.get_or_compute(
+                _cache_key('assessment_classifier', version, X[0]),
+                lambda: assessment_batcher.submit(X[0], version)
+            )
             method = "ml-model"
         else:
             # Fallback to rule-based
-            correct_count = sum(1 for r in request.responses if r.get('correct', False))
-            accuracy = correct_count / len(request.responses)
-            
-            if accuracy >= 0.9:
-                level = 4
-            elif accuracy >= 0.7:
-                level = 3
-            elif accuracy >= 0.5:
-                level = 2
-            else:
-                level = 1
-            
-            result = {
-                'competency_level': level,
-                'confidence': 0.7,
-                'probabilities': {
-                    'beginner': 0.25,
-                    'intermediate': 0.25,
-                    'advanced': 0.25,
-                    'expert': 0.25
-                }
-            }
+            result = _rule_based_competency(request.responses)
             method = "rule-based-fallback"
         
         # Detect learning style
-        learning_style = None
-        if learning_style_model.is_trained:
-            try:
-                style_data = [{
-                    'timings': request.timings,
-                    'interactions': []  # Would come from user history
-                }]
-                style_features = []
-                for record in style_data:
-                    feature_dict = preprocessor.extract_learning_style_features(record)
-                    style_features.append(feature_dict)
-                
-                X_style = np.array([list(style_features[0].values())])
-                style_result = learning_style_model.predict_style(X_style)[0]
-                learning_style = style_result['learning_style']
-            except Exception as e:
-                logger.warning(f"Could not detect learning style: {e}")
+        learning_style = await _detect_learning_style(request, version)
         
         # Prepare response
-        competency_result = CompetencyResult(
-            competency_level=result['competency_level'],
-            confidence=result['confidence'],
-            probabilities=result['probabilities'],
-            learning_style=learning_style,
-            recommendations=_generate_recommendations(result['competency_level'])
+        return ml_response(_competency_result(result, learning_style), method, result['confidence'])
+        
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error assessing competency: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/assess-competency/batch", response_model=MLResponse)
+async def assess_competency_batch(request: BatchAssessCompetencyRequest):
+    """
+    Assess competency for many users in a single call
+    
+    Features for every request are stacked into one matrix so the classifier
+    runs a single predict_proba per model version. Results are returned in
+    request order.
+    """
+    try:
+        requests = request.requests
+        logger.info(f"Assessing competency for batch of {len(requests)} users")
+        
+        # Group requests by model version, keeping their positions
+        groups = {}
+        for i, r in enumerate(requests):
+            version = model_registry.resolve_version(r.model_version or request.model_version)
+            groups.setdefault(version, []).append(i)
+        
+        results = [None] * len(requests)
+        learning_styles = [None] * len(requests)
+        methods = set()
+        for version, indices in groups.items():
+            assessment_model = await model_registry.get_ready('assessment_classifier', version)
+            learning_style_model = await model_registry.get_ready('learning_style_detector', version)
+            style_schema = learning_style_model.feature_schema if learning_style_model is not None and learning_style_model.is_trained else None
+            group = [requests[i] for i in indices]
+            group_results, group_styles, method = await inference_executor.run(
+                _score_competency_batch, group, version,
+                assessment_model.feature_schema if assessment_model is not None and assessment_model.is_trained else None,
+                style_schema, _logged_learning_style_features(group, style_schema)
+            )
+            for i, result, learning_style in zip(indices, group_results, group_styles):
+                results[i] = result
+                learning_styles[i] = learning_style
+            methods.add(method)
+        
+        data = []
+        for r, result, learning_style in zip(requests, results, learning_styles):
+            item = _competency_result(result, learning_style)
+            item['user_id'] = r.user_id
+            data.append(item)
+        
+        return ml_response(
+            {'results': data, 'count': len(data)},
+            methods.pop() if len(methods) == 1 else "mixed",
+            float(np.mean([result['confidence'] for result in results]))
         )
         
-        return MLResponse(
-            success=True,
-            data=competency_result.dict(),
-            method=method,
-            confidence=result['confidence']
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error assessing competency batch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/responses", response_model=MLResponse)
+async def record_responses(request: RecordResponsesRequest):
+    """
+    Record new assessment responses for a learner
+    
+    Only the new responses are sent; they are folded into the learner's
+    running aggregates, which GET /competency/{user_id} scores without
+    reprocessing the learner's history.
+    """
+    try:
+        feature_store.update(request.user_id, {
+            'responses': request.responses,
+            'timings': request.timings,
+            'confidence': request.confidence
+        }, request.timestamp)
+        
+        return ml_response(
+            {'user_id': request.user_id, **feature_store.get_aggregates(request.user_id)},
+            "feature-store"
         )
         
     except Exception as e:
-        logger.error(f"Error assessing competency: {e}", exc_info=True)
+        logger.error(f"Error recording responses: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/competency/{user_id}", response_model=MLResponse)
+async def get_competency(user_id: str, model_version: Optional[str] = None):
+    """
+    Assess a learner's competency from their recorded responses
+    
+    Features are read from the learner's running aggregates in constant
+    time, whatever the length of their history.
+    """
+    try:
+        aggregates = feature_store.get_aggregates(user_id)
+        if aggregates is None:
+            raise HTTPException(status_code=404, detail=f"No responses recorded for user {user_id}")
+        
+        version = model_registry.resolve_version(model_version)
+        assessment_model = await model_registry.get_ready('assessment_classifier', version)
+        
+        if assessment_model is not None and assessment_model.is_trained:
+            X = feature_store.features([user_id], assessment_model.feature_schema)
+            result = await prediction_cache.get_or_compute(
+                _cache_key('assessment_classifier', version, X[0]),
+                lambda: assessment_batcher.submit(X[0], version)
+            )
+            method = "ml-model"
+        else:
+            accuracy = aggregates['correct'] / aggregates['responses'] if aggregates['responses'] else 0.0
+            result = _rule_based_level(accuracy)
+            method = "rule-based-fallback"
+        
+        data = _competency_result(result, None)
+        data['aggregates'] = aggregates
+        return ml_response(data, method, result['confidence'])
+        
+    except HTTPException:
+        raise
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error assessing competency from aggregates: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _score_competency_batch(requests: list, version: str, assessment_schema, style_schema, logged_styles=None):
+    """
+    Extract features and score a batch of requests with one model call each
+    
+    Models whose schema is None are not ready and are skipped. logged_styles
+    holds the learning style features read from the interaction log.
+    """
+    if assessment_schema is not None:
+        X = preprocessor.extract_features(assessment_schema, [_assessment_record(r) for r in requests])
+        results = model_registry.get('assessment_classifier', version).predict_with_confidence(X)
+        method = "ml-model"
+    else:
+        results = [_rule_based_competency(r.responses) for r in requests]
+        method = "rule-based-fallback"
+    
+    if style_schema is not None:
+        learning_styles = _detect_learning_styles(requests, version, style_schema, logged_styles)
+    else:
+        learning_styles = [None] * len(requests)
+    
+    return results, learning_styles, method
+
+def _assessment_record(request: AssessCompetencyRequest) -> dict:
+    """Build the raw assessment record consumed by the preprocessor"""
+    return {
+        'responses': request.responses,
+        'timings': request.timings,
+        'confidence': request.confidence or [0.5] * len(request.responses)
+    }
+
+def _rule_based_competency(responses: list) -> dict:
+    """Rule-based competency estimate used when the classifier is unavailable"""
+    correct_count = sum(1 for r in responses if r.get('correct', False))
+    return _rule_based_level(correct_count / len(responses) if responses else 0.0)
+
+def _rule_based_level(accuracy: float) -> dict:
+    """Rule-based competency estimate from an accuracy"""
+    if accuracy >= 0.9:
+        level = 4
+    elif accuracy >= 0.7:
+        level = 3
+    elif accuracy >= 0.5:
+        level = 2
+    else:
+        level = 1
+    
+    return {
+        'competency_level': level,
+        'confidence': 0.7,
+        'probabilities': {
+            'beginner': 0.25,
+            'intermediate': 0.25,
+            'advanced': 0.25,
+            'expert': 0.25
+        }
+    }
+
+async def _detect_learning_style(request: AssessCompetencyRequest, version: str):
+    """Detect the learning style for a single request through the micro-batcher"""
+    try:
+        learning_style_model = await model_registry.get_ready('learning_style_detector', version)
+        if learning_style_model is None or not learning_style_model.is_trained:
+            return None
+        
+        schema = learning_style_model.feature_schema
+        if request.user_id in interaction_log:
+            X_style = interaction_log.features([request.user_id], schema)
+        else:
+            X_style = await inference_executor.run(
+                preprocessor.extract_features, schema, [{'timings': request.timings, 'interactions': []}]
+            )
+        row = X_style[0]
+        style_result = await prediction_cache.get_or_compute(
+            _cache_key('learning_style_detector', version, row),
+            lambda: learning_style_batcher.submit(row, version)
+        )
+        return style_result['learning_style']
+    except Exception as e:
+        logger.warning(f"Could not detect learning style: {e}")
+        return None
+
+def _detect_learning_styles(requests: list, version: str, schema, logged=None) -> list:
+    """
+    Detect learning styles for a list of requests in one model call
+    
+    logged is the (positions, features) pair of _logged_learning_style_features.
+    """
+    try:
+        learning_style_model = model_registry.get('learning_style_detector', version)
+        if not learning_style_model.is_trained:
+            return [None] * len(requests)
+        
+        X_style = preprocessor.extract_features(schema, [{'timings': r.timings, 'interactions': []} for r in requests])
+        if logged is not None:
+            positions, features = logged
+            X_style[positions] = features
+        return [style['learning_style'] for style in learning_style_model.predict_style(X_style)]
+    except Exception as e:
+        logger.warning(f"Could not detect learning style: {e}")
+        return [None] * len(requests)
+
+def _logged_learning_style_features(requests: list, schema):
+    """
+    Learning style features of the learners with logged interactions
+    
+    Read here rather than in an inference worker, since the interaction log
+    lives in the service process.
+    
+    Returns:
+        (positions, features) of those learners, or None
+    """
+    positions = [i for i, r in enumerate(requests) if r.user_id in interaction_log]
+    if schema is None or not positions:
+        return None
+    return positions, interaction_log.features([requests[i].user_id for i in positions], schema)
+
+def _competency_result(result: dict, learning_style) -> dict:
+    """
+    Build the competency result returned to clients
+    
+    Same fields as CompetencyResult, with the pre-serialized recommendations
+    for the predicted level spliced in.
+    """
+    level = result['competency_level']
+    return {
+        'competency_level': level,
+        'confidence': result['confidence'],
+        'probabilities': result['probabilities'],
+        'learning_style': learning_style,
+        'recommendations': COMPETENCY_RECOMMENDATIONS.get(level, COMPETENCY_RECOMMENDATIONS[1])
+    }
+
 @router.post("/detect-learning-style")
-async def detect_learning_style(user_id: str, interaction_data: dict):
+async def detect_learning_style(user_id: str, interaction_data: dict, model_version: Optional[str] = None):
     """
     Detect user learning style based on interaction patterns
+    
+    With empty interaction_data, the learner's logged interactions are used.
     """
     try:
         logger.info(f"Detecting learning style for user {user_id}")
+        version = model_registry.resolve_version(model_version)
+        learning_style_model = await model_registry.get_ready('learning_style_detector', version)
         
-        # Extract features
-        features = preprocessor.extract_learning_style_features(interaction_data)
-        X = np.array([list(features.values())])
-        
-        # Predict style
-        if learning_style_model.is_trained:
-            result = learning_style_model.predict_style(X)[0]
+        # Predict style (fallback until the model is ready)
+        if learning_style_model is not None and learning_style_model.is_trained:
+            # Extract features in the model's column layout
+            if not interaction_data and user_id in interaction_log:
+                X = interaction_log.features([user_id], learning_style_model.feature_schema)
+            else:
+                X = await inference_executor.run(
+                    preprocessor.extract_features, learning_style_model.feature_schema, [interaction_data]
+                )
+            result = await prediction_cache.get_or_compute(
+                _cache_key('learning_style_detector', version, X[0]),
+                lambda: learning_style_batcher.submit(X[0], version)
+            )
             method = "ml-model"
         else:
             # Fallback
@@ -155,13 +376,10 @@ async def detect_learning_style(user_id: str, interaction_data: dict):
             }
             method = "fallback"
         
-        return MLResponse(
-            success=True,
-            data=result,
-            method=method,
-            confidence=result.get('confidence', 0.5)
-        )
+        return ml_response(result, method, result.get('confidence', 0.5))
         
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error detecting learning style: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -196,3 +414,9 @@ def _generate_recommendations(competency_level: int) -> list:
     }
     
     return recommendations.get(competency_level, recommendations[1])
+
+# Recommendations only depend on the competency level, so they are
+# serialized once instead of on every request
+COMPETENCY_RECOMMENDATIONS = {
+    level: JSONFragment(_generate_recommendations(level)) for level in (1, 2, 3, 4)
+}
@@ -5,15 +5,32 @@ Handles content recommendations and learning path generation
 
 from fastapi import APIRouter, HTTPException
 from api.schemas import (
-    RecommendContentRequest, RecommendationResponse,
+    RecommendContentRequest,
     GenerateLearningPathRequest, LearningPathResponse,
     ContentRecommendation, LearningPathModule, MLResponse
 )
+from models.registry import model_registry, UnknownModelError
+from training.data_preprocessing import DataPreprocessor
+from utils.inference_executor import inference_executor
+from utils.prediction_cache import prediction_cache
+from utils.json_response import JSONFragment, FastJSONResponse, ml_response
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
+
+preprocessor = DataPreprocessor()
+
+def _predict_competency(X, version):
+    """Score a feature matrix with the assessment classifier"""
+    return model_registry.get('assessment_classifier', version).predict_with_confidence(X)
+
+async def _predict_competency_row(row, version):
+    """Score a single feature row off the event loop"""
+    results = await inference_executor.run(_predict_competency, np.array([row]), version)
+    return results[0]
 
 @router.post("/recommend-content", response_model=MLResponse)
 async def recommend_content(request: RecommendContentRequest):
@@ -22,6 +39,8 @@ async def recommend_content(request: RecommendContentRequest):
     """
     try:
         logger.info(f"Generating ML-powered recommendations for user {request.user_id}")
+        version = model_registry.resolve_version(request.model_version)
+        recommendation_model = await model_registry.get_ready('assessment_classifier', version)
 
         # Extract performance metrics
         performance = request.performance
@@ -35,24 +54,31 @@ async def recommend_content(request: RecommendContentRequest):
             'confidence': [0.8] * max(1, modules_completed)
         }
 
-        # Extract features using ML preprocessor
-        features = preprocessor.extract_assessment_features(assessment_data)
-        X = np.array([list(features.values())])
-
         # Use ML model for intelligent recommendations
-        recommendations = []
+        recommendations = None
         method = "rule-based-fallback"
         confidence = 0.75
 
-        if recommendation_model.is_trained:
+        if recommendation_model is not None and recommendation_model.is_trained:
             try:
+                # Extract features in the model's column layout
+                X = await inference_executor.run(
+                    preprocessor.extract_features, recommendation_model.feature_schema, [assessment_data]
+                )
+
                 # Get competency prediction from ML model
-                competency_results = recommendation_model.predict_with_confidence(X)
-                predicted_level = competency_results[0]['competency_level']
-                model_confidence = competency_results[0]['confidence']
+                cache_key = prediction_cache.key(
+                    'assessment_classifier', version,
+                    model_registry.generation('assessment_classifier', version), X[0]
+                )
+                competency_result = await prediction_cache.get_or_compute(
+                    cache_key, lambda: _predict_competency_row(X[0], version)
+                )
+                predicted_level = competency_result['competency_level']
+                model_confidence = competency_result['confidence']
 
                 # Generate recommendations based on ML-predicted competency
-                recommendations = _generate_ml_recommendations(predicted_level, avg_score)
+                recommendations = ML_RECOMMENDATIONS.get(predicted_level, ML_RECOMMENDATIONS[4])
                 method = "ml-model"
                 confidence = model_confidence
 
@@ -60,29 +86,30 @@ async def recommend_content(request: RecommendContentRequest):
 
             except Exception as e:
                 logger.warning(f"ML recommendation failed, falling back to rule-based: {e}")
-                recommendations = _generate_rule_based_recommendations(avg_score)
+                recommendations = RULE_BASED_RECOMMENDATIONS[_score_band(avg_score)]
         else:
             # Fallback to rule-based
-            recommendations = _generate_rule_based_recommendations(avg_score)
-
-        response = RecommendationResponse(
-            recommendations=recommendations,
-            reasoning=f"ML-powered recommendations based on predicted competency level and performance metrics",
-            confidence=confidence
-        )
+            recommendations = RULE_BASED_RECOMMENDATIONS[_score_band(avg_score)]
 
-        return MLResponse(
-            success=True,
-            data=response.dict(),
-            method=method,
-            confidence=confidence
+        # Splice the pre-serialized recommendations into the response body
+        # (same shape as MLResponse wrapping a RecommendationResponse)
+        return ml_response(
+            {
+                'recommendations': recommendations,
+                'reasoning': "ML-powered recommendations based on predicted competency level and performance metrics",
+                'confidence': confidence
+            },
+            method,
+            confidence
         )
         
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating recommendations: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-def _generate_ml_recommendations(competency_level: int, avg_score: float):
+def _generate_ml_recommendations(competency_level: int):
     """Generate recommendations based on ML-predicted competency level"""
     recommendations = []
 
@@ -165,11 +192,19 @@ def _generate_ml_recommendations(competency_level: int, avg_score: float):
 
     return recommendations
 
-def _generate_rule_based_recommendations(avg_score: float):
+def _score_band(avg_score: float) -> str:
+    """Score band used to pick rule-based recommendations"""
+    if avg_score < 60:
+        return 'low'
+    if avg_score < 80:
+        return 'medium'
+    return 'high'
+
+def _generate_rule_based_recommendations(score_band: str):
     """Fallback rule-based recommendations"""
     recommendations = []
 
-    if avg_score < 60:
+    if score_band == 'low':
         recommendations.extend([
             ContentRecommendation(
                 module_id="bd_001",
@@ -188,7 +223,7 @@ def _generate_rule_based_recommendations(avg_score: float):
                 reasoning="Essential skills for digital literacy"
             )
         ])
-    elif avg_score < 80:
+    elif score_band == 'medium':
         recommendations.extend([
             ContentRecommendation(
                 module_id="ba_001",
@@ -229,6 +264,15 @@ def _generate_rule_based_recommendations(avg_score: float):
 
     return recommendations
 
+# Recommendations only depend on the predicted level or the score band, so
+# they are built and serialized once instead of on every request
+ML_RECOMMENDATIONS = {
+    level: JSONFragment(_generate_ml_recommendations(level)) for level in (1, 2, 3, 4)
+}
+RULE_BASED_RECOMMENDATIONS = {
+    band: JSONFragment(_generate_rule_based_recommendations(band)) for band in ('low', 'medium', 'high')
+}
+
 @router.post("/generate-learning-path", response_model=MLResponse)
 async def generate_learning_path(request: GenerateLearningPathRequest):
     """
@@ -333,19 +377,14 @@ async def generate_learning_path(request: GenerateLearningPathRequest):
             }
         ]
         
-        response = LearningPathResponse(
+        response = LearningPathResponse.model_construct(
             learning_path=learning_path,
             estimated_duration=total_duration,
             milestones=milestones,
             reasoning=f"Path designed for goals: {', '.join(goals)}"
         )
         
-        return MLResponse(
-            success=True,
-            data=response.dict(),
-            method="rule-based",
-            confidence=0.8
-        )
+        return ml_response(response, "rule-based", 0.8)
         
     except Exception as e:
         logger.error(f"Error generating learning path: {e}", exc_info=True)
@@ -2,8 +2,8 @@
 Pydantic schemas for API request/response validation
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Dict, Optional, Any, Literal
 
 # Assessment Schemas
 class AssessmentResponse(BaseModel):
@@ -16,9 +16,29 @@ class AssessmentResponse(BaseModel):
 class AssessCompetencyRequest(BaseModel):
     """Request for competency assessment"""
     user_id: str = Field(..., description="User ID")
-    responses: List[Dict[str, Any]] = Field(..., description="Assessment responses")
+    responses: List[Dict[str, Any]] = Field(..., min_length=1, description="Assessment responses")
     timings: List[float] = Field(..., description="Time spent on each question (seconds)")
     confidence: Optional[List[float]] = Field(None, description="Confidence scores for each response")
+    model_version: Optional[str] = Field(None, description="Model version (defaults to DEFAULT_MODEL_VERSION)")
+
+    model_config = ConfigDict(protected_namespaces=())
+
+class BatchAssessCompetencyRequest(BaseModel):
+    """Request for batch competency assessment"""
+    requests: List[AssessCompetencyRequest] = Field(
+        ..., min_length=1, max_length=1000, description="Assessment requests, scored in order"
+    )
+    model_version: Optional[str] = Field(None, description="Model version for requests that do not set one")
+
+    model_config = ConfigDict(protected_namespaces=())
+
+class RecordResponsesRequest(BaseModel):
+    """Request to record new assessment responses in a learner's running aggregates"""
+    user_id: str = Field(..., description="User ID")
+    responses: List[Dict[str, Any]] = Field(..., description="New assessment responses")
+    timings: Optional[List[float]] = Field(None, description="Time spent on each new question (seconds)")
+    confidence: Optional[List[float]] = Field(None, description="Confidence scores for each new response")
+    timestamp: Optional[float] = Field(None, description="Event time in epoch seconds (defaults to now)")
 
 class CompetencyResult(BaseModel):
     """Competency assessment result"""
@@ -35,6 +55,9 @@ class RecommendContentRequest(BaseModel):
     current_module: Optional[str] = None
     performance: Dict[str, Any] = Field(..., description="Recent performance metrics")
     context: Optional[Dict[str, Any]] = None
+    model_version: Optional[str] = Field(None, description="Model version (defaults to DEFAULT_MODEL_VERSION)")
+
+    model_config = ConfigDict(protected_namespaces=())
 
 class ContentRecommendation(BaseModel):
     """Content recommendation result"""
@@ -57,6 +80,40 @@ class PredictDropoutRequest(BaseModel):
     user_id: str
     engagement_metrics: Dict[str, Any] = Field(..., description="User engagement metrics")
     performance_history: Optional[List[Dict[str, Any]]] = None
+    model_version: Optional[str] = Field(None, description="Model version (defaults to DEFAULT_MODEL_VERSION)")
+
+    model_config = ConfigDict(protected_namespaces=())
+
+class InteractionEvent(BaseModel):
+    """Learner interaction event"""
+    user_id: str = Field(..., description="User ID")
+    type: Literal[
+        'video', 'text', 'audio', 'interactive', 'discussion', 'practice', 'quiz',
+        'help', 'session', 'review', 'bookmark', 'completion'
+    ] = Field(..., description="Event type (content time, interaction or module completion)")
+    timestamp: Optional[float] = Field(None, description="Event time in epoch seconds (defaults to now)")
+    duration: Optional[float] = Field(None, ge=0, description="Time spent (seconds)")
+    score: Optional[float] = Field(None, description="Score of a quiz or practice attempt")
+
+class RecordInteractionsRequest(BaseModel):
+    """Batch of interaction events, from one or many learners"""
+    events: List[InteractionEvent] = Field(..., max_length=100000, description="Interaction events")
+
+class DropoutOutcome(BaseModel):
+    """Observed dropout outcome of a learner"""
+    user_id: str = Field(..., description="User ID")
+    dropped_out: bool = Field(..., description="Whether the learner dropped out")
+    engagement_metrics: Optional[Dict[str, Any]] = Field(
+        None, description="Engagement metrics the outcome followed (defaults to the learner's recorded interactions)"
+    )
+    performance_history: Optional[List[Dict[str, Any]]] = None
+
+class RecordDropoutOutcomesRequest(BaseModel):
+    """Batch of observed dropout outcomes for online model updates"""
+    outcomes: List[DropoutOutcome] = Field(..., min_length=1, max_length=10000, description="Dropout outcomes")
+    model_version: Optional[str] = Field(None, description="Model version (defaults to DEFAULT_MODEL_VERSION)")
+
+    model_config = ConfigDict(protected_namespaces=())
 
 class DropoutPrediction(BaseModel):
     """Dropout prediction result"""
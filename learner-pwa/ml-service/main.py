@@ -7,6 +7,7 @@ from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -26,30 +27,83 @@ logger.setLevel(os.getenv('LOG_LEVEL', 'INFO'))
 
 # Import routers
 from api import assessment_api, recommendation_api, analytics_api
+from models.registry import model_registry, UnknownModelError, MODEL_FACTORIES
+from utils.inference_executor import inference_executor
+from utils.prediction_cache import prediction_cache
+from utils.feature_store import feature_store
+from utils.interaction_log import interaction_log
+from utils.online_learning import online_dropout_learner
+from typing import Optional
 
-# Global state for models
-ml_models = {}
+# Process workers hold their own model copies; replace them after a swap
+model_registry.add_reload_listener(lambda name, version: inference_executor.recycle())
+model_registry.add_reload_listener(prediction_cache.invalidate)
+model_registry.add_reload_listener(online_dropout_learner.model_reloaded)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Lifecycle manager for the application
-    Loads ML models on startup and cleans up on shutdown
+    Loads ML models in the background on startup and cleans up on shutdown
     """
     logger.info("Starting ML Service...")
     
-    # Load models on startup
+    # Load models concurrently without blocking startup; requests use the
+    # rule-based fallbacks until each model is ready
+    preload_task = asyncio.create_task(model_registry.preload())
+    
+    # Optionally reload models when their artifacts change on disk
+    watch_interval = float(os.getenv('MODEL_WATCH_INTERVAL', 0))
+    watch_task = asyncio.create_task(model_registry.watch(watch_interval)) if watch_interval > 0 else None
+    
+    # Restore learner aggregates and snapshot them periodically
+    try:
+        await asyncio.to_thread(feature_store.load)
+    except Exception as e:
+        logger.error(f"Error loading feature store snapshot: {e}")
+    snapshot_interval = float(os.getenv('FEATURE_STORE_SNAPSHOT_INTERVAL', 60))
+    snapshot_task = asyncio.create_task(feature_store.run(snapshot_interval)) if snapshot_interval > 0 else None
+    
+    # Restore interaction aggregates from the event log and compact and snapshot it periodically
     try:
-        # Model loading will be implemented in task 1.1
-        logger.info("ML models loaded successfully")
+        await asyncio.to_thread(interaction_log.load)
     except Exception as e:
-        logger.error(f"Failed to load ML models: {e}")
+        logger.error(f"Error loading interaction log: {e}")
+    compact_interval = float(os.getenv('EVENT_COMPACT_INTERVAL', 300))
+    compact_task = asyncio.create_task(interaction_log.run(compact_interval)) if compact_interval > 0 else None
+    
+    # Checkpoint online updates of the dropout predictor periodically
+    checkpoint_interval = float(os.getenv('DROPOUT_CHECKPOINT_INTERVAL', 300))
+    checkpoint_task = (
+        asyncio.create_task(online_dropout_learner.run(checkpoint_interval)) if checkpoint_interval > 0 else None
+    )
     
     yield
     
     # Cleanup on shutdown
     logger.info("Shutting down ML Service...")
-    ml_models.clear()
+    preload_task.cancel()
+    if watch_task is not None:
+        watch_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+        try:
+            feature_store.snapshot()
+        except Exception as e:
+            logger.error(f"Error snapshotting feature store: {e}")
+    if compact_task is not None:
+        compact_task.cancel()
+    try:
+        interaction_log.snapshot()
+    except Exception as e:
+        logger.error(f"Error snapshotting interaction log: {e}")
+    interaction_log.close()
+    if checkpoint_task is not None:
+        checkpoint_task.cancel()
+    online_dropout_learner.flush()
+    inference_executor.shutdown(wait=False)
+    model_registry.clear()
+    prediction_cache.clear()
 
 # Create FastAPI app
 app = FastAPI(
@@ -80,14 +134,33 @@ async def verify_api_key(x_api_key: str = Header(None)):
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """
+    Liveness check with per-model readiness
+
+    Always returns 200 once the server accepts connections, since requests
+    are served by fallbacks while models load.
+    """
+    models = model_registry.status()
     return {
         "status": "healthy",
         "service": "ml-service",
         "version": "1.0.0",
-        "models_loaded": len(ml_models)
+        "live": True,
+        "ready": all(m['state'] == 'ready' for m in models.values()),
+        "models_loaded": len(model_registry),
+        "models": models
     }
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness check, 503 until every model of the default version is loaded"""
+    models = model_registry.status()
+    ready = all(m['state'] == 'ready' for m in models.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": models}
+    )
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -104,9 +177,51 @@ async def root():
 async def models_info(api_key: str = Depends(verify_api_key)):
     """Get information about loaded models"""
     return {
-        "models": list(ml_models.keys()),
-        "count": len(ml_models),
-        "model_path": os.getenv('MODEL_PATH', './models/saved')
+        "models": model_registry.loaded(),
+        "count": len(model_registry),
+        "model_path": model_registry.base_path,
+        "active_version": model_registry.default_version,
+        "cache_size": model_registry.cache_size,
+        "executor": inference_executor.get_stats(),
+        "prediction_cache": prediction_cache.get_stats(),
+        "feature_store": feature_store.get_stats(),
+        "interaction_log": interaction_log.get_stats(),
+        "online_learning": online_dropout_learner.get_stats(),
+        "batching": {
+            batcher.name: batcher.get_stats()
+            for batcher in (
+                assessment_api.assessment_batcher,
+                assessment_api.learning_style_batcher,
+                analytics_api.dropout_batcher
+            )
+        }
+    }
+
+# Model reload endpoint
+@app.post("/models/reload")
+async def reload_models(
+    name: Optional[str] = None,
+    version: Optional[str] = None,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Load new model artifacts and swap them in without a restart
+
+    Each model is loaded in the background and validated with a warm-up
+    prediction; models that fail keep serving the previous copy.
+    """
+    try:
+        if name is not None and name not in MODEL_FACTORIES:
+            raise UnknownModelError(f"Unknown model: {name}")
+        model_registry.model_dir(version)
+        results = await model_registry.reload_models([name] if name else None, version)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return {
+        "success": all(r['status'] == 'reloaded' for r in results.values()),
+        "version": model_registry.resolve_version(version),
+        "models": results
     }
 
 # Error handlers
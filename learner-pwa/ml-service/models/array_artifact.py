@@ -0,0 +1,95 @@
+"""
+Array Artifacts
+Directory-of-.npy model artifacts that are memory-mapped read-only on load
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Memory-map artifact arrays instead of reading them into private memory
+MODEL_MMAP = os.getenv('MODEL_MMAP', 'true').lower() in ('1', 'true', 'yes')
+
+META_FILE = 'meta.json'
+
+def save_arrays(path, arrays, meta=None):
+    """
+    Save named arrays as an artifact directory
+
+    Every array is written to its own .npy file, followed by meta.json,
+    which marks the artifact as complete. The directory is built next to
+    the target and swapped in with renames, so files that other processes
+    have memory-mapped are never rewritten in place.
+
+    Args:
+        path: Artifact directory
+        arrays: Dictionary of name to array
+        meta: JSON-serializable dictionary of scalar metadata
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+    with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+        json.dump({'arrays': list(arrays), **(meta or {})}, f)
+
+    replace_arrays(tmp_path, path)
+
+def replace_arrays(src_path, path):
+    """
+    Swap a complete artifact directory into place
+
+    Args:
+        src_path: Artifact directory written by save_arrays(), removed by the swap
+        path: Artifact directory to replace
+    """
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(src_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+def load_arrays(path, mmap=None):
+    """
+    Load an artifact directory written by save_arrays()
+
+    Args:
+        path: Artifact directory
+        mmap: Memory-map arrays read-only (defaults to MODEL_MMAP)
+
+    Returns:
+        arrays, meta: Dictionary of name to array, and the metadata
+    """
+    mmap = MODEL_MMAP if mmap is None else mmap
+
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None, allow_pickle=False)
+        for name in meta.pop('arrays')
+    }
+    return arrays, meta
+
+def artifact_mtime(path):
+    """Modification time of an artifact, or None if it is missing or incomplete"""
+    marker = os.path.join(path, META_FILE) if os.path.isdir(path) else path
+    if not os.path.exists(marker):
+        return None
+    return os.path.getmtime(marker)
+
+def is_fresh(path, source_path):
+    """Check that an exported artifact exists and is not older than its source"""
+    mtime = artifact_mtime(path)
+    if mtime is None:
+        return False
+    return not os.path.exists(source_path) or mtime >= os.path.getmtime(source_path)
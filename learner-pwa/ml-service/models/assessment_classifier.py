@@ -11,6 +11,9 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.preprocessing import StandardScaler
+from models.compiled_forest import CompiledForest, load_or_compile, is_fresh, COMPILED_FOREST_MAX_BATCH
+from models.feature_schema import FeatureSchema, ASSESSMENT_SCHEMA
+from models.synthetic_data import generate_chunked
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,17 +21,25 @@ logger = logging.getLogger(__name__)
 class AssessmentClassifier:
     """ML model for competency level classification"""
 
-    def __init__(self):
+    def __init__(self, model_dir=None):
+        model_dir = model_dir or os.path.join(os.path.dirname(__file__), 'saved')
+
         self.model = None
         self.scaler = None
+        self.compiled = None
+        self.classes = None
+        self.feature_schema = ASSESSMENT_SCHEMA
         self.is_trained = False
-        self.model_path = os.path.join(os.path.dirname(__file__), 'saved', 'assessment_classifier.pkl')
-        self.scaler_path = os.path.join(os.path.dirname(__file__), 'saved', 'assessment_scaler.pkl')
+        self.model_path = os.path.join(model_dir, 'assessment_classifier.pkl')
+        self.compiled_path = os.path.join(model_dir, 'assessment_classifier.forest')
+        self.fused_path = os.path.join(model_dir, 'assessment_classifier.fused')
+        self.schema_path = os.path.join(model_dir, 'assessment_classifier.schema.json')
+        self.scaler_path = os.path.join(model_dir, 'assessment_scaler.pkl')
 
         # Ensure model directory exists
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
 
-    def train(self, X, y, test_size=0.2, random_state=42):
+    def train(self, X, y, test_size=0.2, random_state=42, feature_schema=None, n_jobs=None):
         """
         Train the competency classification model
 
@@ -37,8 +48,13 @@ class AssessmentClassifier:
             y: Target competency levels (1-4)
             test_size: Test set proportion
             random_state: Random seed
+            feature_schema: Schema of the columns of X (defaults to the current one)
+            n_jobs: Cores used to build the forest (not kept for prediction)
         """
         try:
+            self.feature_schema = feature_schema or self.feature_schema
+            self.feature_schema.check(np.shape(X)[1], 'assessment_classifier training data')
+
             logger.info("Training assessment classifier...")
 
             # Split data
@@ -52,19 +68,15 @@ class AssessmentClassifier:
             X_test_scaled = self.scaler.transform(X_test)
 
             # Train Random Forest model
-            self.model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=10,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=random_state,
-                class_weight='balanced'
-            )
+            self.model = self._new_forest(100, random_state, n_jobs)
 
             self.model.fit(X_train_scaled, y_train)
+            self.model.n_jobs = None  # Serve single-threaded; workers are scaled by the inference executor
+            self.compiled = CompiledForest.from_sklearn(self.model)
 
             # Evaluate
             y_pred = self.model.predict(X_test_scaled)
+            logger.info(f"Compiled forest max probability difference: {self.compiled.max_abs_diff(self.model, X_test_scaled):.2e}")
             accuracy = accuracy_score(y_test, y_pred)
 
             logger.info(f"Model trained with accuracy: {accuracy:.3f}")
@@ -77,6 +89,135 @@ class AssessmentClassifier:
             logger.error(f"Error training assessment classifier: {e}")
             raise
 
+    @staticmethod
+    def _new_forest(n_estimators, random_state=42, n_jobs=None, warm_start=False, class_weight='balanced'):
+        """Unfitted forest with the classifier's hyperparameters"""
+        return RandomForestClassifier(
+            n_estimators=n_estimators,
+            max_depth=10,
+            min_samples_split=5,
+            min_samples_leaf=2,
+            random_state=random_state,
+            class_weight=class_weight,
+            n_jobs=n_jobs,
+            warm_start=warm_start
+        )
+
+    def start_streaming(self, scaler, classes, class_weight=None, random_state=42, n_jobs=None, feature_schema=None):
+        """
+        Start training a forest out of core, chunk by chunk
+
+        Args:
+            scaler: StandardScaler fitted (with partial_fit) on the training data
+            classes: Every competency level in the training data
+            class_weight: Weight per competency level, e.g. balanced weights from the
+                label counts of the whole dataset; 'balanced' would reweight
+                each chunk by its own label mix
+            random_state: Random seed
+            n_jobs: Cores used to build trees
+            feature_schema: Schema of the feature columns (defaults to the current one)
+        """
+        self.feature_schema = feature_schema or self.feature_schema
+        self.feature_schema.check(scaler.n_features_in_, 'assessment_classifier training data')
+        self.scaler = scaler
+        self.classes = np.asarray(classes)
+        self.model = self._new_forest(0, random_state, n_jobs, warm_start=True, class_weight=self._class_weight(class_weight))
+        self.compiled = None
+        self.is_trained = False
+
+    @staticmethod
+    def _class_weight(class_weight):
+        """Class weights with plain int keys"""
+        return None if class_weight is None else {int(level): weight for level, weight in class_weight.items()}
+
+    def grow(self, X, y, n_trees):
+        """
+        Grow more trees on one chunk of samples
+
+        The forest is warm-started, so existing trees are kept and only the
+        new ones see this chunk; memory is bounded by the chunk size.
+
+        Args:
+            X: Feature matrix of the chunk
+            y: Competency levels (1-4) of the chunk; every class must be present
+            n_trees: Trees to add
+        """
+        self.check_classes(y)
+        self.model.set_params(n_estimators=len(getattr(self.model, 'estimators_', [])) + n_trees)
+        self.model.fit(self.scaler.transform(X), y)
+
+    def check_classes(self, y, source='Chunk'):
+        """
+        Check that labels cover exactly the forest's competency levels
+
+        Args:
+            y: Competency levels
+            source: What the labels come from, for the error message
+
+        Raises:
+            ValueError: If a level is missing or unknown to the forest
+        """
+        missing = np.setdiff1d(self.classes, y)
+        if len(missing):
+            raise ValueError(f"{source} is missing competency levels {missing.tolist()}")
+        unknown = np.setdiff1d(y, self.classes)
+        if len(unknown):
+            raise ValueError(f"{source} has competency levels the forest was not trained on: {unknown.tolist()}")
+
+    def encode_labels(self, y):
+        """Competency levels as the forest's classes"""
+        return np.asarray(y).astype(int)
+
+    def resume_streaming(self, class_weight=None, random_state=None, n_jobs=None):
+        """
+        Continue growing the saved forest on new data
+
+        Call after load(prefer_fused=False); grow() then adds trees fitted on
+        new chunks next to the existing ones, which keep their splits. The
+        scaler is kept, since the existing trees' thresholds depend on it.
+
+        Args:
+            class_weight: Weight per competency level of the new trees (see start_streaming)
+            random_state: Seed of the new trees (fresh entropy by default)
+            n_jobs: Cores used to build trees
+        """
+        forest = self._forest()
+        if forest is None or self.scaler is None:
+            raise ValueError("Growing needs the saved forest and scaler; load with prefer_fused=False")
+
+        self.classes = forest.classes_
+        forest.set_params(
+            warm_start=True, class_weight=self._class_weight(class_weight), random_state=random_state, n_jobs=n_jobs
+        )
+        self.model = forest
+        self.is_trained = False
+
+    def retire_trees(self, max_trees):
+        """
+        Drop the oldest trees beyond max_trees
+
+        Trees are kept in the order they were grown, so the ensemble keeps
+        a fixed size while tracking the most recent data.
+
+        Args:
+            max_trees: Trees to keep
+
+        Returns:
+            Number of trees retired
+        """
+        retired = max(0, len(self.model.estimators_) - max_trees)
+        if retired:
+            self.model.estimators_ = self.model.estimators_[retired:]
+            self.model.set_params(n_estimators=len(self.model.estimators_))
+        return retired
+
+    def finish_streaming(self):
+        """Compile the grown forest for serving"""
+        self.model.set_params(n_jobs=None, warm_start=False)
+        self.compiled = CompiledForest.from_sklearn(self.model)
+        self.is_trained = True
+        logger.info(f"Streamed assessment classifier finished with {len(self.model.estimators_)} trees")
+
     def predict(self, X):
         """
         Predict competency levels
@@ -87,11 +228,63 @@ class AssessmentClassifier:
         Returns:
             Predicted competency levels (1-4)
         """
-        if not self.is_trained or self.model is None:
+        if not self.is_trained or self.compiled is None:
             raise ValueError("Model not trained")
 
-        X_scaled = self.scaler.transform(X)
-        return self.model.predict(X_scaled)
+        return self.compiled.classes[np.argmax(self._predict_proba(X), axis=1)]
+
+    def _predict_proba(self, X):
+        """Class probabilities from the compiled forest for small batches, sklearn otherwise"""
+        # A fused forest takes raw features directly
+        if self.compiled.scaler_folded:
+            return self.compiled.predict_proba(X)
+
+        # Scale in float64, as the fused thresholds assume; float32 scaling can
+        # round values across a split threshold
+        X_scaled = self.scaler.transform(np.asarray(X, dtype=np.float64))
+        if len(X_scaled) <= COMPILED_FOREST_MAX_BATCH:
+            return self.compiled.predict_proba(X_scaled)
+        return self._forest().predict_proba(X_scaled)
+
+    def _forest(self):
+        """sklearn forest, unpickled on first use when serving from the compiled artifact"""
+        if self.model is None and os.path.exists(self.model_path):
+            self.model = joblib.load(self.model_path)
+        return self.model
+
+    def warm_up(self):
+        """
+        Run one prediction on a zero row
+
+        Validates freshly loaded artifacts and faults in their pages before
+        the model takes traffic.
+        """
+        return self.predict_with_confidence(self.feature_schema.default_row())
+
+    def _check_schema(self):
+        """Read the saved feature schema and check it against the loaded forest"""
+        self.feature_schema = FeatureSchema.load(self.schema_path, default=ASSESSMENT_SCHEMA)
+        self.feature_schema.check(self.compiled.n_features, 'assessment_classifier')
+
+    def export_fused(self, path=None):
+        """
+        Export a fused forest with the scaler folded into its split thresholds
+
+        The fused artifact alone is enough to serve predictions, and is used
+        by load() in preference to the pickles while it is up to date.
+
+        Args:
+            path: Artifact directory (defaults to fused_path)
+
+        Returns:
+            The fused CompiledForest
+        """
+        if self.scaler is None or self._forest() is None:
+            raise ValueError("Fused export needs the trained forest and scaler")
+
+        fused = CompiledForest.from_sklearn(self.model).fold_scaler(self.scaler)
+        fused.save(self.fused_path if path is None else path)
+        return fused
 
     def predict_with_confidence(self, X):
         """
@@ -103,12 +296,11 @@ class AssessmentClassifier:
         Returns:
             List of prediction dictionaries with confidence
         """
-        if not self.is_trained or self.model is None:
+        if not self.is_trained or self.compiled is None:
             raise ValueError("Model not trained")
 
-        X_scaled = self.scaler.transform(X)
-        predictions = self.model.predict(X_scaled)
-        probabilities = self.model.predict_proba(X_scaled)
+        probabilities = self._predict_proba(X)
+        predictions = self.compiled.classes[np.argmax(probabilities, axis=1)]
 
         results = []
         for i, pred in enumerate(predictions):
@@ -137,21 +329,42 @@ class AssessmentClassifier:
         """Save model and scaler to disk"""
         if not self.is_trained:
             raise ValueError("Cannot save untrained model")
+        if self.scaler is None or self._forest() is None:
+            raise ValueError("Cannot save a model loaded from its fused artifact")
 
         try:
             joblib.dump(self.model, self.model_path)
             joblib.dump(self.scaler, self.scaler_path)
+            if self.compiled is not None:
+                self.compiled.save(self.compiled_path)
+            self.feature_schema.save(self.schema_path)
             logger.info(f"Model saved to {self.model_path}")
         except Exception as e:
             logger.error(f"Error saving model: {e}")
             raise
 
-    def load(self):
-        """Load model and scaler from disk"""
+    def load(self, prefer_fused=True):
+        """
+        Load model and scaler from disk
+
+        Args:
+            prefer_fused: Serve from an up-to-date fused artifact when one exists
+        """
         try:
-            if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
-                self.model = joblib.load(self.model_path)
+            if prefer_fused and is_fresh(self.fused_path, self.model_path):
+                self.compiled = CompiledForest.load(self.fused_path)
+                self._check_schema()
+                self.model = None
+                self.scaler = None
+                self.is_trained = True
+                logger.info(f"Fused model loaded from {self.fused_path}")
+            elif os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
+                # The forest pickle is only read if the compiled artifact is stale
+                self.model = None
                 self.scaler = joblib.load(self.scaler_path)
+                self.compiled = load_or_compile(self.compiled_path, self.model_path, self._forest)
+                self.classes = self.compiled.classes
+                self._check_schema()
                 self.is_trained = True
                 logger.info(f"Model loaded from {self.model_path}")
             else:
@@ -162,61 +375,52 @@ class AssessmentClassifier:
             self.is_trained = False
             raise
 
-    def generate_synthetic_data(self, n_samples=1000):
+    def generate_synthetic_data(self, n_samples=1000, seed=42):
         """
         Generate synthetic training data for demonstration
 
+        Args:
+            n_samples: Number of samples
+            seed: Root seed; chunks of SYNTHETIC_CHUNK_SIZE samples draw from
+                independent streams spawned from it
+
         Returns:
             X, y: Feature matrix and target labels
         """
-        np.random.seed(42)
-
-        # Feature names based on assessment patterns
-        features = [
-            'accuracy',           # Overall accuracy
-            'avg_response_time',  # Average time per question
-            'consistency',        # Answer consistency
-            'difficulty_progression',  # Performance on harder questions
-            'help_requests',      # Number of help requests
-            'review_patterns',    # Content review frequency
-            'practice_frequency', # Practice session frequency
-            'error_patterns'      # Types of errors made
-        ]
-
-        X = []
-        y = []
-
-        for _ in range(n_samples):
-            # Generate realistic assessment patterns
-            base_skill = np.random.beta(2, 2)  # Skill level 0-1
-
-            # Features based on skill level with noise
-            accuracy = np.clip(base_skill + np.random.normal(0, 0.1), 0, 1)
-            avg_response_time = 30 + (1 - base_skill) * 60 + np.random.normal(0, 10)
-            consistency = base_skill + np.random.normal(0, 0.15)
-            difficulty_progression = base_skill * 0.8 + np.random.normal(0, 0.1)
-            help_requests = max(0, int((1 - base_skill) * 5 + np.random.normal(0, 1)))
-            review_patterns = base_skill * 3 + np.random.normal(0, 1)
-            practice_frequency = base_skill * 7 + np.random.normal(0, 2)
-            error_patterns = (1 - base_skill) * 3 + np.random.normal(0, 0.5)
-
-            features_data = [
-                accuracy, avg_response_time, consistency, difficulty_progression,
-                help_requests, review_patterns, practice_frequency, error_patterns
-            ]
-
-            X.append(features_data)
-
-            # Assign competency level based on skill
-            if base_skill >= 0.85:
-                level = 4  # Expert
-            elif base_skill >= 0.65:
-                level = 3  # Advanced
-            elif base_skill >= 0.35:
-                level = 2  # Intermediate
-            else:
-                level = 1  # Beginner
+        return generate_chunked(self.synthesize, n_samples, seed)
+
+    @staticmethod
+    def synthesize(rng, n_samples):
+        """
+        Draw synthetic learners, with columns following the assessment schema
 
-            y.append(level)
+        Args:
+            rng: numpy Generator
+            n_samples: Number of samples
 
-        return np.array(X), np.array(y)
+        Returns:
+            X, y: Feature matrix and competency levels (1-4)
+        """
+        noise = lambda scale: rng.normal(0, scale, n_samples)
+
+        # Generate realistic assessment patterns
+        base_skill = rng.beta(2, 2, n_samples)  # Skill level 0-1
+
+        # Features based on skill level with noise
+        X = np.column_stack([
+            np.clip(base_skill + noise(0.1), 0, 1),                             # accuracy
+            np.maximum(5, 30 + (1 - base_skill) * 60 + noise(10)),               # avg_response_time
+            np.clip(0.4 + base_skill * 0.4 + noise(0.1), 0, 1),                 # time_consistency
+            np.clip(0.3 + base_skill * 0.6 + noise(0.1), 0, 1),                 # avg_confidence
+            np.clip(0.6 + base_skill * 0.3 + noise(0.1), 0, 1),                 # confidence_consistency
+            np.clip(base_skill * 0.8 + noise(0.1), 0, 1),                       # difficulty_progression
+            np.clip((1 - base_skill) * 0.7 + noise(0.1), 0, 0.8),               # error_patterns
+            np.clip((1 - base_skill) * 0.4 + noise(0.05), 0, 1),                # help_requests
+            np.clip(base_skill * 0.4 + noise(0.1), 0, 1)                        # review_patterns
+        ])
+
+        # Assign competency level based on skill: beginner below 0.35,
+        # intermediate below 0.65, advanced below 0.85, expert above
+        y = np.digitize(base_skill, [0.35, 0.65, 0.85]) + 1
+
+        return X, y
@@ -0,0 +1,252 @@
+"""
+Compiled Forest Inference Engine
+Flattens a fitted RandomForestClassifier into contiguous arrays for fast inference
+"""
+
+import os
+import numpy as np
+import logging
+from models.array_artifact import save_arrays, load_arrays, is_fresh
+
+logger = logging.getLogger(__name__)
+
+# Above this many rows sklearn's compiled traversal is faster than the vectorized one
+COMPILED_FOREST_MAX_BATCH = int(os.getenv('COMPILED_FOREST_MAX_BATCH', 512))
+
+class CompiledForest:
+    """
+    Array-based evaluator for a fitted scikit-learn random forest
+
+    All trees are stored in shared node arrays (split feature, threshold,
+    children and normalized leaf class distributions), and every tree is
+    traversed at once for every row with vectorized indexing. Leaves point
+    to themselves, so traversing max_depth levels lands every row on its leaf.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth, n_features,
+                 scaler_folded=False):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.children = np.ascontiguousarray(children, dtype=np.intp).reshape(-1)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.classes = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.scaler_folded = bool(scaler_folded)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """
+        Compile a fitted RandomForestClassifier
+
+        Args:
+            forest: Fitted sklearn.ensemble.RandomForestClassifier
+
+        Returns:
+            CompiledForest
+        """
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+            # Per-leaf class distribution, normalized as sklearn does per tree
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            children.append(np.stack([left, right], axis=1))
+            values.append(value / normalizer)
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            roots=np.array(roots),
+            classes=forest.classes_,
+            max_depth=max_depth,
+            n_features=forest.n_features_in_
+        )
+
+    def fold_scaler(self, scaler):
+        """
+        Absorb a fitted StandardScaler into the split thresholds
+
+        sklearn compares float32(x_scaled) <= t, which holds exactly when
+        x_scaled lies below the midpoint between the largest float32 value not
+        above t and its successor. Mapping that midpoint through the inverse
+        affine transform gives an equivalent threshold on raw features, so
+        the returned forest takes unscaled input and skips the transform. It
+        matches the original forest on features scaled in float64, up to the
+        rounding of the transform itself; features scaled in float32 can land
+        on the other side of a split.
+
+        Args:
+            scaler: Fitted sklearn.preprocessing.StandardScaler used in training
+
+        Returns:
+            New CompiledForest with thresholds in raw-feature space
+        """
+        if self.scaler_folded:
+            raise ValueError("Scaler already folded into this forest")
+
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(self.n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(self.n_features)
+
+        # Largest float32 value not above each threshold, and the rounding midpoint above it
+        lower = self.threshold.astype(np.float32)
+        lower = np.where(lower > self.threshold, np.nextafter(lower, np.float32(-np.inf)), lower)
+        upper = np.nextafter(lower, np.float32(np.inf))
+        boundary = (lower.astype(np.float64) + upper.astype(np.float64)) / 2.0
+
+        return CompiledForest(
+            feature=self.feature,
+            threshold=boundary * scale[self.feature] + mean[self.feature],
+            children=self.children,
+            value=self.value,
+            roots=self.roots,
+            classes=self.classes,
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            scaler_folded=True
+        )
+
+    def apply(self, X):
+        """
+        Find the leaf reached in every tree
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+
+        Returns:
+            Global leaf node indices (n_samples, n_trees)
+        """
+        # sklearn evaluates splits on float32 inputs against float64 thresholds;
+        # folded thresholds are in raw space and compared in full precision
+        X = np.ascontiguousarray(X, dtype=np.float64 if self.scaler_folded else np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X has shape {X.shape}, but the forest expects {self.n_features} features")
+
+        flat_X = X.reshape(-1)
+
+        if X.shape[0] == 1:
+            # Single-row fast path: no per-row offsets needed
+            node = self.roots
+            for _ in range(self.max_depth):
+                node = self.children[2 * node + (flat_X[self.feature[node]] > self.threshold[node])]
+            return node[None, :]
+
+        row_offsets = (np.arange(X.shape[0]) * self.n_features)[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+
+        for _ in range(self.max_depth):
+            go_right = flat_X[row_offsets + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + go_right]
+
+        return node
+
+    def predict_proba(self, X):
+        """
+        Predict class probabilities, averaged over all trees
+
+        Args:
+            X: Feature matrix
+
+        Returns:
+            Probability matrix (n_samples, n_classes)
+        """
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        """Predict class labels"""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def max_abs_diff(self, forest, X):
+        """Largest absolute probability difference against the sklearn forest"""
+        return float(np.max(np.abs(self.predict_proba(X) - forest.predict_proba(X))))
+
+    def save(self, path):
+        """Save the compiled arrays as an artifact directory of .npy files"""
+        save_arrays(
+            path,
+            {
+                'feature': self.feature,
+                'threshold': self.threshold,
+                'children': self.children,
+                'value': self.value,
+                'roots': self.roots,
+                'classes': self.classes
+            },
+            meta={
+                'max_depth': self.max_depth,
+                'n_features': self.n_features,
+                'scaler_folded': self.scaler_folded
+            }
+        )
+        logger.info(f"Compiled forest saved to {path}")
+
+    @classmethod
+    def load(cls, path, mmap=None):
+        """
+        Load compiled arrays saved with save()
+
+        Args:
+            path: Artifact directory
+            mmap: Memory-map the node arrays read-only, so processes serving
+                the same artifact share its pages (defaults to MODEL_MMAP)
+
+        Returns:
+            CompiledForest
+        """
+        arrays, meta = load_arrays(path, mmap=mmap)
+        return cls(**arrays, **meta)
+
+def load_or_compile(compiled_path, source_path, load_forest):
+    """
+    Load the compiled forest stored next to a pickled model
+
+    The compiled arrays are memory-mapped when they are up to date, without
+    unpickling the sklearn forest. Otherwise they are rebuilt from the
+    forest and written back, so later loads can map them.
+
+    Args:
+        compiled_path: Path of the compiled artifact directory
+        source_path: Path of the pickled forest
+        load_forest: Callable returning the fitted RandomForestClassifier
+
+    Returns:
+        CompiledForest
+    """
+    if is_fresh(compiled_path, source_path):
+        try:
+            return CompiledForest.load(compiled_path)
+        except Exception as e:
+            logger.warning(f"Could not load compiled forest from {compiled_path}: {e}")
+
+    compiled = CompiledForest.from_sklearn(load_forest())
+    try:
+        compiled.save(compiled_path)
+    except OSError as e:
+        logger.warning(f"Could not save compiled forest to {compiled_path}: {e}")
+    return compiled
@@ -4,11 +4,16 @@ Predicts the risk of user dropout based on engagement metrics
 """
 
 import numpy as np
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+from sklearn.preprocessing import StandardScaler
 import joblib
 import os
 import logging
+from models.linear_scorer import LinearRiskScorer
+from models.array_artifact import is_fresh
+from models.feature_schema import FeatureSchema, DROPOUT_SCHEMA
+from models.synthetic_data import generate_chunked
 
 logger = logging.getLogger(__name__)
 
@@ -19,17 +24,15 @@ class DropoutPredictor:
     """
     
     def __init__(self, model_path=None):
-        self.model = LogisticRegression(
-            max_iter=1000,
-            random_state=42,
-            class_weight='balanced',
-            solver='lbfgs'
-        )
+        self.model = self._new_batch_model()
+        self.scaler = None
         self.model_path = model_path or './models/saved/dropout_predictor.pkl'
         self.is_trained = False
         self.feature_coefficients = None
+        self.feature_schema = DROPOUT_SCHEMA
+        self.scorer = None
         
-    def train(self, X_train, y_train, X_val=None, y_val=None):
+    def train(self, X_train, y_train, X_val=None, y_val=None, feature_schema=None):
         """
         Train the dropout predictor
         
@@ -38,22 +41,29 @@ class DropoutPredictor:
             y_train: Training labels (0=retained, 1=dropped out)
             X_val: Validation features (optional)
             y_val: Validation labels (optional)
+            feature_schema: Schema of the columns of X_train (defaults to the current one)
             
         Returns:
             Training metrics
         """
+        self.feature_schema = feature_schema or self.feature_schema
+        self.feature_schema.check(np.shape(X_train)[1], 'dropout_predictor training data')
+        
         logger.info("Training dropout predictor...")
         
-        # Train the model
-        self.model.fit(X_train, y_train)
+        # Train the model on standardized features; the scorer folds the
+        # scaler back in, and online updates continue from the same scale
+        self.scaler = StandardScaler().fit(X_train)
+        self.model = self._new_batch_model()
+        self.model.fit(self.scaler.transform(X_train), y_train)
         self.is_trained = True
         
         # Store feature coefficients
-        self.feature_coefficients = self.model.coef_[0]
+        self._refresh_scorer()
         
         # Evaluate on training set
-        train_pred = self.model.predict(X_train)
-        train_pred_proba = self.model.predict_proba(X_train)[:, 1]
+        train_pred_proba = self.predict_risk(X_train)
+        train_pred = (train_pred_proba > 0.5).astype(int)
         
         train_accuracy = accuracy_score(y_train, train_pred)
         train_auc = roc_auc_score(y_train, train_pred_proba)
@@ -66,30 +76,130 @@ class DropoutPredictor:
         
         # Evaluate on validation set if provided
         if X_val is not None and y_val is not None:
-            val_pred = self.model.predict(X_val)
-            val_pred_proba = self.model.predict_proba(X_val)[:, 1]
-            
-            val_accuracy = accuracy_score(y_val, val_pred)
-            val_precision = precision_score(y_val, val_pred)
-            val_recall = recall_score(y_val, val_pred)
-            val_f1 = f1_score(y_val, val_pred)
-            val_auc = roc_auc_score(y_val, val_pred_proba)
-            
-            metrics.update({
-                'val_accuracy': val_accuracy,
-                'val_precision': val_precision,
-                'val_recall': val_recall,
-                'val_f1': val_f1,
-                'val_auc': val_auc,
-                'val_samples': len(X_val)
-            })
-            
-            logger.info(f"Validation AUC: {val_auc:.4f}, F1: {val_f1:.4f}")
+            metrics.update(self.evaluate(X_val, y_val))
         
         logger.info(f"Training AUC: {train_auc:.4f}")
         
         return metrics
     
+    def evaluate(self, X_val, y_val):
+        """
+        Evaluate the predictor on held-out samples
+        
+        Args:
+            X_val: Validation features
+            y_val: Validation labels (0=retained, 1=dropped out)
+            
+        Returns:
+            Validation metrics
+        """
+        val_pred_proba = self.predict_risk(X_val)
+        val_pred = (val_pred_proba > 0.5).astype(int)
+        
+        metrics = {
+            'val_accuracy': accuracy_score(y_val, val_pred),
+            'val_precision': precision_score(y_val, val_pred, zero_division=0),
+            'val_recall': recall_score(y_val, val_pred, zero_division=0),
+            'val_f1': f1_score(y_val, val_pred, zero_division=0),
+            'val_auc': roc_auc_score(y_val, val_pred_proba),
+            'val_samples': len(X_val)
+        }
+        
+        logger.info(f"Validation AUC: {metrics['val_auc']:.4f}, F1: {metrics['val_f1']:.4f}")
+        return metrics
+    
+    @staticmethod
+    def _new_batch_model():
+        """Unfitted logistic regression for batch training"""
+        return LogisticRegression(
+            max_iter=1000,
+            random_state=42,
+            class_weight='balanced',
+            solver='lbfgs'
+        )
+    
+    def start_online(self, scaler, class_weight=None, alpha=1e-4, random_state=42, feature_schema=None):
+        """
+        Switch to an SGD logistic regression trained incrementally with partial_fit
+        
+        The SGD model learns on standardized features; its scorer folds the
+        standardization back into coefficients on raw features, so scoring
+        and risk factors work as for the batch model.
+        
+        Args:
+            scaler: StandardScaler fitted (with partial_fit) on the training data
+            class_weight: Weight per label, e.g. balanced weights from the label counts
+            alpha: L2 regularization strength
+            random_state: Random seed
+            feature_schema: Schema of the feature columns (defaults to the current one)
+        """
+        self.feature_schema = feature_schema or self.feature_schema
+        self.feature_schema.check(scaler.n_features_in_, 'dropout_predictor training data')
+        self.scaler = scaler
+        self.model = SGDClassifier(
+            loss='log_loss',
+            alpha=alpha,
+            class_weight=class_weight,
+            random_state=random_state
+        )
+        self.is_trained = False
+    
+    def resume_online(self, alpha=1e-4, eta0=0.01, random_state=42):
+        """
+        Continue a trained model with online partial_fit updates
+        
+        A batch model is replaced by an SGD logistic regression seeded with
+        its weights, so updates start from the current predictions instead
+        of from zero. It learns at a constant rate of eta0, small enough not
+        to undo the batch fit while tracking drift in the outcomes. A model
+        that is already online is left as it is.
+        
+        Args:
+            alpha: L2 regularization strength
+            eta0: Learning rate of the updates
+            random_state: Random seed
+        """
+        if isinstance(self.model, SGDClassifier):
+            return
+        if not self.is_trained or self.scaler is None or not hasattr(self.model, 'coef_'):
+            raise ValueError("Online updates need a trained model loaded with its scaler")
+        
+        model = SGDClassifier(
+            loss='log_loss',
+            alpha=alpha,
+            learning_rate='constant',
+            eta0=eta0,
+            random_state=random_state
+        )
+        # partial_fit keeps existing weights on its first call
+        model.coef_ = self.model.coef_.astype(np.float64, copy=True)
+        model.intercept_ = self.model.intercept_.astype(np.float64, copy=True)
+        self.model = model
+    
+    def partial_fit(self, X, y):
+        """
+        Update the SGD model with one batch of samples
+        
+        Args:
+            X: Feature matrix of the batch
+            y: Labels of the batch (0=retained, 1=dropped out)
+        """
+        if self.scaler is None or not isinstance(self.model, SGDClassifier):
+            raise ValueError("partial_fit needs an online model; call start_online first")
+        
+        self.model.partial_fit(self.scaler.transform(X), y, classes=[0, 1])
+        self._refresh_scorer()
+        self.is_trained = True
+    
+    def _refresh_scorer(self):
+        """Rebuild the scorer and coefficients on raw features from the fitted model"""
+        if self.scaler is None:
+            self.scorer = LinearRiskScorer.from_sklearn(self.model)
+        else:
+            coef = self.model.coef_[0] / self.scaler.scale_
+            self.scorer = LinearRiskScorer(coef, self.model.intercept_[0] - coef @ self.scaler.mean_)
+        self.feature_coefficients = self.scorer.coef
+    
     def predict_risk(self, X):
         """
         Predict dropout risk probability
@@ -103,7 +213,32 @@ class DropoutPredictor:
         if not self.is_trained:
             raise ValueError("Model must be trained before prediction")
         
-        return self.model.predict_proba(X)[:, 1]
+        return self.scorer.predict_risk(X)
+    
+    def score(self, X, top_k=3):
+        """
+        Vectorized scoring for arbitrary batch sizes
+        
+        Args:
+            X: Feature matrix
+            top_k: Number of contributing factors per row
+            
+        Returns:
+            Dictionary of arrays: risk, risk_level, factor_indices, factor_contributions
+        """
+        if not self.is_trained:
+            raise ValueError("Model must be trained before prediction")
+        
+        return self.scorer.score(X, k=top_k)
+    
+    def warm_up(self):
+        """
+        Run one prediction on a zero row
+        
+        Validates freshly loaded artifacts and faults in their pages before
+        the model takes traffic.
+        """
+        return self.score(self.feature_schema.default_row())
     
     def predict_with_factors(self, X, feature_names=None):
         """
@@ -116,40 +251,34 @@ class DropoutPredictor:
         Returns:
             List of predictions with risk factors
         """
-        risk_scores = self.predict_risk(X)
+        X = np.asarray(X, dtype=np.float64)
+        scores = self.score(X)
+        with_factors = bool(feature_names) and self.feature_coefficients is not None
         
         results = []
-        for i, risk in enumerate(risk_scores):
+        interventions_cache = {}
+        for i, risk in enumerate(scores['risk']):
             # Identify top risk factors
             factors = []
-            if feature_names and self.feature_coefficients is not None:
-                # Get feature contributions
-                feature_contributions = X[i] * self.feature_coefficients
-                top_indices = np.argsort(np.abs(feature_contributions))[-3:][::-1]
-                
-                for idx in top_indices:
+            if with_factors:
+                for idx, contribution in zip(scores['factor_indices'][i], scores['factor_contributions'][i]):
                     if idx < len(feature_names):
                         factors.append({
                             'factor': feature_names[idx],
-                            'contribution': float(feature_contributions[idx])
+                            'contribution': float(contribution)
                         })
             
-            # Determine risk level
-            if risk < 0.3:
-                risk_level = 'low'
-            elif risk < 0.6:
-                risk_level = 'medium'
-            else:
-                risk_level = 'high'
-            
-            # Generate interventions based on risk level
-            interventions = self._generate_interventions(risk_level, factors)
+            # Interventions depend only on the risk level and factor names
+            risk_level = str(scores['risk_level'][i])
+            key = (risk_level, tuple(f['factor'] for f in factors))
+            if key not in interventions_cache:
+                interventions_cache[key] = self._generate_interventions(risk_level, factors)
             
             results.append({
                 'dropout_risk': float(risk),
                 'risk_level': risk_level,
                 'factors': factors,
-                'interventions': interventions
+                'interventions': list(interventions_cache[key])
             })
         
         return results
@@ -177,27 +306,60 @@ class DropoutPredictor:
                 interventions.append('Send re-engagement notification')
             elif 'avg_score' in factor_name:
                 interventions.append('Provide additional learning resources')
-            elif 'modules_completed' in factor_name:
+            elif 'modules_completed' in factor_name or 'completion_velocity' in factor_name:
                 interventions.append('Highlight progress and next steps')
+            elif 'score_trend' in factor_name:
+                interventions.append('Review recent assessments with the learner')
+            elif 'session_regularity' in factor_name:
+                interventions.append('Suggest a regular study schedule with reminders')
         
         return list(set(interventions))  # Remove duplicates
     
     def save(self, path=None):
-        """Save the trained model"""
+        """Save the trained model, and its scorer arrays when trained"""
         save_path = path or self.model_path
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
         
+        if self.is_trained and not hasattr(self.model, 'coef_'):
+            raise ValueError("Cannot save a model loaded from its scorer artifact")
+        
         joblib.dump({
             'model': self.model,
+            'scaler': self.scaler,
             'is_trained': self.is_trained,
             'feature_coefficients': self.feature_coefficients
         }, save_path)
         
+        if self.scorer is not None:
+            self.scorer.save(os.path.splitext(save_path)[0] + '.scorer')
+        self.feature_schema.save(os.path.splitext(save_path)[0] + '.schema.json')
+        
         logger.info(f"Model saved to {save_path}")
     
-    def load(self, path=None):
-        """Load a trained model"""
+    def load(self, path=None, prefer_scorer=True):
+        """
+        Load a trained model
+        
+        An up-to-date scorer artifact is memory-mapped instead of unpickling
+        the model, which is all that inference needs.
+        
+        Args:
+            path: Model pickle (defaults to model_path)
+            prefer_scorer: Serve from an up-to-date scorer artifact when one
+                exists; pass False to load the model itself for further training
+        """
         load_path = path or self.model_path
+        scorer_path = os.path.splitext(load_path)[0] + '.scorer'
+        schema_path = os.path.splitext(load_path)[0] + '.schema.json'
+        
+        if prefer_scorer and is_fresh(scorer_path, load_path):
+            self.scorer = LinearRiskScorer.load(scorer_path)
+            self.feature_schema = FeatureSchema.load(schema_path, default=DROPOUT_SCHEMA)
+            self.feature_schema.check(self.scorer.n_features, 'dropout_predictor')
+            self.feature_coefficients = self.scorer.coef
+            self.is_trained = True
+            logger.info(f"Model loaded from {scorer_path}")
+            return True
         
         if not os.path.exists(load_path):
             logger.warning(f"Model file not found: {load_path}")
@@ -205,8 +367,15 @@ class DropoutPredictor:
         
         data = joblib.load(load_path)
         self.model = data['model']
+        self.scaler = data.get('scaler')
         self.is_trained = data['is_trained']
         self.feature_coefficients = data.get('feature_coefficients')
+        self.scorer = None
+        if self.is_trained:
+            self._refresh_scorer()
+        self.feature_schema = FeatureSchema.load(schema_path, default=DROPOUT_SCHEMA)
+        if self.scorer is not None:
+            self.feature_schema.check(self.scorer.n_features, 'dropout_predictor')
         
         logger.info(f"Model loaded from {load_path}")
         return True
@@ -217,3 +386,48 @@ class DropoutPredictor:
             return None
         
         return self.feature_coefficients.tolist()
+    
+    def generate_synthetic_data(self, n_samples=2000, seed=42):
+        """
+        Generate synthetic training data for demonstration
+        
+        Args:
+            n_samples: Number of samples
+            seed: Root seed; chunks of SYNTHETIC_CHUNK_SIZE samples draw from
+                independent streams spawned from it
+        
+        Returns:
+            X, y: Feature matrix (DROPOUT_SCHEMA columns) and dropout labels
+        """
+        return generate_chunked(self.synthesize, n_samples, seed)
+    
+    @staticmethod
+    def synthesize(rng, n_samples):
+        """
+        Draw synthetic learners, with columns following DROPOUT_SCHEMA
+        
+        Args:
+            rng: numpy Generator
+            n_samples: Number of samples
+        
+        Returns:
+            X, y: Feature matrix and dropout labels
+        """
+        # Latent engagement level drives every feature
+        engagement = rng.beta(2, 2, n_samples)
+        
+        days_since_last_active = rng.exponential(1 + (1 - engagement) * 20)
+        X = np.column_stack([
+            days_since_last_active,
+            np.clip(40 + engagement * 50 + rng.normal(0, 10, n_samples), 0, 100),       # avg_score
+            rng.normal((engagement - 0.5) * 4, 1.5),                                    # score_trend
+            rng.poisson(1 + engagement * 8),                                            # modules_completed
+            np.maximum(0, engagement * 2 + rng.normal(0, 0.4, n_samples)),              # completion_velocity
+            np.clip(0.3 + engagement * 0.6 + rng.normal(0, 0.1, n_samples), 0, 1)       # session_regularity
+        ])
+        
+        # Disengaged and long-inactive learners drop out more often
+        dropout_probability = 1 / (1 + np.exp(-(3 - 6 * engagement + 0.1 * (days_since_last_active - 7))))
+        y = (rng.random(n_samples) < dropout_probability).astype(int)
+        
+        return X, y
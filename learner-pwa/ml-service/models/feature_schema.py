@@ -0,0 +1,215 @@
+"""
+Feature Schemas
+Declarative, ordered feature columns that models are trained on and saved with
+"""
+
+import os
+import json
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class FeatureSchema:
+    """
+    Ordered feature columns of a model
+
+    Declares every column's name and the default used when a record cannot
+    be extracted. A schema is saved next to the model artifacts, so the
+    column contract travels with the model and is checked when it loads.
+    """
+
+    def __init__(self, name, features, dtype='float32'):
+        features = list(features)
+        self.name = name
+        self.features = tuple(feature for feature, _ in features)
+        self.defaults = tuple(float(default) for _, default in features)
+        self.dtype = np.dtype(dtype)
+        self.index = {feature: i for i, feature in enumerate(self.features)}
+
+        if len(self.index) != len(self.features):
+            raise ValueError(f"Duplicate features in {name} schema")
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def __eq__(self, other):
+        return (isinstance(other, FeatureSchema) and self.name == other.name
+                and self.features == other.features and self.dtype == other.dtype)
+
+    def __hash__(self):
+        return hash((self.name, self.features, self.dtype.str))
+
+    def __repr__(self):
+        return f"FeatureSchema({self.name!r}, {self.n_features} features)"
+
+    def empty(self, n_rows):
+        """Allocate an uninitialized feature buffer for n_rows records"""
+        return np.empty((n_rows, self.n_features), dtype=self.dtype)
+
+    def default_row(self):
+        """A single row of default feature values"""
+        return np.array([self.defaults], dtype=self.dtype)
+
+    def default_features(self):
+        """Default feature values as a dictionary"""
+        return dict(zip(self.features, self.defaults))
+
+    def check(self, n_features, model_name):
+        """
+        Check that a model takes this schema's columns
+
+        Args:
+            n_features: Number of features the model was fitted on
+            model_name: Model name for the error message
+
+        Raises:
+            ValueError: If the column counts differ
+        """
+        if n_features != self.n_features:
+            raise ValueError(
+                f"{model_name} expects {n_features} features, but its {self.name} "
+                f"schema declares {self.n_features}"
+            )
+
+    def compile(self, source_features, extract_columns, extract_record=None):
+        """
+        Compile a column extractor into one that fills buffers of this schema
+
+        Args:
+            source_features: Feature names in the order extract_columns yields them
+            extract_columns: Callable taking records and yielding one column per source feature
+            extract_record: Per-record fallback returning a feature dictionary
+
+        Returns:
+            CompiledExtractor
+        """
+        missing = [feature for feature in self.features if feature not in source_features]
+        if missing:
+            raise ValueError(f"No extractor for {self.name} features: {', '.join(missing)}")
+
+        targets = [self.index.get(feature) for feature in source_features]
+        return CompiledExtractor(self, targets, extract_columns, extract_record)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'features': list(self.features),
+            'defaults': list(self.defaults),
+            'dtype': self.dtype.str
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], zip(data['features'], data['defaults']), data.get('dtype', 'float32'))
+
+    def save(self, path):
+        """Write the schema as JSON, replacing any previous file atomically"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, default=None):
+        """
+        Read a schema saved with save()
+
+        Args:
+            path: Schema file
+            default: Schema to return when the file does not exist (artifacts saved before schemas)
+
+        Returns:
+            FeatureSchema
+        """
+        if not os.path.exists(path):
+            if default is None:
+                raise FileNotFoundError(path)
+            return default
+
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+class CompiledExtractor:
+    """
+    Feature extractor bound to a schema's column layout
+
+    Each column the source extractor yields is written straight into its
+    column of a preallocated buffer, and columns the schema does not use are
+    skipped. Records that break the column extractor are extracted one by
+    one with the per-record fallback.
+    """
+
+    def __init__(self, schema, targets, extract_columns, extract_record=None):
+        self.schema = schema
+        self.targets = targets
+        self.extract_columns = extract_columns
+        self.extract_record = extract_record
+
+    def __call__(self, records, out=None):
+        """
+        Extract features for records
+
+        Args:
+            records: List of records
+            out: Optional buffer of shape (len(records), n_features) to fill
+
+        Returns:
+            Feature matrix laid out by the schema
+        """
+        out = self.schema.empty(len(records)) if out is None else out
+        if out.shape != (len(records), self.schema.n_features):
+            raise ValueError(f"Feature buffer has shape {out.shape}, expected {(len(records), self.schema.n_features)}")
+
+        try:
+            for target, values in zip(self.targets, self.extract_columns(records)):
+                if target is not None:
+                    out[:, target] = values
+        except Exception as e:
+            if self.extract_record is None:
+                raise
+            # Malformed values: fall back to per-record extraction and its defaults
+            logger.warning(f"Falling back to per-record {self.schema.name} feature extraction: {e}")
+            for i, record in enumerate(records):
+                features = self.extract_record(record)
+                out[i] = [features[feature] for feature in self.schema.features]
+
+        return out
+
+ASSESSMENT_SCHEMA = FeatureSchema('assessment', [
+    ('accuracy', 0.5),
+    ('avg_response_time', 30.0),
+    ('time_consistency', 0.5),
+    ('avg_confidence', 0.5),
+    ('confidence_consistency', 0.5),
+    ('difficulty_progression', 0.5),
+    ('error_patterns', 0.3),
+    ('help_requests', 0.2),
+    ('review_patterns', 0.3)
+])
+
+LEARNING_STYLE_SCHEMA = FeatureSchema('learning_style', [
+    ('video_watch_time', 0.25),
+    ('text_read_time', 0.25),
+    ('audio_listen_time', 0.25),
+    ('interactive_time', 0.25),
+    ('discussion_posts', 2),
+    ('practice_sessions', 2),
+    ('quiz_attempts', 3),
+    ('help_requests', 1),
+    ('avg_session_duration', 30.0),
+    ('content_reviews', 2),
+    ('bookmarks', 1),
+    ('fast_interactions', 2),
+    ('slow_interactions', 1)
+])
+
+DROPOUT_SCHEMA = FeatureSchema('dropout', [
+    ('days_since_last_active', 0.0),
+    ('avg_score', 50.0),
+    ('score_trend', 0.0),
+    ('modules_completed', 0.0),
+    ('completion_velocity', 0.0),
+    ('session_regularity', 0.5)
+])
@@ -11,6 +11,9 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from sklearn.preprocessing import StandardScaler, LabelEncoder
+from models.compiled_forest import CompiledForest, load_or_compile, is_fresh, COMPILED_FOREST_MAX_BATCH
+from models.feature_schema import FeatureSchema, LEARNING_STYLE_SCHEMA
+from models.synthetic_data import generate_chunked
 import logging
 
 logger = logging.getLogger(__name__)
@@ -53,19 +56,47 @@ class LearningStyleDetector:
         ]
     }
 
-    def __init__(self):
+    # Synthetic learner profile of each style, in LEARNING_STYLES order
+    SYNTHETIC_PROFILES = {
+        # Beta (a, b) of the video, text, audio and interactive time shares
+        'content_beta': np.array([
+            [(3, 1), (1, 2), (1, 2), (2, 1)],  # visual: high video preference
+            [(1, 2), (1, 2), (3, 1), (2, 1)],  # auditory: high audio preference
+            [(1, 2), (1, 2), (1, 2), (3, 1)],  # kinesthetic: high interactive preference
+            [(1, 2), (3, 1), (1, 2), (1, 2)]   # reading_writing: high text preference
+        ], dtype=np.float64),
+        # Poisson rates of discussion posts, practice sessions, quiz attempts,
+        # help requests, content reviews, bookmarks, fast and slow interactions
+        'count_rates': np.array([
+            [1, 3, 2, 1, 2, 3, 1, 2],
+            [4, 2, 2, 2, 1, 1, 2, 1],
+            [2, 5, 3, 1, 3, 2, 1, 3],
+            [1, 2, 4, 3, 4, 4, 3, 2]
+        ], dtype=np.float64),
+        # Normal (mean, std) of the average session duration
+        'session_duration': np.array([(35, 10), (30, 8), (45, 12), (40, 10)], dtype=np.float64)
+    }
+
+    def __init__(self, model_dir=None):
+        model_dir = model_dir or os.path.join(os.path.dirname(__file__), 'saved')
+
         self.model = None
         self.scaler = None
         self.encoder = None
+        self.compiled = None
+        self.feature_schema = LEARNING_STYLE_SCHEMA
         self.is_trained = False
-        self.model_path = os.path.join(os.path.dirname(__file__), 'saved', 'learning_style_detector.pkl')
-        self.scaler_path = os.path.join(os.path.dirname(__file__), 'saved', 'learning_style_scaler.pkl')
-        self.encoder_path = os.path.join(os.path.dirname(__file__), 'saved', 'learning_style_encoder.pkl')
+        self.model_path = os.path.join(model_dir, 'learning_style_detector.pkl')
+        self.compiled_path = os.path.join(model_dir, 'learning_style_detector.forest')
+        self.fused_path = os.path.join(model_dir, 'learning_style_detector.fused')
+        self.schema_path = os.path.join(model_dir, 'learning_style_detector.schema.json')
+        self.scaler_path = os.path.join(model_dir, 'learning_style_scaler.pkl')
+        self.encoder_path = os.path.join(model_dir, 'learning_style_encoder.pkl')
 
         # Ensure model directory exists
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
 
-    def train(self, X, y, test_size=0.2, random_state=42):
+    def train(self, X, y, test_size=0.2, random_state=42, feature_schema=None, n_jobs=None):
         """
         Train the learning style detection model
 
@@ -74,18 +105,19 @@ class LearningStyleDetector:
             y: Target learning styles (encoded)
             test_size: Test set proportion
             random_state: Random seed
+            feature_schema: Schema of the columns of X (defaults to the current one)
+            n_jobs: Cores used to build the forest (not kept for prediction)
         """
         try:
+            self.feature_schema = feature_schema or self.feature_schema
+            self.feature_schema.check(np.shape(X)[1], 'learning_style_detector training data')
+
             logger.info("Training learning style detector...")
 
-            # Encode labels if they're strings
-            if isinstance(y[0], str):
-                self.encoder = LabelEncoder()
-                y_encoded = self.encoder.fit_transform(y)
-            else:
-                y_encoded = y
-                self.encoder = LabelEncoder()
-                self.encoder.fit(y_encoded)
+            # Encode style names to their LEARNING_STYLES index
+            y_encoded = self._encode(y)
+            self.encoder = LabelEncoder()
+            self.encoder.fit(y_encoded)
 
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
@@ -98,19 +130,15 @@ class LearningStyleDetector:
             X_test_scaled = self.scaler.transform(X_test)
 
             # Train Random Forest model
-            self.model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=8,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=random_state,
-                class_weight='balanced'
-            )
+            self.model = self._new_forest(100, random_state, n_jobs)
 
             self.model.fit(X_train_scaled, y_train)
+            self.model.n_jobs = None  # Serve single-threaded; workers are scaled by the inference executor
+            self.compiled = CompiledForest.from_sklearn(self.model)
 
             # Evaluate
             y_pred = self.model.predict(X_test_scaled)
+            logger.info(f"Compiled forest max probability difference: {self.compiled.max_abs_diff(self.model, X_test_scaled):.2e}")
             accuracy = accuracy_score(y_test, y_pred)
 
             logger.info(f"Learning style model trained with accuracy: {accuracy:.3f}")
@@ -123,6 +151,165 @@ class LearningStyleDetector:
             logger.error(f"Error training learning style detector: {e}")
             raise
 
+    @staticmethod
+    def _new_forest(n_estimators, random_state=42, n_jobs=None, warm_start=False, class_weight='balanced'):
+        """Unfitted forest with the detector's hyperparameters"""
+        return RandomForestClassifier(
+            n_estimators=n_estimators,
+            max_depth=8,
+            min_samples_split=5,
+            min_samples_leaf=2,
+            random_state=random_state,
+            class_weight=class_weight,
+            n_jobs=n_jobs,
+            warm_start=warm_start
+        )
+
+    def start_streaming(self, scaler, classes, class_weight=None, random_state=42, n_jobs=None, feature_schema=None):
+        """
+        Start training a forest out of core, chunk by chunk
+
+        Args:
+            scaler: StandardScaler fitted (with partial_fit) on the training data
+            classes: Every learning style in the training data
+            class_weight: Weight per learning style, e.g. balanced weights from the
+                label counts of the whole dataset; 'balanced' would reweight
+                each chunk by its own label mix
+            random_state: Random seed
+            n_jobs: Cores used to build trees
+            feature_schema: Schema of the feature columns (defaults to the current one)
+        """
+        self.feature_schema = feature_schema or self.feature_schema
+        self.feature_schema.check(scaler.n_features_in_, 'learning_style_detector training data')
+        self.scaler = scaler
+        self.encoder = LabelEncoder().fit(self._encode(classes))
+        self.model = self._new_forest(0, random_state, n_jobs, warm_start=True, class_weight=self._class_weight(class_weight))
+        self.compiled = None
+        self.is_trained = False
+
+    def _class_weight(self, class_weight):
+        """Class weights keyed by LEARNING_STYLES index"""
+        if class_weight is None:
+            return None
+        styles = list(class_weight)
+        return {int(index): class_weight[style] for index, style in zip(self._encode(styles), styles)}
+
+    def grow(self, X, y, n_trees):
+        """
+        Grow more trees on one chunk of samples
+
+        The forest is warm-started, so existing trees are kept and only the
+        new ones see this chunk; memory is bounded by the chunk size.
+
+        Args:
+            X: Feature matrix of the chunk
+            y: Learning styles of the chunk; every style must be present
+            n_trees: Trees to add
+        """
+        y_encoded = self._encode(y)
+        self.check_classes(y_encoded)
+        self.model.set_params(n_estimators=len(getattr(self.model, 'estimators_', [])) + n_trees)
+        self.model.fit(self.scaler.transform(X), y_encoded)
+
+    @property
+    def classes(self):
+        """The forest's classes, as LEARNING_STYLES indices"""
+        return self.encoder.classes_
+
+    def check_classes(self, y, source='Chunk'):
+        """
+        Check that labels cover exactly the forest's learning styles
+
+        Args:
+            y: Learning style names or LEARNING_STYLES indices
+            source: What the labels come from, for the error message
+
+        Raises:
+            ValueError: If a style is missing or unknown to the forest
+        """
+        y = np.asarray(y)
+        if y.dtype.kind not in 'iu':
+            unknown = sorted(set(y.tolist()) - set(self.LEARNING_STYLES.values()))
+            if unknown:
+                raise ValueError(f"{source} has unknown learning styles {unknown}")
+        y_encoded = self._encode(y)
+
+        missing = np.setdiff1d(self.classes, y_encoded)
+        if len(missing):
+            raise ValueError(f"{source} is missing learning styles {[self.LEARNING_STYLES[i] for i in missing]}")
+        unknown = np.setdiff1d(y_encoded, self.classes)
+        if len(unknown):
+            raise ValueError(f"{source} has learning styles the forest was not trained on: {unknown.tolist()}")
+
+    def encode_labels(self, y):
+        """Learning styles as the forest's classes"""
+        return self._encode(y)
+
+    def _encode(self, y):
+        """
+        Encode learning styles as their LEARNING_STYLES index
+
+        Predictions are decoded through LEARNING_STYLES, so the forest's
+        classes must follow its order rather than the alphabetical order of
+        the style names. Integer labels are taken to be indices already.
+        """
+        y = np.asarray(y)
+        if y.dtype.kind in 'iu':
+            return y
+
+        index = {style: i for i, style in self.LEARNING_STYLES.items()}
+        return np.array([index[style] for style in y])
+
+    def resume_streaming(self, class_weight=None, random_state=None, n_jobs=None):
+        """
+        Continue growing the saved forest on new data
+
+        Call after load(prefer_fused=False); grow() then adds trees fitted on
+        new chunks next to the existing ones, which keep their splits. The
+        scaler is kept, since the existing trees' thresholds depend on it.
+
+        Args:
+            class_weight: Weight per learning style of the new trees (see start_streaming)
+            random_state: Seed of the new trees (fresh entropy by default)
+            n_jobs: Cores used to build trees
+        """
+        forest = self._forest()
+        if forest is None or self.scaler is None:
+            raise ValueError("Growing needs the saved forest and scaler; load with prefer_fused=False")
+
+        self.encoder = LabelEncoder().fit(forest.classes_)
+        forest.set_params(
+            warm_start=True, class_weight=self._class_weight(class_weight), random_state=random_state, n_jobs=n_jobs
+        )
+        self.model = forest
+        self.is_trained = False
+
+    def retire_trees(self, max_trees):
+        """
+        Drop the oldest trees beyond max_trees
+
+        Trees are kept in the order they were grown, so the ensemble keeps
+        a fixed size while tracking the most recent data.
+
+        Args:
+            max_trees: Trees to keep
+
+        Returns:
+            Number of trees retired
+        """
+        retired = max(0, len(self.model.estimators_) - max_trees)
+        if retired:
+            self.model.estimators_ = self.model.estimators_[retired:]
+            self.model.set_params(n_estimators=len(self.model.estimators_))
+        return retired
+
+    def finish_streaming(self):
+        """Compile the grown forest for serving"""
+        self.model.set_params(n_jobs=None, warm_start=False)
+        self.compiled = CompiledForest.from_sklearn(self.model)
+        self.is_trained = True
+        logger.info(f"Streamed learning style detector finished with {len(self.model.estimators_)} trees")
+
     def predict_style(self, X):
         """
         Predict learning styles with probabilities
@@ -133,12 +320,11 @@ class LearningStyleDetector:
         Returns:
             List of prediction dictionaries with style and confidence
         """
-        if not self.is_trained or self.model is None:
+        if not self.is_trained or self.compiled is None:
             raise ValueError("Model not trained")
 
-        X_scaled = self.scaler.transform(X)
-        predictions = self.model.predict(X_scaled)
-        probabilities = self.model.predict_proba(X_scaled)
+        probabilities = self._predict_proba(X)
+        predictions = self.compiled.classes[np.argmax(probabilities, axis=1)]
 
         results = []
         for i, pred in enumerate(predictions):
@@ -160,26 +346,99 @@ class LearningStyleDetector:
 
         return results
 
+    def _predict_proba(self, X):
+        """Class probabilities from the compiled forest for small batches, sklearn otherwise"""
+        # A fused forest takes raw features directly
+        if self.compiled.scaler_folded:
+            return self.compiled.predict_proba(X)
+
+        # Scale in float64, as the fused thresholds assume; float32 scaling can
+        # round values across a split threshold
+        X_scaled = self.scaler.transform(np.asarray(X, dtype=np.float64))
+        if len(X_scaled) <= COMPILED_FOREST_MAX_BATCH:
+            return self.compiled.predict_proba(X_scaled)
+        return self._forest().predict_proba(X_scaled)
+
+    def _forest(self):
+        """sklearn forest, unpickled on first use when serving from the compiled artifact"""
+        if self.model is None and os.path.exists(self.model_path):
+            self.model = joblib.load(self.model_path)
+        return self.model
+
+    def warm_up(self):
+        """
+        Run one prediction on a zero row
+
+        Validates freshly loaded artifacts and faults in their pages before
+        the model takes traffic.
+        """
+        return self.predict_style(self.feature_schema.default_row())
+
+    def _check_schema(self):
+        """Read the saved feature schema and check it against the loaded forest"""
+        self.feature_schema = FeatureSchema.load(self.schema_path, default=LEARNING_STYLE_SCHEMA)
+        self.feature_schema.check(self.compiled.n_features, 'learning_style_detector')
+
+    def export_fused(self, path=None):
+        """
+        Export a fused forest with the scaler folded into its split thresholds
+
+        The fused artifact alone is enough to serve predictions, and is used
+        by load() in preference to the pickles while it is up to date.
+
+        Args:
+            path: Artifact directory (defaults to fused_path)
+
+        Returns:
+            The fused CompiledForest
+        """
+        if self.scaler is None or self._forest() is None:
+            raise ValueError("Fused export needs the trained forest and scaler")
+
+        fused = CompiledForest.from_sklearn(self.model).fold_scaler(self.scaler)
+        fused.save(self.fused_path if path is None else path)
+        return fused
+
     def save(self):
         """Save model, scaler, and encoder to disk"""
         if not self.is_trained:
             raise ValueError("Cannot save untrained model")
+        if self.scaler is None or self._forest() is None:
+            raise ValueError("Cannot save a model loaded from its fused artifact")
 
         try:
             joblib.dump(self.model, self.model_path)
             joblib.dump(self.scaler, self.scaler_path)
             joblib.dump(self.encoder, self.encoder_path)
+            if self.compiled is not None:
+                self.compiled.save(self.compiled_path)
+            self.feature_schema.save(self.schema_path)
             logger.info(f"Learning style model saved to {self.model_path}")
         except Exception as e:
             logger.error(f"Error saving learning style model: {e}")
             raise
 
-    def load(self):
-        """Load model, scaler, and encoder from disk"""
+    def load(self, prefer_fused=True):
+        """
+        Load model, scaler, and encoder from disk
+
+        Args:
+            prefer_fused: Serve from an up-to-date fused artifact when one exists
+        """
         try:
-            if os.path.exists(self.model_path) and os.path.exists(self.scaler_path) and os.path.exists(self.encoder_path):
-                self.model = joblib.load(self.model_path)
+            if prefer_fused and is_fresh(self.fused_path, self.model_path):
+                self.compiled = CompiledForest.load(self.fused_path)
+                self._check_schema()
+                self.model = None
+                self.scaler = None
+                self.is_trained = True
+                logger.info(f"Fused learning style model loaded from {self.fused_path}")
+            elif os.path.exists(self.model_path) and os.path.exists(self.scaler_path) and os.path.exists(self.encoder_path):
+                # The forest pickle is only read if the compiled artifact is stale
+                self.model = None
                 self.scaler = joblib.load(self.scaler_path)
+                self.compiled = load_or_compile(self.compiled_path, self.model_path, self._forest)
+                self._check_schema()
                 self.encoder = joblib.load(self.encoder_path)
                 self.is_trained = True
                 logger.info(f"Learning style model loaded from {self.model_path}")
@@ -191,99 +450,44 @@ class LearningStyleDetector:
             self.is_trained = False
             raise
 
-    def generate_synthetic_data(self, n_samples=1000):
+    def generate_synthetic_data(self, n_samples=1000, seed=42):
         """
         Generate synthetic training data for demonstration
 
+        Args:
+            n_samples: Number of samples
+            seed: Root seed; chunks of SYNTHETIC_CHUNK_SIZE samples draw from
+                independent streams spawned from it
+
         Returns:
             X, y: Feature matrix and target labels
         """
-        np.random.seed(42)
-
-        # Feature names based on interaction patterns
-        features = [
-            'video_watch_time', 'text_read_time', 'audio_listen_time', 'interactive_time',
-            'discussion_posts', 'practice_sessions', 'quiz_attempts', 'help_requests',
-            'avg_session_duration', 'content_reviews', 'bookmarks',
-            'fast_interactions', 'slow_interactions'
-        ]
+        return generate_chunked(self.synthesize, n_samples, seed)
+
+    @classmethod
+    def synthesize(cls, rng, n_samples):
+        """
+        Draw synthetic learners, with columns following the learning style schema
+
+        Every learner gets a uniformly drawn style preference, and each feature
+        is drawn from that style's profile in SYNTHETIC_PROFILES.
+
+        Args:
+            rng: numpy Generator
+            n_samples: Number of samples
+
+        Returns:
+            X, y: Feature matrix and learning style names
+        """
+        profiles = cls.SYNTHETIC_PROFILES
+        style = rng.integers(0, len(cls.LEARNING_STYLES), n_samples)
+
+        # Content time shares, interaction counts and session duration
+        content = rng.beta(profiles['content_beta'][style, :, 0], profiles['content_beta'][style, :, 1])
+        counts = rng.poisson(profiles['count_rates'][style])
+        session = rng.normal(profiles['session_duration'][style, 0], profiles['session_duration'][style, 1])
+
+        X = np.column_stack([content, counts[:, :4], session, counts[:, 4:]])
+        y = np.array(list(cls.LEARNING_STYLES.values()))[style]
 
-        X = []
-        y = []
-
-        for _ in range(n_samples):
-            # Generate learning style preferences
-            style_preference = np.random.choice(['visual', 'auditory', 'kinesthetic', 'reading_writing'])
-
-            # Generate features based on learning style
-            if style_preference == 'visual':
-                video_watch_time = np.random.beta(3, 1)  # High preference
-                text_read_time = np.random.beta(1, 2)
-                audio_listen_time = np.random.beta(1, 2)
-                interactive_time = np.random.beta(2, 1)
-                discussion_posts = np.random.poisson(1)
-                practice_sessions = np.random.poisson(3)
-                quiz_attempts = np.random.poisson(2)
-                help_requests = np.random.poisson(1)
-                avg_session_duration = np.random.normal(35, 10)
-                content_reviews = np.random.poisson(2)
-                bookmarks = np.random.poisson(3)
-                fast_interactions = np.random.poisson(1)
-                slow_interactions = np.random.poisson(2)
-
-            elif style_preference == 'auditory':
-                video_watch_time = np.random.beta(1, 2)
-                text_read_time = np.random.beta(1, 2)
-                audio_listen_time = np.random.beta(3, 1)  # High preference
-                interactive_time = np.random.beta(2, 1)
-                discussion_posts = np.random.poisson(4)  # High discussion
-                practice_sessions = np.random.poisson(2)
-                quiz_attempts = np.random.poisson(2)
-                help_requests = np.random.poisson(2)
-                avg_session_duration = np.random.normal(30, 8)
-                content_reviews = np.random.poisson(1)
-                bookmarks = np.random.poisson(1)
-                fast_interactions = np.random.poisson(2)
-                slow_interactions = np.random.poisson(1)
-
-            elif style_preference == 'kinesthetic':
-                video_watch_time = np.random.beta(1, 2)
-                text_read_time = np.random.beta(1, 2)
-                audio_listen_time = np.random.beta(1, 2)
-                interactive_time = np.random.beta(3, 1)  # High preference
-                discussion_posts = np.random.poisson(2)
-                practice_sessions = np.random.poisson(5)  # High practice
-                quiz_attempts = np.random.poisson(3)
-                help_requests = np.random.poisson(1)
-                avg_session_duration = np.random.normal(45, 12)  # Longer sessions
-                content_reviews = np.random.poisson(3)
-                bookmarks = np.random.poisson(2)
-                fast_interactions = np.random.poisson(1)
-                slow_interactions = np.random.poisson(3)  # More slow interactions
-
-            else:  # reading_writing
-                video_watch_time = np.random.beta(1, 2)
-                text_read_time = np.random.beta(3, 1)  # High preference
-                audio_listen_time = np.random.beta(1, 2)
-                interactive_time = np.random.beta(1, 2)
-                discussion_posts = np.random.poisson(1)
-                practice_sessions = np.random.poisson(2)
-                quiz_attempts = np.random.poisson(4)  # High quiz attempts
-                help_requests = np.random.poisson(3)  # More help requests
-                avg_session_duration = np.random.normal(40, 10)
-                content_reviews = np.random.poisson(4)  # High reviews
-                bookmarks = np.random.poisson(4)  # High bookmarks
-                fast_interactions = np.random.poisson(3)
-                slow_interactions = np.random.poisson(2)
-
-            features_data = [
-                video_watch_time, text_read_time, audio_listen_time, interactive_time,
-                discussion_posts, practice_sessions, quiz_attempts, help_requests,
-                avg_session_duration, content_reviews, bookmarks,
-                fast_interactions, slow_interactions
-            ]
-
-            X.append(features_data)
-            y.append(style_preference)
-
-        return np.array(X), np.array(y)
+        return X, y
@@ -0,0 +1,137 @@
+"""
+Linear Risk Scorer
+Pure-NumPy scoring for logistic regression risk models
+"""
+
+import numpy as np
+from scipy.special import expit
+import logging
+from models.array_artifact import save_arrays, load_arrays
+
+logger = logging.getLogger(__name__)
+
+class LinearRiskScorer:
+    """
+    Vectorized scorer for a binary logistic regression
+
+    Scores arbitrary batch sizes with one matrix-vector product and a
+    sigmoid, and ranks per-row feature contributions with argpartition
+    instead of a full sort.
+    """
+
+    RISK_LEVELS = np.array(['low', 'medium', 'high'])
+
+    def __init__(self, coef, intercept, risk_thresholds=(0.3, 0.6)):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).reshape(-1)
+        self.intercept = float(np.ravel(intercept)[0])
+        self.risk_thresholds = np.asarray(risk_thresholds, dtype=np.float64)
+
+    @property
+    def n_features(self):
+        return len(self.coef)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Build a scorer from a fitted binary linear classifier
+
+        Args:
+            model: Fitted LogisticRegression (or any model with coef_/intercept_)
+
+        Returns:
+            LinearRiskScorer
+        """
+        return cls(model.coef_[0], model.intercept_)
+
+    def predict_risk(self, X):
+        """
+        Predict the positive-class probability
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+
+        Returns:
+            Risk probabilities (n_samples,)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        return expit(X @ self.coef + self.intercept)
+
+    def risk_level_codes(self, risk):
+        """Map probabilities to indices into RISK_LEVELS"""
+        return np.searchsorted(self.risk_thresholds, risk, side='right')
+
+    def top_factors(self, X, k=3):
+        """
+        Find the k features with the largest absolute contribution per row
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+            k: Number of factors per row
+
+        Returns:
+            indices, contributions: (n_samples, k) arrays ordered by
+            decreasing absolute contribution
+        """
+        X = np.asarray(X, dtype=np.float64)
+        contributions = X * self.coef
+        k = min(k, self.n_features)
+        if k == 0:
+            empty = np.empty((X.shape[0], 0))
+            return empty.astype(np.intp), empty
+
+        magnitude = np.abs(contributions)
+        if k < self.n_features:
+            candidates = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(self.n_features), X.shape)
+
+        # Order the k candidates by decreasing magnitude
+        order = np.argsort(-np.take_along_axis(magnitude, candidates, axis=1), axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+
+        return indices, np.take_along_axis(contributions, indices, axis=1)
+
+    def score(self, X, k=3):
+        """
+        Score a batch of rows
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+            k: Number of top contributing factors per row
+
+        Returns:
+            Dictionary of arrays: risk, risk_level, factor_indices, factor_contributions
+        """
+        risk = self.predict_risk(X)
+        factor_indices, factor_contributions = self.top_factors(X, k)
+
+        return {
+            'risk': risk,
+            'risk_level': self.RISK_LEVELS[self.risk_level_codes(risk)],
+            'factor_indices': factor_indices,
+            'factor_contributions': factor_contributions
+        }
+
+    def save(self, path):
+        """Save the coefficients as an artifact directory of .npy files"""
+        save_arrays(
+            path,
+            {'coef': self.coef, 'risk_thresholds': self.risk_thresholds},
+            meta={'intercept': self.intercept}
+        )
+        logger.info(f"Linear scorer saved to {path}")
+
+    @classmethod
+    def load(cls, path, mmap=None):
+        """
+        Load coefficients saved with save()
+
+        Args:
+            path: Artifact directory
+            mmap: Memory-map the arrays read-only (defaults to MODEL_MMAP)
+
+        Returns:
+            LinearRiskScorer
+        """
+        arrays, meta = load_arrays(path, mmap=mmap)
+        return cls(**arrays, **meta)
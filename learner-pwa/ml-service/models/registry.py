@@ -0,0 +1,417 @@
+"""
+Model Registry
+Versioned, lazily loaded model cache with LRU eviction
+"""
+
+import itertools
+import os
+import re
+import threading
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from models.assessment_classifier import AssessmentClassifier
+from models.learning_style_detector import LearningStyleDetector
+from models.dropout_predictor import DropoutPredictor
+from models.array_artifact import artifact_mtime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'saved')
+
+# Model constructors keyed by model name; each takes the version's artifact directory
+MODEL_FACTORIES = {
+    'assessment_classifier': lambda model_dir: AssessmentClassifier(model_dir=model_dir),
+    'learning_style_detector': lambda model_dir: LearningStyleDetector(model_dir=model_dir),
+    'dropout_predictor': lambda model_dir: DropoutPredictor(
+        model_path=os.path.join(model_dir, 'dropout_predictor.pkl')
+    )
+}
+
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+class UnknownModelError(ValueError):
+    """Raised when a model name or version has no artifacts"""
+
+class ModelRegistry:
+    """
+    Registry of models keyed by (model name, version)
+
+    Artifacts for a version live in MODEL_PATH/<version>/. The default
+    version falls back to MODEL_PATH itself, so existing flat layouts keep
+    working. Models are loaded on first use and at most cache_size of them
+    stay resident; the least recently used one is evicted beyond that.
+    """
+
+    def __init__(self, base_path=None, default_version=None, cache_size=None):
+        self.base_path = base_path or os.getenv('MODEL_PATH') or DEFAULT_MODEL_PATH
+        self.default_version = default_version or os.getenv('DEFAULT_MODEL_VERSION', 'v1')
+        self.cache_size = max(1, cache_size or int(os.getenv('MODEL_CACHE_SIZE', 3)))
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._pending = {}
+        self._failed = {}
+        self._reload_listeners = []
+        # Shared by all models, so a model loaded again after eviction never
+        # reuses the generation of an earlier copy
+        self._generations = itertools.count(1)
+
+    def resolve_version(self, version=None):
+        """Return the requested version, or the default one"""
+        version = version or self.default_version
+        if not VERSION_PATTERN.match(version):
+            raise UnknownModelError(f"Invalid model version: {version}")
+        return version
+
+    def model_dir(self, version=None):
+        """
+        Get the artifact directory for a version
+
+        Args:
+            version: Model version (defaults to DEFAULT_MODEL_VERSION)
+
+        Returns:
+            Directory path
+        """
+        version = self.resolve_version(version)
+        path = os.path.join(self.base_path, version)
+
+        if os.path.isdir(path):
+            return path
+        if version == self.default_version:
+            return self.base_path
+        raise UnknownModelError(f"Unknown model version: {version}")
+
+    def get(self, name, version=None):
+        """
+        Get a model, loading it on first use
+
+        Args:
+            name: Model name (see MODEL_FACTORIES)
+            version: Model version (defaults to DEFAULT_MODEL_VERSION)
+
+        Returns:
+            Model instance (check is_trained before predicting)
+        """
+        if name not in MODEL_FACTORIES:
+            raise UnknownModelError(f"Unknown model: {name}")
+
+        key = (name, self.resolve_version(version))
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                entry['last_used'] = time.time()
+                return entry['model']
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    return entry['model']
+
+            try:
+                model = self._load(*key)
+            except Exception:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+                raise
+
+            with self._lock:
+                self._models[key] = {
+                    'model': model,
+                    'loaded_at': time.time(),
+                    'last_used': time.time(),
+                    'generation': next(self._generations)
+                }
+                self._load_locks.pop(key, None)
+                self._evict()
+
+        return model
+
+    async def get_ready(self, name, version=None):
+        """
+        Get a model only if it is already resident
+
+        A model that is not resident yet is loaded in the background, so
+        callers can serve a fallback instead of waiting for it.
+
+        Args:
+            name: Model name (see MODEL_FACTORIES)
+            version: Model version (defaults to DEFAULT_MODEL_VERSION)
+
+        Returns:
+            Model instance, or None while it is loading
+        """
+        if name not in MODEL_FACTORIES:
+            raise UnknownModelError(f"Unknown model: {name}")
+
+        if (name, self.resolve_version(version)) in self._models:
+            return self.get(name, version)
+
+        # Fail fast on versions without artifacts
+        self.model_dir(version)
+        self._schedule(name, version)
+        return None
+
+    async def preload(self, names=None, version=None):
+        """
+        Load models concurrently in background threads
+
+        Args:
+            names: Model names to load (defaults to all known models)
+            version: Model version (defaults to DEFAULT_MODEL_VERSION)
+        """
+        start = time.time()
+        pending = [self._schedule(name, version) for name in (names or MODEL_FACTORIES)]
+        await asyncio.gather(*[p for p in pending if p is not None], return_exceptions=True)
+        logger.info(f"Preloaded {len(pending)} models in {time.time() - start:.3f}s")
+
+    def _schedule(self, name, version=None):
+        """Start a background load unless the model is resident or already loading"""
+        key = (name, self.resolve_version(version))
+        if key in self._models:
+            return None
+
+        pending = self._pending.get(key)
+        if pending is None:
+            self._failed.pop(key, None)
+            pending = asyncio.ensure_future(asyncio.to_thread(self.get, *key))
+            pending.add_done_callback(lambda future: self._load_done(key, future))
+            self._pending[key] = pending
+        return pending
+
+    def _load_done(self, key, future):
+        """Record the outcome of a background load"""
+        self._pending.pop(key, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self._failed[key] = str(future.exception())
+            logger.error(f"Background load of {key[0]} {key[1]} failed: {future.exception()}")
+
+    def status(self, version=None):
+        """
+        Report readiness of every known model for a version
+
+        Returns:
+            Dictionary of model name to state (ready, loading, failed or
+            not_loaded) and whether the loaded model is trained
+        """
+        version = self.resolve_version(version)
+        status = {}
+        for name in MODEL_FACTORIES:
+            key = (name, version)
+            entry = self._models.get(key)
+            if entry is not None:
+                status[name] = {'state': 'ready', 'is_trained': entry['model'].is_trained}
+            elif key in self._pending:
+                status[name] = {'state': 'loading', 'is_trained': False}
+            elif key in self._failed:
+                status[name] = {'state': 'failed', 'is_trained': False, 'error': self._failed[key]}
+            else:
+                status[name] = {'state': 'not_loaded', 'is_trained': False}
+        return status
+
+    def _load(self, name, version):
+        """Instantiate and load a model from its version directory"""
+        model_dir = self.model_dir(version)
+        start = time.time()
+
+        model = MODEL_FACTORIES[name](model_dir)
+        try:
+            model.load()
+        except Exception as e:
+            logger.warning(f"Could not load {name} {version}: {e}")
+
+        logger.info(f"Loaded {name} {version} from {model_dir} in {time.time() - start:.3f}s "
+                    f"(trained: {model.is_trained})")
+        return model
+
+    def reload(self, name, version=None):
+        """
+        Load a fresh copy of a model and swap it in
+
+        The new copy must be trained and pass a warm-up prediction before it
+        replaces the resident one. The swap is a single reference update, so
+        requests that already hold the old model finish on it.
+
+        Args:
+            name: Model name (see MODEL_FACTORIES)
+            version: Model version (defaults to DEFAULT_MODEL_VERSION)
+
+        Returns:
+            Description of the swapped-in model
+        """
+        if name not in MODEL_FACTORIES:
+            raise UnknownModelError(f"Unknown model: {name}")
+
+        version = self.resolve_version(version)
+        model = self._load(name, version)
+        if not model.is_trained:
+            raise ValueError(f"Reloaded {name} {version} is not trained")
+        model.warm_up()
+
+        return self.swap(name, version, model)
+
+    def swap(self, name, version, model):
+        """
+        Swap in a model instance that is already trained
+
+        Used by reload() and for models updated in memory. The model gets a
+        new generation and reload listeners are notified, as for a reload
+        from disk.
+
+        Args:
+            name: Model name (see MODEL_FACTORIES)
+            version: Model version
+            model: Trained model instance
+
+        Returns:
+            Description of the swapped-in model
+        """
+        key = (name, self.resolve_version(version))
+
+        with self._lock:
+            entry = {
+                'model': model,
+                'loaded_at': time.time(),
+                'last_used': time.time(),
+                'generation': next(self._generations)
+            }
+            self._models[key] = entry
+            self._models.move_to_end(key)
+            self._failed.pop(key, None)
+            self._evict()
+
+        logger.info(f"Swapped in {name} {key[1]} generation {entry['generation']}")
+        for listener in self._reload_listeners:
+            listener(name, key[1])
+
+        return {'name': name, 'version': key[1], 'loaded_at': entry['loaded_at'], 'generation': entry['generation']}
+
+    async def reload_models(self, names=None, version=None):
+        """
+        Reload models concurrently in background threads
+
+        Args:
+            names: Model names to reload (defaults to all known models)
+            version: Model version (defaults to DEFAULT_MODEL_VERSION)
+
+        Returns:
+            Dictionary of model name to outcome
+        """
+        names = list(names or MODEL_FACTORIES)
+        outcomes = await asyncio.gather(
+            *[asyncio.to_thread(self.reload, name, version) for name in names],
+            return_exceptions=True
+        )
+
+        results = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Reload of {name} failed, keeping the previous model: {outcome}")
+                results[name] = {'status': 'failed', 'error': str(outcome)}
+            else:
+                results[name] = {'status': 'reloaded', **outcome}
+        return results
+
+    def generation(self, name, version=None):
+        """Generation of a resident model, new on every load and swap (0 if not resident)"""
+        entry = self._models.get((name, self.resolve_version(version)))
+        return entry['generation'] if entry is not None else 0
+
+    def add_reload_listener(self, listener):
+        """Register a callable invoked with (name, version) after each swap"""
+        self._reload_listeners.append(listener)
+
+    def artifact_signature(self, version=None):
+        """Modification times of the complete artifacts in a version directory"""
+        model_dir = self.model_dir(version)
+        signature = []
+        for entry in sorted(os.listdir(model_dir)):
+            # Skip directories that are still being written or replaced
+            if '.tmp-' in entry or '.old-' in entry:
+                continue
+            mtime = artifact_mtime(os.path.join(model_dir, entry))
+            if mtime is not None:
+                signature.append((entry, mtime))
+        return tuple(signature)
+
+    async def watch(self, interval):
+        """
+        Reload resident models whose artifacts change on disk
+
+        Artifact directories are polled every interval seconds; a change is
+        acted on once it has been stable for one full interval, so models
+        are not reloaded while training is still writing files.
+
+        Args:
+            interval: Polling interval in seconds
+        """
+        baseline = {}
+        candidate = {}
+        logger.info(f"Watching model artifacts every {interval}s")
+
+        while True:
+            await asyncio.sleep(interval)
+            resident = {}
+            for name, version in list(self._models):
+                resident.setdefault(version, []).append(name)
+
+            for version, names in resident.items():
+                try:
+                    signature = await asyncio.to_thread(self.artifact_signature, version)
+                except (UnknownModelError, OSError) as e:
+                    logger.warning(f"Cannot watch model version {version}: {e}")
+                    continue
+
+                if version not in baseline:
+                    baseline[version] = signature
+                elif signature == baseline[version]:
+                    candidate.pop(version, None)
+                elif candidate.get(version) != signature:
+                    candidate[version] = signature
+                else:
+                    logger.info(f"Model artifacts for {version} changed, reloading {names}")
+                    await self.reload_models(names, version)
+                    candidate.pop(version, None)
+                    baseline[version] = await asyncio.to_thread(self.artifact_signature, version)
+
+    def _evict(self):
+        """Drop least recently used models beyond the cache size (caller holds the lock)"""
+        while len(self._models) > self.cache_size:
+            (name, version), _ = self._models.popitem(last=False)
+            logger.info(f"Evicted {name} {version} from model cache")
+
+    def loaded(self):
+        """Describe resident models, most recently used last"""
+        with self._lock:
+            return [
+                {
+                    'name': name,
+                    'version': version,
+                    'is_trained': entry['model'].is_trained,
+                    'generation': entry['generation'],
+                    'loaded_at': entry['loaded_at'],
+                    'last_used': entry['last_used']
+                }
+                for (name, version), entry in self._models.items()
+            ]
+
+    def __len__(self):
+        return len(self._models)
+
+    def clear(self):
+        """Drop all resident models"""
+        with self._lock:
+            self._models.clear()
+
+# Shared registry used by all API routers
+model_registry = ModelRegistry()
@@ -0,0 +1,48 @@
+"""
+Synthetic Data
+Chunked, reproducible generation of synthetic training data
+"""
+
+import numpy as np
+
+# Samples drawn from one random stream
+SYNTHETIC_CHUNK_SIZE = 100000
+
+def chunk_seeds(n_samples, seed=42, chunk_size=SYNTHETIC_CHUNK_SIZE):
+    """
+    Split a sample count into chunks with independent random streams
+
+    Each chunk's stream is spawned from SeedSequence(seed) by chunk index,
+    so a chunk draws the same samples whichever process generates it and in
+    whatever order the chunks run.
+
+    Args:
+        n_samples: Total number of samples
+        seed: Root seed
+        chunk_size: Samples per chunk
+
+    Returns:
+        List of (SeedSequence, samples) per chunk
+    """
+    n_chunks = -(-n_samples // chunk_size)
+    sizes = [min(chunk_size, n_samples - i * chunk_size) for i in range(n_chunks)]
+    return list(zip(np.random.SeedSequence(seed).spawn(n_chunks), sizes))
+
+def generate_chunked(synthesize, n_samples, seed=42, chunk_size=SYNTHETIC_CHUNK_SIZE):
+    """
+    Generate samples in memory, chunk by chunk
+
+    Args:
+        synthesize: Callable (rng, n_samples) -> (X, y) drawing one chunk
+        n_samples: Total number of samples
+        seed: Root seed
+        chunk_size: Samples per chunk
+
+    Returns:
+        X, y: Feature matrix and target labels, the concatenation of the
+        chunks written by training/generate_synthetic_data.py for the same seed
+    """
+    chunks = [synthesize(np.random.default_rng(stream), n) for stream, n in chunk_seeds(n_samples, seed, chunk_size)]
+    if not chunks:
+        return synthesize(np.random.default_rng(seed), 0)
+    return np.concatenate([X for X, _ in chunks]), np.concatenate([y for _, y in chunks])
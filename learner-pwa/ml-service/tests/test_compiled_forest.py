@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+
+from models.assessment_classifier import AssessmentClassifier
+from models.learning_style_detector import LearningStyleDetector
+from models.compiled_forest import CompiledForest
+import training.optimize_models as optimize_models
+
+@pytest.fixture(scope='module', params=[AssessmentClassifier, LearningStyleDetector])
+def model(request, tmp_path_factory):
+    model = request.param(str(tmp_path_factory.mktemp(request.param.__name__)))
+    X, y = model.generate_synthetic_data(n_samples=600)
+    model.train(X, y)
+    model.save()
+    return model
+
+def near_thresholds(model, fused):
+    """float32 rows with one feature placed on each raw-space split threshold"""
+    split = fused.feature >= 0
+    features, thresholds = fused.feature[split], fused.threshold[split]
+    rng = np.random.default_rng(0)
+    X = model.feature_schema.default_row().repeat(len(features), axis=0)
+    X *= rng.uniform(0.5, 1.5, X.shape).astype(X.dtype)
+    X[np.arange(len(features)), features] = thresholds
+    return X
+
+def test_fused_matches_forest_on_float64_scaling(model):
+    fused = CompiledForest.from_sklearn(model.model).fold_scaler(model.scaler)
+    X = near_thresholds(model, fused)
+    expected = model.model.predict_proba(model.scaler.transform(X.astype(np.float64)))
+    np.testing.assert_allclose(fused.predict_proba(X), expected, atol=1e-9)
+
+def test_unfused_prediction_matches_fused(model):
+    fused = CompiledForest.from_sklearn(model.model).fold_scaler(model.scaler)
+    X = near_thresholds(model, fused)
+    assert X.dtype == np.float32
+    assert not model.compiled.scaler_folded
+    np.testing.assert_allclose(model._predict_proba(X), fused.predict_proba(X), atol=1e-9)
+
+def test_export_keeps_fused_artifact_only_after_parity_check(model, monkeypatch):
+    monkeypatch.setattr(optimize_models, 'TOLERANCE', -1.0)
+    assert not optimize_models.export_fused_model(model, 'model', n_samples=200)
+    assert not os.path.exists(model.fused_path)
+
+    monkeypatch.setattr(optimize_models, 'TOLERANCE', 1e-9)
+    assert optimize_models.export_fused_model(model, 'model', n_samples=200)
+    assert os.path.exists(model.fused_path)
+    assert [name for name in os.listdir(os.path.dirname(model.fused_path)) if '.staged-' in name] == []
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.analytics_api as analytics_api
+from main import app
+
+def record(user_id):
+    return json.dumps({
+        'user_id': user_id,
+        'engagement_metrics': {'days_since_last_active': 3, 'avg_score': 70, 'modules_completed': 2}
+    })
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('API_KEY', 'test-key')
+    monkeypatch.setattr(analytics_api, 'STREAM_MAX_LINE_BYTES', 512)
+    return TestClient(app)
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 100])
+def test_results_and_errors_keep_input_order(client, chunk_size):
+    lines = [record('a'), '{not json', record('b'), 'x' * 600, record('c'), record('d'), '{}', record('e')]
+    response = client.post(
+        f'/ml/analytics/predict-dropout/stream?chunk_size={chunk_size}',
+        content='\n'.join(lines), headers={'X-API-Key': 'test-key'}
+    )
+    assert response.status_code == 200
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r.get('user_id') or r['line'] for r in results] == ['a', 2, 'b', 4, 'c', 'd', 7, 'e']
+    assert all('error' in r for r in results if 'line' in r)
+    assert all('risk_level' in r or 'error' in r for r in results)
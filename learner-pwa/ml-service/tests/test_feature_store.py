@@ -0,0 +1,57 @@
+import numpy as np
+
+from models.feature_schema import ASSESSMENT_SCHEMA
+from training.data_preprocessing import DataPreprocessor
+from utils.feature_store import FeatureStore, ERROR_TYPES
+
+def make_assessments(seed, n=6, size=8):
+    rng = np.random.default_rng(seed)
+    assessments = []
+    for _ in range(n):
+        responses = []
+        for _ in range(size):
+            correct = bool(rng.random() < 0.6)
+            responses.append({
+                'correct': correct,
+                'difficulty': int(rng.integers(1, 6)),
+                'help_requested': bool(rng.random() < 0.2),
+                'reviewed': bool(rng.random() < 0.3),
+                'error_type': None if correct else ERROR_TYPES[rng.integers(len(ERROR_TYPES))]
+            })
+        assessments.append({
+            'responses': responses,
+            'timings': rng.uniform(5, 90, size).tolist(),
+            'confidence': rng.uniform(0, 1, size).tolist()
+        })
+    return assessments
+
+def test_updates_match_extraction():
+    assessments = make_assessments(seed=1)
+    store = FeatureStore(path='unused')
+    for assessment in assessments:
+        store.update('alice', assessment)
+
+    combined = {
+        key: [value for assessment in assessments for value in assessment[key]]
+        for key in ('responses', 'timings', 'confidence')
+    }
+    features = DataPreprocessor().extract_assessment_features(combined)
+    expected = [features[feature] for feature in ASSESSMENT_SCHEMA.features]
+    np.testing.assert_allclose(store.features(['alice'])[0], expected, rtol=1e-5)
+
+def test_unknown_learner_gets_defaults():
+    store = FeatureStore(path='unused')
+    np.testing.assert_allclose(store.features(['nobody'])[0], ASSESSMENT_SCHEMA.default_row()[0])
+    assert store.get_aggregates('nobody') is None
+
+def test_snapshot_round_trip(tmp_path):
+    store = FeatureStore(path=str(tmp_path / 'store'))
+    for i, assessment in enumerate(make_assessments(seed=2)):
+        store.update(f'learner-{i % 3}', assessment, timestamp=1_700_000_000 + i)
+    assert store.snapshot()
+    assert not store.snapshot()
+
+    restored = FeatureStore(path=str(tmp_path / 'store'))
+    assert restored.load()
+    users = [f'learner-{i}' for i in range(3)]
+    np.testing.assert_array_equal(restored.rows(users), store.rows(users))
@@ -0,0 +1,175 @@
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+from models.feature_schema import LEARNING_STYLE_SCHEMA, DROPOUT_SCHEMA
+from training.data_preprocessing import DataPreprocessor
+from utils.interaction_log import InteractionLog, CONTENT_TYPES, EVENT_TYPES, COLUMN
+
+USERS = ['alice', 'bob', 'carol']
+
+def make_events(seed, n=120, start=None):
+    """Events of USERS in time order, with values float32 holds exactly"""
+    rng = np.random.default_rng(seed)
+    start = time.time() - 30 * 86400 if start is None else start
+    timestamps = start + np.cumsum(rng.integers(60, 86400, n))
+    events = []
+    for timestamp in timestamps:
+        event_type = EVENT_TYPES[rng.integers(len(EVENT_TYPES))]
+        scored = event_type == 'quiz' or event_type == 'completion'
+        events.append({
+            'user_id': USERS[rng.integers(len(USERS))],
+            'type': event_type,
+            'timestamp': float(timestamp),
+            'duration': float(rng.integers(1, 120)),
+            'score': float(rng.integers(0, 101)) if scored else None
+        })
+    return events
+
+def batches(events, size):
+    return [events[i:i + size] for i in range(0, len(events), size)]
+
+def interaction_data(events):
+    """Learning style extraction input of one learner's events"""
+    timings = {content_type: 0.0 for content_type in CONTENT_TYPES}
+    interactions = []
+    for e in events:
+        if e['type'] in CONTENT_TYPES:
+            timings[e['type']] += e['duration']
+        elif e['type'] != 'completion':
+            interactions.append({'type': e['type'], 'duration': e['duration']})
+    return {'timings': timings, 'interactions': interactions}
+
+def dropout_data(events, as_of):
+    """Dropout extraction input of one learner's events"""
+    history = [
+        {'timestamp': e['timestamp'], 'score': e['score'], 'completed': e['type'] == 'completion'}
+        for e in sorted(events, key=lambda e: e['timestamp'])
+    ]
+    return {'engagement_metrics': {}, 'performance_history': history, 'as_of': as_of}
+
+def extracted(events, user_id, schema):
+    preprocessor = DataPreprocessor()
+    own = [e for e in events if e['user_id'] == user_id]
+    if schema is LEARNING_STYLE_SCHEMA:
+        features = preprocessor.extract_learning_style_features(interaction_data(own))
+    else:
+        features = preprocessor.extract_dropout_features(dropout_data(own, time.time()))
+    return np.array([features[feature] for feature in schema.features])
+
+def segment_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith('.events'))
+
+@pytest.mark.parametrize('schema', [LEARNING_STYLE_SCHEMA, DROPOUT_SCHEMA])
+def test_fold_matches_extraction(tmp_path, schema):
+    events = make_events(seed=1)
+    log = InteractionLog(str(tmp_path))
+    for batch in batches(events, 25):
+        log.append(batch)
+
+    features = log.features(USERS, schema)
+    for row, user_id in zip(features, USERS):
+        np.testing.assert_allclose(row, extracted(events, user_id, schema), rtol=1e-5, atol=1e-5)
+
+def test_split_batches_match_single_batch(tmp_path):
+    events = make_events(seed=2)
+    single = InteractionLog(str(tmp_path / 'single'))
+    single.append(events)
+    split = InteractionLog(str(tmp_path / 'split'))
+    for batch in batches(events, 7):
+        split.append(batch)
+
+    np.testing.assert_allclose(split.rows(USERS), single.rows(USERS), rtol=1e-9)
+
+def test_out_of_order_batches(tmp_path):
+    events = make_events(seed=3)
+    log = InteractionLog(str(tmp_path))
+    for batch in reversed(batches(events, 20)):
+        log.append(batch)
+
+    # Order-independent features are exact
+    style = log.features(USERS, LEARNING_STYLE_SCHEMA)
+    dropout = log.features(USERS, DROPOUT_SCHEMA)
+    exact = [DROPOUT_SCHEMA.index[feature] for feature in
+             ('days_since_last_active', 'avg_score', 'modules_completed', 'completion_velocity')]
+    for i, user_id in enumerate(USERS):
+        np.testing.assert_allclose(style[i], extracted(events, user_id, LEARNING_STYLE_SCHEMA), rtol=1e-5)
+        np.testing.assert_allclose(dropout[i, exact], extracted(events, user_id, DROPOUT_SCHEMA)[exact], rtol=1e-5)
+
+    # Late batches add no gap across earlier events
+    rows = log.rows(USERS)
+    in_batch_gaps = [
+        sum(max(sum(e['user_id'] == user_id for e in batch) - 1, 0) for batch in batches(events, 20))
+        for user_id in USERS
+    ]
+    np.testing.assert_array_equal(rows[:, COLUMN['gap_count']], in_batch_gaps)
+    assert np.isfinite(dropout).all()
+
+    # A replay folds the compacted, time-ordered segments as if in order
+    log.snapshot()
+    log.compact()
+    shutil.rmtree(log.snapshot_path)
+    replayed = InteractionLog(str(tmp_path))
+    replayed.load()
+    in_order = InteractionLog(str(tmp_path / 'in_order'))
+    in_order.append(events)
+    np.testing.assert_allclose(replayed.rows(USERS), in_order.rows(USERS), rtol=1e-9)
+
+def test_load_replays_only_segments_after_snapshot(tmp_path):
+    events = make_events(seed=4)
+    log = InteractionLog(str(tmp_path), segment_bytes=1000)
+    for batch in batches(events[:100], 10):
+        log.append(batch)
+    assert log.snapshot()
+    log.append(events[100:])
+    log.close()
+
+    restored = InteractionLog(str(tmp_path))
+    assert restored.load() == len(events) - 100
+    assert restored.events == len(events)
+    np.testing.assert_allclose(restored.rows(USERS), log.rows(USERS), rtol=1e-9)
+
+def test_load_after_interrupted_compaction(tmp_path):
+    events = make_events(seed=5)
+    log = InteractionLog(str(tmp_path), segment_bytes=500)
+    for batch in batches(events, 10):
+        log.append(batch)
+    log.snapshot()
+    inputs = segment_files(tmp_path)
+    saved = tmp_path / 'saved'
+    saved.mkdir()
+    for name in inputs:
+        shutil.copy(tmp_path / name, saved / name)
+
+    assert log.compact()
+    merged = segment_files(tmp_path)
+    assert len(merged) < len(inputs)
+
+    # Crash after the rename: the inputs are still on disk, next to a partial output
+    for name in inputs:
+        shutil.copy(saved / name, tmp_path / name)
+    (tmp_path / f"{merged[0]}.tmp").write_bytes(b'partial')
+    shutil.rmtree(log.snapshot_path)
+
+    restored = InteractionLog(str(tmp_path))
+    assert restored.load() == len(events)
+    assert segment_files(tmp_path) == merged
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    np.testing.assert_allclose(restored.rows(USERS), log.rows(USERS), rtol=1e-9)
+
+def test_compaction_keeps_few_segments(tmp_path):
+    events = make_events(seed=6, n=3000)
+    log = InteractionLog(str(tmp_path), segment_bytes=250)
+    for i, batch in enumerate(batches(events, 10)):
+        log.append(batch)
+        if i % 3 == 0:
+            log.snapshot()
+            log.compact()
+
+    assert log.get_stats()['segments'] <= 2 * np.log2(len(events))
+    restored = InteractionLog(str(tmp_path))
+    restored.load()
+    np.testing.assert_allclose(restored.rows(USERS), log.rows(USERS), rtol=1e-9)
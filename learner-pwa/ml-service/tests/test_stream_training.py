@@ -0,0 +1,133 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.assessment_classifier import AssessmentClassifier
+from models.learning_style_detector import LearningStyleDetector
+import training.stream_training as stream_training
+
+MODEL_CLASSES = {'assessment': AssessmentClassifier, 'learning_style': LearningStyleDetector}
+
+def write_dataset(path, model_name, n_samples, seed, keep=None):
+    """Synthetic feature columns and labels as CSV, optionally only the rows of some labels"""
+    model = MODEL_CLASSES[model_name]()
+    X, y = model.generate_synthetic_data(n_samples=n_samples, seed=seed)
+    frame = pd.DataFrame(X, columns=list(model.feature_schema.features))
+    frame['label'] = y
+    if keep is not None:
+        frame = frame[frame['label'].isin(keep)]
+    frame.to_csv(path, index=False)
+    return path
+
+def train(tmp_path, model_name, path, **kwargs):
+    return stream_training.train_streaming(
+        str(path), model_name, chunk_size=200, model_dir=str(tmp_path / 'models'), n_estimators=10, **kwargs
+    )
+
+def load(tmp_path, model_name):
+    model = MODEL_CLASSES[model_name](str(tmp_path / 'models'))
+    model.load(prefer_fused=False)
+    return model
+
+@pytest.mark.parametrize('model_name', ['assessment', 'learning_style'])
+def test_resume_grows_saved_forest(tmp_path, model_name):
+    train(tmp_path, model_name, write_dataset(tmp_path / 'old.csv', model_name, 1000, seed=1))
+    classes = load(tmp_path, model_name).classes
+
+    new = write_dataset(tmp_path / 'new.csv', model_name, 600, seed=2)
+    metrics = train(tmp_path, model_name, new, resume=True, max_trees=15)
+    model = load(tmp_path, model_name)
+    assert len(model._forest().estimators_) == 15
+    np.testing.assert_array_equal(model.classes, classes)
+    assert metrics['val_accuracy'] > 0.5
+
+@pytest.mark.parametrize('model_name, keep', [
+    ('assessment', [1, 2, 3]),
+    ('learning_style', ['visual', 'auditory', 'kinesthetic'])
+])
+def test_resume_rejects_data_missing_a_class_before_extracting(tmp_path, model_name, keep, monkeypatch):
+    train(tmp_path, model_name, write_dataset(tmp_path / 'old.csv', model_name, 1000, seed=1))
+    new = write_dataset(tmp_path / 'new.csv', model_name, 600, seed=2, keep=keep)
+
+    def no_extraction(*args):
+        raise AssertionError("Features were extracted before the classes were checked")
+    monkeypatch.setattr(stream_training, 'chunk_features', no_extraction)
+
+    with pytest.raises(ValueError, match='New data in .* is missing'):
+        train(tmp_path, model_name, new, resume=True)
+    assert len(load(tmp_path, model_name)._forest().estimators_) == 10
+
+@pytest.mark.parametrize('max_groups', [1, 3, 100])
+def test_group_chunks_use_every_chunk_and_cover_every_class(max_groups):
+    rng = np.random.default_rng(0)
+    classes = np.array([1, 2, 3, 4])
+    chunk_labels = [np.unique(rng.choice(classes, size=rng.integers(1, 5))) for _ in range(30)]
+
+    groups = stream_training.group_chunks(chunk_labels, classes, max_groups)
+    assert 1 <= len(groups) <= max_groups
+    assert sum(groups, []) == list(range(len(chunk_labels)))
+    for group in groups:
+        np.testing.assert_array_equal(np.unique(np.concatenate([chunk_labels[i] for i in group])), classes)
+
+@pytest.mark.parametrize('n_samples, n_estimators', [(4000, 10), (600, 25)])
+def test_streamed_forest_has_exact_tree_count(tmp_path, n_samples, n_estimators):
+    path = write_dataset(tmp_path / 'data.csv', 'assessment', n_samples, seed=3)
+    # Sort the rarest level last, so the first chunks miss it
+    frame = pd.read_csv(path)
+    frame.sort_values('label', key=lambda y: y == 4, kind='stable').to_csv(path, index=False)
+
+    metrics = stream_training.train_streaming(
+        str(path), 'assessment', chunk_size=200, model_dir=str(tmp_path / 'models'), n_estimators=n_estimators
+    )
+    assert len(load(tmp_path, 'assessment')._forest().estimators_) == n_estimators
+    assert metrics['train_samples'] + metrics['val_samples'] == n_samples
+
+def test_collect_matches_in_memory_fit(tmp_path):
+    path = write_dataset(tmp_path / 'data.csv', 'learning_style', 1500, seed=4)
+    spill = stream_training.ChunkSpill(str(tmp_path))
+    try:
+        scaler, label_counts, X_val, y_val = stream_training.collect(
+            str(path), LearningStyleDetector().feature_schema, 'label', 250, spill
+        )
+        X, y = spill.read_group(range(len(spill)))
+    finally:
+        spill.close()
+
+    assert len(y) + len(y_val) == 1500
+    assert label_counts == {label: int(count) for label, count in zip(*np.unique(y, return_counts=True))}
+    np.testing.assert_allclose(scaler.mean_, X.mean(axis=0), rtol=1e-10)
+    np.testing.assert_allclose(scaler.var_, X.var(axis=0), rtol=1e-8)
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.jsonl'])
+def test_read_frames_formats_agree(tmp_path, suffix):
+    frame = pd.read_csv(write_dataset(tmp_path / 'data.csv', 'assessment', 500, seed=5))
+    path = tmp_path / f'data{suffix}'
+    if suffix == '.parquet':
+        frame.to_parquet(path)
+    else:
+        frame.to_json(path, orient='records', lines=True)
+
+    chunks = list(stream_training.read_frames(str(path), 120))
+    assert [len(chunk) for chunk in chunks] == [120, 120, 120, 120, 20]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), frame, check_dtype=False)
+    labels = stream_training.read_labels(str(path), 'label', 120)
+    np.testing.assert_array_equal(labels, np.unique(frame['label']))
+
+def test_raw_records_are_extracted_like_the_service(tmp_path):
+    records = [
+        {'user_id': f'u{i}', 'label': i % 2,
+         'engagement_metrics': json.dumps({'days_since_last_active': i, 'avg_score': 50 + i}),
+         'performance_history': json.dumps([{'score': 60 + i, 'completed': True, 'timestamp': 1.7e9 + i * 86400}])}
+        for i in range(10)
+    ]
+    frame = pd.DataFrame(records)
+    schema = stream_training.DropoutPredictor().feature_schema
+    X, y = stream_training.chunk_features(frame, schema, 'label')
+
+    decoded = [{key: json.loads(value) if key in ('engagement_metrics', 'performance_history') else value
+                for key, value in record.items()} for record in records]
+    expected = stream_training.preprocessor.extract_features(schema, decoded)
+    np.testing.assert_allclose(X, expected, rtol=1e-6)
+    np.testing.assert_array_equal(y, [r['label'] for r in records])
@@ -3,18 +3,129 @@ Data Preprocessing Module
 Handles feature extraction and data preparation for ML models
 """
 
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
 import numpy as np
 import pandas as pd
+from itertools import chain
 from typing import Dict, List, Any
+from models.feature_schema import FeatureSchema, ASSESSMENT_SCHEMA, LEARNING_STYLE_SCHEMA, DROPOUT_SCHEMA
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Weights of incorrect-answer error types in the error pattern score
+ERROR_TYPE_WEIGHTS = {'conceptual': 0.8, 'calculation': 0.5, 'attention': 0.2}
+
+# Interaction types counted by the learning style features
+INTERACTION_TYPES = ('discussion', 'practice', 'quiz', 'help', 'session', 'review', 'bookmark')
+
+SECONDS_PER_DAY = 86400.0
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+
+def read_frames(path, chunk_size, columns=None):
+    """
+    Read a dataset in chunks
+
+    Args:
+        path: CSV, Parquet or JSONL file
+        chunk_size: Rows per chunk
+        columns: Columns to read (default: all)
+
+    Yields:
+        DataFrames of at most chunk_size rows
+    """
+    suffix = Path(path).suffix.lower()
+
+    if suffix == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif suffix == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns)
+    elif suffix in ('.jsonl', '.ndjson'):
+        for frame in pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False):
+            yield frame if columns is None else frame[columns]
+    else:
+        raise ValueError(f"Unsupported input format: {suffix} (use .csv, .parquet or .jsonl)")
+
+def decode_nested(value):
+    """Decode a nested field (responses, timings, performance_history) that flat formats store as a JSON string"""
+    if isinstance(value, str):
+        return json.loads(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+def _number(value):
+    """Convert an optional numeric value to float (nan when missing)"""
+    return np.nan if value is None else float(value)
+
+def _to_epoch(value):
+    """Convert one timestamp (epoch seconds or ISO-8601 string) to epoch seconds, nan when missing"""
+    if value is None:
+        return np.nan
+    if not isinstance(value, str):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return np.nan
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _to_epochs(values):
+    """
+    Convert timestamps to epoch seconds
+
+    Args:
+        values: Epoch seconds or ISO-8601 strings (naive times are UTC)
+
+    Returns:
+        float64 array, nan where a timestamp is missing or invalid
+    """
+    values = np.array(values, dtype=object).reshape(-1)
+    epochs = np.full(len(values), np.nan)
+
+    is_text = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    is_number = np.fromiter((v is not None for v in values), dtype=bool, count=len(values)) & ~is_text
+    epochs[is_number] = values[is_number].astype(np.float64)
+
+    if is_text.any():
+        parsed = pd.to_datetime(values[is_text], utc=True, errors='coerce', format='ISO8601')
+        epochs[is_text] = (parsed - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)
+
+    return epochs
+
+def _flatten(lists):
+    """
+    Flatten a list of numeric lists
+
+    Returns:
+        values, ids, lengths: flat float64 values, the index of the list each
+        value came from, and the length of every list
+    """
+    lengths = np.fromiter((len(v) for v in lists), dtype=np.intp, count=len(lists))
+    values = np.fromiter(chain.from_iterable(lists), dtype=np.float64, count=int(lengths.sum()))
+    return values, np.repeat(np.arange(len(lists)), lengths), lengths
+
+def _segment_mean_std(values, ids, lengths):
+    """Per-segment mean and population standard deviation (nan for empty segments)"""
+    n = len(lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(ids, weights=values, minlength=n) / lengths
+        var = np.bincount(ids, weights=(values - mean[ids]) ** 2, minlength=n) / lengths
+    return mean, np.sqrt(var)
+
 class DataPreprocessor:
     """Handles data preprocessing and feature extraction for ML models"""
 
     def __init__(self):
         self.feature_stats = {}
+        self._extractors = {}
 
     def extract_assessment_features(self, assessment_data: Dict[str, Any]) -> Dict[str, float]:
         """
@@ -149,6 +260,362 @@ class DataPreprocessor:
             logger.error(f"Error extracting learning style features: {e}")
             return self._get_default_learning_style_features()
 
+    def extract_dropout_features(self, dropout_data: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Extract engagement features for dropout prediction
+
+        Args:
+            dropout_data: Dictionary containing engagement_metrics and an optional
+                chronological performance_history (score, completed, timestamp per entry)
+
+        Returns:
+            Dictionary of extracted features
+        """
+        try:
+            metrics = dropout_data.get('engagement_metrics') or {}
+            history = dropout_data.get('performance_history') or []
+            as_of = _to_epoch(dropout_data.get('as_of'))
+            as_of = time.time() if np.isnan(as_of) else as_of
+
+            timestamps = np.sort([t for t in (_to_epoch(h.get('timestamp')) for h in history) if not np.isnan(t)])
+            scores = [float(h['score']) for h in history if h.get('score') is not None]
+
+            # Days inactive, from the metrics or the latest activity
+            days_since_last_active = _number(metrics.get('days_since_last_active'))
+            if np.isnan(days_since_last_active):
+                days_since_last_active = (as_of - timestamps[-1]) / SECONDS_PER_DAY if len(timestamps) else 0.0
+
+            # Score level and trend (least-squares slope per attempt)
+            avg_score = _number(metrics.get('avg_score'))
+            if np.isnan(avg_score):
+                avg_score = np.mean(scores) if scores else 50.0
+            score_trend = np.polyfit(np.arange(len(scores)), scores, 1)[0] if len(scores) >= 2 else 0.0
+
+            # Completion velocity: modules per week since the first activity
+            modules_completed = _number(metrics.get('modules_completed'))
+            if np.isnan(modules_completed):
+                modules_completed = sum(1 for h in history if h.get('completed', False))
+            if len(timestamps):
+                weeks_active = max((as_of - timestamps[0]) / SECONDS_PER_WEEK, 1.0)
+                completion_velocity = modules_completed / weeks_active
+            else:
+                completion_velocity = 0.0
+
+            # Session regularity: consistency of the gaps between activities
+            gaps = np.diff(timestamps)
+            if len(gaps) >= 2 and np.mean(gaps) > 0:
+                session_regularity = 1 / (1 + np.std(gaps) / np.mean(gaps))  # Higher is more regular
+            else:
+                session_regularity = 0.5
+
+            features = {
+                'days_since_last_active': days_since_last_active,
+                'avg_score': avg_score,
+                'score_trend': score_trend,
+                'modules_completed': modules_completed,
+                'completion_velocity': completion_velocity,
+                'session_regularity': session_regularity
+            }
+
+            return features
+
+        except Exception as e:
+            logger.error(f"Error extracting dropout features: {e}")
+            return self._get_default_dropout_features()
+
+    def extract_features(self, schema: FeatureSchema, records: List[Dict[str, Any]], out: np.ndarray = None) -> np.ndarray:
+        """
+        Extract features for many records straight into a schema's buffer
+
+        Args:
+            schema: Feature schema of the model that will score the features
+            records: Raw records of the schema's feature family
+            out: Optional preallocated buffer (len(records), schema.n_features)
+
+        Returns:
+            Feature matrix laid out by the schema
+        """
+        extractor = self._extractors.get(schema)
+        if extractor is None:
+            sources = {
+                'assessment': (ASSESSMENT_SCHEMA, self._assessment_columns, self.extract_assessment_features),
+                'learning_style': (LEARNING_STYLE_SCHEMA, self._learning_style_columns, self.extract_learning_style_features),
+                'dropout': (DROPOUT_SCHEMA, self._dropout_columns, self.extract_dropout_features)
+            }
+            if schema.name not in sources:
+                raise ValueError(f"Unknown feature type: {schema.name}")
+
+            source_schema, extract_columns, extract_record = sources[schema.name]
+            extractor = schema.compile(source_schema.features, extract_columns, extract_record)
+            self._extractors[schema] = extractor
+
+        return extractor(records, out)
+
+    def extract_assessment_features_batch(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Extract assessment features for many records at once
+
+        Matches extract_assessment_features() row for row, up to
+        floating-point rounding.
+
+        Args:
+            records: Assessment records (responses, timings, confidence)
+
+        Returns:
+            Feature matrix (n_records, ASSESSMENT_SCHEMA.n_features)
+        """
+        return self.extract_features(ASSESSMENT_SCHEMA, records)
+
+    def _assessment_columns(self, records):
+        """
+        Yield assessment feature columns in ASSESSMENT_SCHEMA order
+
+        Responses, timings and confidences of all records are flattened into
+        arrays with a record index per element, and every feature is computed
+        column-wise with bincount. Raises on malformed values.
+        """
+        n = len(records)
+        defaults = ASSESSMENT_SCHEMA.default_features()
+
+        responses = [r.get('responses') or [] for r in records]
+        flat = list(chain.from_iterable(responses))
+        ids = np.repeat(np.arange(n), [len(v) for v in responses])
+        counts = np.bincount(ids, minlength=n).astype(np.float64)
+
+        # Records without responses get the default features
+        has_responses = counts > 0
+
+        def column(name, values, condition=has_responses, default=None):
+            return np.where(condition, values, defaults[name] if default is None else default)
+
+        correct = np.fromiter((bool(r.get('correct', False)) for r in flat), dtype=bool, count=len(flat))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Basic accuracy metrics
+            yield column('accuracy', np.bincount(ids, weights=correct, minlength=n) / counts)
+
+            # Timing analysis
+            values, value_ids, lengths = _flatten([r.get('timings') or [] for r in records])
+            mean, std = _segment_mean_std(values, value_ids, lengths)
+            has_timings = has_responses & (lengths > 0)
+            yield column('avg_response_time', np.where(has_timings, mean, 30.0))
+            yield column('time_consistency', np.where(has_timings, 1 / (1 + std / mean), 0.5))
+
+            # Confidence analysis
+            values, value_ids, lengths = _flatten([r.get('confidence') or [] for r in records])
+            mean, std = _segment_mean_std(values, value_ids, lengths)
+            has_confidence = has_responses & (lengths > 0)
+            yield column('avg_confidence', np.where(has_confidence, mean, 0.5))
+            yield column('confidence_consistency', np.where(has_confidence, 1 - std, 0.5))
+
+            # Difficulty progression: accuracy per (record, difficulty) group,
+            # weighted by difficulty
+            difficulty = np.fromiter((r.get('difficulty', 1) for r in flat), dtype=np.float64, count=len(flat))
+            levels, level_ids = np.unique(difficulty, return_inverse=True)
+            groups, group_ids = np.unique(ids.astype(np.int64) * len(levels) + level_ids, return_inverse=True)
+            group_accuracy = np.bincount(group_ids, weights=correct) / np.bincount(group_ids)
+            group_records = groups // len(levels)
+            group_difficulty = levels[groups % len(levels)]
+            total_weight = np.bincount(group_records, weights=group_difficulty, minlength=n)
+            progression = np.bincount(group_records, weights=group_accuracy * group_difficulty, minlength=n)
+            yield column('difficulty_progression', np.where(total_weight > 0, progression / total_weight, 0.5))
+
+            # Error patterns: error type counts among incorrect answers
+            error_types = {name: code for code, name in enumerate(ERROR_TYPE_WEIGHTS, start=1)}
+            codes = np.fromiter(
+                (error_types.get(r.get('error_type'), 0) for r in flat), dtype=np.intp, count=len(flat)
+            )
+            incorrect = ~correct
+            error_counts = np.bincount(
+                ids[incorrect] * 4 + codes[incorrect], minlength=4 * n
+            ).reshape(n, 4).astype(np.float64)
+            total_errors = error_counts.sum(axis=1)
+            severity = (
+                error_counts[:, 1] * 0.8 + error_counts[:, 2] * 0.5 + error_counts[:, 3] * 0.2
+            ) / total_errors
+            yield column('error_patterns', np.where(total_errors > 0, severity, 0.0))
+
+            # Learning behavior indicators, normalized
+            help_requests = np.fromiter(
+                (bool(r.get('help_requested', False)) for r in flat), dtype=bool, count=len(flat)
+            )
+            yield column('help_requests', np.bincount(ids, weights=help_requests, minlength=n) / counts)
+            reviewed = np.fromiter((bool(r.get('reviewed', False)) for r in flat), dtype=bool, count=len(flat))
+            yield column('review_patterns', np.bincount(ids, weights=reviewed, minlength=n) / counts)
+
+    def extract_learning_style_features_batch(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Extract learning style features for many records at once
+
+        Matches extract_learning_style_features() row for row, up to
+        floating-point rounding.
+
+        Args:
+            records: Interaction records (timings by content type, interactions)
+
+        Returns:
+            Feature matrix (n_records, LEARNING_STYLE_SCHEMA.n_features)
+        """
+        return self.extract_features(LEARNING_STYLE_SCHEMA, records)
+
+    def _learning_style_columns(self, records):
+        """
+        Yield learning style feature columns in LEARNING_STYLE_SCHEMA order
+
+        Interactions of all records are flattened into type codes and
+        durations with a record index per interaction, and counts and
+        session averages are computed column-wise with bincount. Raises on
+        malformed values.
+        """
+        n = len(records)
+        defaults = LEARNING_STYLE_SCHEMA.default_features()
+
+        # Records whose timings are not a mapping fail per-record extraction
+        # and get the default features
+        timings = [r.get('timings', {}) for r in records]
+        valid = np.fromiter((isinstance(t, dict) for t in timings), dtype=bool, count=n)
+
+        def column(name, values):
+            return np.where(valid, values, defaults[name])
+
+        # Time spent on different content types, as shares of the total
+        content_time = np.array([
+            [t.get('video', 0), t.get('text', 0), t.get('audio', 0), t.get('interactive', 0)]
+            if isinstance(t, dict) else [0, 0, 0, 0]
+            for t in timings
+        ], dtype=np.float64).reshape(n, 4)
+        total_time = content_time.sum(axis=1, keepdims=True)
+        content_time = np.divide(content_time, total_time, out=content_time.copy(), where=total_time > 0)
+        for i, name in enumerate(('video_watch_time', 'text_read_time', 'audio_listen_time', 'interactive_time')):
+            yield column(name, content_time[:, i])
+
+        # Interaction counts
+        interactions = [r.get('interactions', []) for r in records]
+        flat = list(chain.from_iterable(interactions))
+        ids = np.repeat(np.arange(n), [len(v) for v in interactions])
+        type_codes = {name: code for code, name in enumerate(INTERACTION_TYPES, start=1)}
+        codes = np.fromiter((type_codes.get(i.get('type'), 0) for i in flat), dtype=np.intp, count=len(flat))
+        durations = np.fromiter((i.get('duration', 0) for i in flat), dtype=np.float64, count=len(flat))
+
+        n_codes = len(INTERACTION_TYPES) + 1
+        type_counts = np.bincount(ids * n_codes + codes, minlength=n * n_codes).reshape(n, n_codes)
+        count = {name: type_counts[:, code] for name, code in type_codes.items()}
+
+        yield column('discussion_posts', count['discussion'])
+        yield column('practice_sessions', count['practice'])
+        yield column('quiz_attempts', count['quiz'])
+        yield column('help_requests', count['help'])
+
+        # Session patterns
+        sessions = codes == type_codes['session']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            session_mean = np.bincount(ids[sessions], weights=durations[sessions], minlength=n) / count['session']
+        yield column('avg_session_duration', np.where(count['session'] > 0, session_mean, 30.0))
+
+        # Content engagement
+        yield column('content_reviews', count['review'])
+        yield column('bookmarks', count['bookmark'])
+
+        # Learning pace indicators
+        yield column('fast_interactions', np.bincount(ids, weights=durations < 10, minlength=n))
+        yield column('slow_interactions', np.bincount(ids, weights=durations > 60, minlength=n))
+
+    def extract_dropout_features_batch(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Extract dropout features for many records at once
+
+        Matches extract_dropout_features() row for row, up to
+        floating-point rounding.
+
+        Args:
+            records: Dropout records (engagement_metrics, performance_history)
+
+        Returns:
+            Feature matrix (n_records, DROPOUT_SCHEMA.n_features)
+        """
+        return self.extract_features(DROPOUT_SCHEMA, records)
+
+    def _dropout_columns(self, records):
+        """
+        Yield dropout feature columns in DROPOUT_SCHEMA order
+
+        Performance histories of all records are flattened into score,
+        completion and timestamp arrays with a record index per entry.
+        Timestamps are sorted per record with one lexsort, and trends, gaps
+        and counts are computed column-wise with bincount. Metrics given in
+        engagement_metrics take precedence over values derived from the
+        history. Raises on malformed values.
+        """
+        n = len(records)
+        now = time.time()
+
+        metrics = [r.get('engagement_metrics') or {} for r in records]
+        history = [r.get('performance_history') or [] for r in records]
+        flat = list(chain.from_iterable(history))
+        ids = np.repeat(np.arange(n), [len(h) for h in history])
+
+        as_of = _to_epochs([r.get('as_of') for r in records])
+        as_of[np.isnan(as_of)] = now
+
+        def metric(name):
+            return np.fromiter((_number(m.get(name)) for m in metrics), dtype=np.float64, count=n)
+
+        def starts(counts):
+            return np.cumsum(counts) - counts
+
+        # Activity timestamps, sorted within each record
+        timestamps = _to_epochs([h.get('timestamp') for h in flat])
+        dated = ~np.isnan(timestamps)
+        order = np.lexsort((timestamps[dated], ids[dated]))
+        times, time_ids = timestamps[dated][order], ids[dated][order]
+        time_counts = np.bincount(time_ids, minlength=n)
+        has_times = time_counts > 0
+        first = np.zeros(n)
+        last = np.zeros(n)
+        first[has_times] = times[starts(time_counts)[has_times]]
+        last[has_times] = times[(starts(time_counts) + time_counts - 1)[has_times]]
+
+        # Days inactive, from the metrics or the latest activity
+        days_since_last_active = metric('days_since_last_active')
+        derived = np.where(has_times, (as_of - last) / SECONDS_PER_DAY, 0.0)
+        yield np.where(np.isnan(days_since_last_active), derived, days_since_last_active)
+
+        # Score level and trend (least-squares slope per attempt)
+        scores = np.fromiter((_number(h.get('score')) for h in flat), dtype=np.float64, count=len(flat))
+        scored = ~np.isnan(scores)
+        scores, score_ids = scores[scored], ids[scored]
+        score_counts = np.bincount(score_ids, minlength=n)
+        attempt = np.arange(len(scores)) - starts(score_counts)[score_ids]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score_mean = np.bincount(score_ids, weights=scores, minlength=n) / score_counts
+            attempt_mean = (score_counts - 1) / 2
+            attempt_dev = attempt - attempt_mean[score_ids]
+            covariance = np.bincount(score_ids, weights=attempt_dev * (scores - score_mean[score_ids]), minlength=n)
+            variance = np.bincount(score_ids, weights=attempt_dev ** 2, minlength=n)
+
+            avg_score = metric('avg_score')
+            derived = np.where(score_counts > 0, score_mean, 50.0)
+            yield np.where(np.isnan(avg_score), derived, avg_score)
+            yield np.where(score_counts >= 2, covariance / variance, 0.0)
+
+            # Completion velocity: modules per week since the first activity
+            completed = np.fromiter((bool(h.get('completed', False)) for h in flat), dtype=bool, count=len(flat))
+            modules_completed = metric('modules_completed')
+            modules_completed = np.where(
+                np.isnan(modules_completed), np.bincount(ids, weights=completed, minlength=n), modules_completed
+            )
+            yield modules_completed
+            weeks_active = np.maximum((as_of - first) / SECONDS_PER_WEEK, 1.0)
+            yield np.where(has_times, modules_completed / weeks_active, 0.0)
+
+            # Session regularity: consistency of the gaps between activities
+            same_record = time_ids[1:] == time_ids[:-1]
+            gaps, gap_ids = np.diff(times)[same_record], time_ids[1:][same_record]
+            gap_counts = np.bincount(gap_ids, minlength=n)
+            gap_mean, gap_std = _segment_mean_std(gaps, gap_ids, gap_counts)
+            yield np.where((gap_counts >= 2) & (gap_mean > 0), 1 / (1 + gap_std / gap_mean), 0.5)
+
     def _analyze_difficulty_progression(self, responses: List[Dict]) -> float:
         """Analyze performance progression across difficulty levels"""
         try:
@@ -203,35 +670,15 @@ class DataPreprocessor:
 
     def _get_default_assessment_features(self) -> Dict[str, float]:
         """Return default features when extraction fails"""
-        return {
-            'accuracy': 0.5,
-            'avg_response_time': 30.0,
-            'time_consistency': 0.5,
-            'avg_confidence': 0.5,
-            'confidence_consistency': 0.5,
-            'difficulty_progression': 0.5,
-            'error_patterns': 0.3,
-            'help_requests': 0.2,
-            'review_patterns': 0.3
-        }
+        return ASSESSMENT_SCHEMA.default_features()
 
     def _get_default_learning_style_features(self) -> Dict[str, float]:
         """Return default features when extraction fails"""
-        return {
-            'video_watch_time': 0.25,
-            'text_read_time': 0.25,
-            'audio_listen_time': 0.25,
-            'interactive_time': 0.25,
-            'discussion_posts': 2,
-            'practice_sessions': 2,
-            'quiz_attempts': 3,
-            'help_requests': 1,
-            'avg_session_duration': 30.0,
-            'content_reviews': 2,
-            'bookmarks': 1,
-            'fast_interactions': 2,
-            'slow_interactions': 1
-        }
+        return LEARNING_STYLE_SCHEMA.default_features()
+
+    def _get_default_dropout_features(self) -> Dict[str, float]:
+        """Return default features when extraction fails"""
+        return DROPOUT_SCHEMA.default_features()
 
     def normalize_features(self, features: Dict[str, float], feature_type: str) -> np.ndarray:
         """
@@ -269,25 +716,18 @@ class DataPreprocessor:
         Returns:
             X, y: Feature matrix and targets
         """
-        X = []
-        y = []
-
         extract_method = {
-            'assessment': self.extract_assessment_features,
-            'learning_style': self.extract_learning_style_features
+            'assessment': self.extract_assessment_features_batch,
+            'learning_style': self.extract_learning_style_features_batch,
+            'dropout': self.extract_dropout_features_batch
         }.get(feature_type)
 
         if not extract_method:
             raise ValueError(f"Unknown feature type: {feature_type}")
 
-        for record in raw_data:
-            features = extract_method(record)
-            X.append(list(features.values()))
-
-            if target_col and target_col in record:
-                y.append(record[target_col])
+        X = extract_method(raw_data)
 
-        X = np.array(X)
+        y = [record[target_col] for record in raw_data if target_col and target_col in record]
         y = np.array(y) if y else None
 
         return X, y
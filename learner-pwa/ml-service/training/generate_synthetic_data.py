@@ -0,0 +1,123 @@
+"""
+Synthetic Data Generation Script
+Writes synthetic training data for load tests and benchmarks, in chunks across a process pool
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from models.assessment_classifier import AssessmentClassifier
+from models.learning_style_detector import LearningStyleDetector
+from models.dropout_predictor import DropoutPredictor
+from models.feature_schema import ASSESSMENT_SCHEMA, LEARNING_STYLE_SCHEMA, DROPOUT_SCHEMA
+from models.synthetic_data import chunk_seeds, SYNTHETIC_CHUNK_SIZE
+from training.score_cohort import ColumnarWriter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Generator and column schema of each model
+GENERATORS = {
+    'assessment': (AssessmentClassifier, ASSESSMENT_SCHEMA),
+    'learning_style': (LearningStyleDetector, LEARNING_STYLE_SCHEMA),
+    'dropout': (DropoutPredictor, DROPOUT_SCHEMA)
+}
+
+def generate_chunk(model_name, seed_sequence, n_samples):
+    """
+    Generate one chunk of samples in a worker process
+
+    Args:
+        model_name: Key of GENERATORS
+        seed_sequence: SeedSequence of the chunk
+        n_samples: Samples in the chunk
+
+    Returns:
+        Dictionary of output columns: the schema's features and 'label'
+    """
+    model_class, schema = GENERATORS[model_name]
+    X, y = model_class.synthesize(np.random.default_rng(seed_sequence), n_samples)
+
+    columns = {feature: X[:, i].astype(schema.dtype) for i, feature in enumerate(schema.features)}
+    columns['label'] = y
+    return columns
+
+def generate_synthetic_data(output_path, model_name, n_samples, seed=42, chunk_size=SYNTHETIC_CHUNK_SIZE, workers=None):
+    """
+    Generate synthetic samples and write them to a file
+
+    Chunks are generated across a process pool with at most two chunks per
+    worker in flight and written in chunk order as they complete. Every chunk
+    draws from its own stream spawned from the seed, so the output depends
+    only on the seed and chunk size, not on the number of workers, and it
+    matches the model's generate_synthetic_data for the same arguments.
+
+    Args:
+        output_path: Parquet (or CSV) output
+        model_name: Key of GENERATORS
+        n_samples: Total number of samples
+        seed: Root seed
+        chunk_size: Samples per chunk
+        workers: Worker processes (defaults to the CPU count)
+
+    Returns:
+        Number of rows written
+    """
+    workers = workers or os.cpu_count()
+    writer = ColumnarWriter(output_path)
+    pending = deque()
+    start = time.time()
+
+    def drain(limit):
+        while len(pending) > limit:
+            writer.write(pending.popleft().result())
+            elapsed = time.time() - start
+            logger.info(f"Generated {writer.rows}/{n_samples} rows ({writer.rows / elapsed:.0f} rows/sec)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for seed_sequence, size in chunk_seeds(n_samples, seed, chunk_size):
+                pending.append(pool.submit(generate_chunk, model_name, seed_sequence, size))
+                drain(2 * workers)
+            drain(0)
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    logger.info(f"Generated {writer.rows} {model_name} rows in {elapsed:.1f}s "
+                f"({writer.rows / elapsed if elapsed else 0:.0f} rows/sec) -> {output_path}")
+    return writer.rows
+
+def main():
+    """Main generation function"""
+    parser = argparse.ArgumentParser(description="Generate synthetic training data")
+    parser.add_argument('output', help="Output file (.parquet, or .csv)")
+    parser.add_argument('--model', choices=GENERATORS, default='assessment', help="Model to generate data for")
+    parser.add_argument('--samples', type=int, default=1000000, help="Number of samples")
+    parser.add_argument('--seed', type=int, default=42, help="Root seed")
+    parser.add_argument('--chunk-size', type=int, default=SYNTHETIC_CHUNK_SIZE, help="Samples per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to the CPU count)")
+    args = parser.parse_args()
+
+    try:
+        generate_synthetic_data(args.output, args.model, args.samples, args.seed, args.chunk_size, args.workers)
+        return 0
+    except Exception as e:
+        logger.error(f"Synthetic data generation failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
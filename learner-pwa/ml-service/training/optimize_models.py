@@ -0,0 +1,93 @@
+"""
+Model Optimization Script
+Exports fused forests with the feature scaler folded into their split thresholds
+"""
+
+import os
+import sys
+import shutil
+import logging
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.assessment_classifier import AssessmentClassifier
+from models.learning_style_detector import LearningStyleDetector
+from models.array_artifact import replace_arrays
+from models.compiled_forest import CompiledForest
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Largest tolerated probability difference between fused and original models
+TOLERANCE = 1e-9
+
+def export_fused_model(model, name, n_samples=2000):
+    """
+    Export the fused artifact for a model and check it against the original
+
+    The artifact is written next to fused_path and only moved into place once
+    it passes the check, so load() never serves a fused model that failed it.
+
+    Args:
+        model: AssessmentClassifier or LearningStyleDetector instance
+        name: Model name for logging
+        n_samples: Number of synthetic rows used for the parity check
+
+    Returns:
+        True if the fused model matches the original within tolerance
+    """
+    logger.info(f"Exporting fused {name}...")
+    staged_path = f"{model.fused_path}.staged-{os.getpid()}"
+
+    try:
+        model.load(prefer_fused=False)
+        if not model.is_trained:
+            logger.error(f"No trained {name} found, train it first")
+            return False
+
+        model.export_fused(staged_path)
+        fused = CompiledForest.load(staged_path, mmap=False)
+
+        # Parity check on raw features
+        X, _ = model.generate_synthetic_data(n_samples=n_samples)
+        expected = model.model.predict_proba(model.scaler.transform(X))
+        actual = fused.predict_proba(X)
+
+        max_diff = float(np.max(np.abs(actual - expected)))
+        agreement = float(np.mean(np.argmax(actual, axis=1) == np.argmax(expected, axis=1)))
+        logger.info(f"{name}: max probability difference {max_diff:.2e}, label agreement {agreement:.4f}")
+
+        if max_diff > TOLERANCE:
+            logger.warning(f"{name}: fused model differs from original beyond tolerance {TOLERANCE:.0e}")
+            return False
+
+        replace_arrays(staged_path, model.fused_path)
+        logger.info(f"Fused {name} saved to {model.fused_path}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to export fused {name}: {e}")
+        return False
+
+    finally:
+        shutil.rmtree(staged_path, ignore_errors=True)
+
+def main():
+    """Main optimization function"""
+    logger.info("Exporting fused models...")
+
+    results = [
+        export_fused_model(AssessmentClassifier(), "assessment classifier"),
+        export_fused_model(LearningStyleDetector(), "learning style detector")
+    ]
+
+    logger.info(f"Optimization completed: {sum(results)}/{len(results)} models exported")
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,200 @@
+"""
+Cohort Scoring Script
+Scores engagement/assessment records offline with the service's models, in chunks across a process pool
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from models.registry import model_registry
+from training.data_preprocessing import DataPreprocessor, read_frames, decode_nested
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODELS = ('dropout', 'assessment')
+
+COMPETENCY_LEVELS = ('beginner', 'intermediate', 'advanced', 'expert')
+
+preprocessor = DataPreprocessor()
+
+def read_records(path, chunk_size):
+    """
+    Read input records in chunks
+
+    Args:
+        path: CSV, Parquet or JSONL file
+        chunk_size: Records per chunk
+
+    Yields:
+        Lists of record dictionaries
+    """
+    for frame in read_frames(path, chunk_size):
+        yield frame.to_dict('records')
+
+def score_chunk(model_name, version, records):
+    """
+    Score one chunk of records in a worker process
+
+    Uses the service's model registry and DataPreprocessor, so features and
+    predictions match the API exactly.
+
+    Args:
+        model_name: 'dropout' or 'assessment'
+        version: Model version (None for DEFAULT_MODEL_VERSION)
+        records: List of record dictionaries
+
+    Returns:
+        Dictionary of output columns
+    """
+    user_ids = [str(r.get('user_id', '')) for r in records]
+
+    if model_name == 'dropout':
+        model = model_registry.get('dropout_predictor', version)
+        if not model.is_trained:
+            raise ValueError("Dropout predictor is not trained")
+
+        X = preprocessor.extract_features(model.feature_schema, [
+            {
+                'engagement_metrics': decode_nested(r.get('engagement_metrics')) or r,
+                'performance_history': decode_nested(r.get('performance_history'))
+            }
+            for r in records
+        ])
+        feature_names = np.array(model.feature_schema.features)
+        scores = model.score(X, top_k=1)
+
+        return {
+            'user_id': user_ids,
+            'dropout_risk': scores['risk'],
+            'risk_level': scores['risk_level'],
+            'top_factor': feature_names[scores['factor_indices'][:, 0]]
+        }
+
+    model = model_registry.get('assessment_classifier', version)
+    if not model.is_trained:
+        raise ValueError("Assessment classifier is not trained")
+
+    assessments = []
+    for r in records:
+        responses = decode_nested(r['responses'])
+        confidence = decode_nested(r.get('confidence'))
+        assessments.append({
+            'responses': responses,
+            'timings': decode_nested(r['timings']),
+            'confidence': confidence if confidence is not None else [0.5] * len(responses)
+        })
+
+    results = model.predict_with_confidence(preprocessor.extract_features(model.feature_schema, assessments))
+    columns = {
+        'user_id': user_ids,
+        'competency_level': np.array([r['competency_level'] for r in results], dtype=np.int8),
+        'confidence': np.array([r['confidence'] for r in results])
+    }
+    for level in COMPETENCY_LEVELS:
+        columns[f'p_{level}'] = np.array([r['probabilities'][level] for r in results])
+    return columns
+
+class ColumnarWriter:
+    """Appends scored chunks to a Parquet file (or CSV when the path ends in .csv)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = Path(path).suffix.lower() == '.csv'
+        self._writer = None
+        self.rows = 0
+
+    def write(self, columns):
+        """Append one chunk of output columns"""
+        if self.csv:
+            pd.DataFrame(columns).to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.table(columns)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        self.rows += len(next(iter(columns.values())))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def score_cohort(input_path, output_path, model_name, version=None, chunk_size=10000, workers=None):
+    """
+    Score every record of an input file and write the results
+
+    At most two chunks per worker are in flight, and results are written in
+    input order as they complete, so memory stays flat whatever the input size.
+
+    Args:
+        input_path: CSV, Parquet or JSONL input
+        output_path: Parquet (or CSV) output
+        model_name: 'dropout' or 'assessment'
+        version: Model version (None for DEFAULT_MODEL_VERSION)
+        chunk_size: Records per chunk
+        workers: Worker processes (defaults to MAX_WORKERS)
+
+    Returns:
+        Number of rows scored
+    """
+    workers = workers or int(os.getenv('MAX_WORKERS', 4))
+    writer = ColumnarWriter(output_path)
+    pending = deque()
+    start = time.time()
+
+    def drain(limit):
+        while len(pending) > limit:
+            writer.write(pending.popleft().result())
+            elapsed = time.time() - start
+            logger.info(f"Scored {writer.rows} rows ({writer.rows / elapsed:.0f} rows/sec)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for records in read_records(input_path, chunk_size):
+                pending.append(pool.submit(score_chunk, model_name, version, records))
+                drain(2 * workers)
+            drain(0)
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    logger.info(f"Scored {writer.rows} rows in {elapsed:.1f}s "
+                f"({writer.rows / elapsed if elapsed else 0:.0f} rows/sec) -> {output_path}")
+    return writer.rows
+
+def main():
+    """Main scoring function"""
+    parser = argparse.ArgumentParser(description="Score a cohort of learners offline")
+    parser.add_argument('input', help="Input records (.csv, .parquet or .jsonl)")
+    parser.add_argument('output', help="Output file (.parquet, or .csv)")
+    parser.add_argument('--model', choices=MODELS, default='dropout', help="Model to score with")
+    parser.add_argument('--model-version', default=None, help="Model version (defaults to DEFAULT_MODEL_VERSION)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Records per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to MAX_WORKERS)")
+    args = parser.parse_args()
+
+    try:
+        score_cohort(args.input, args.output, args.model, args.model_version, args.chunk_size, args.workers)
+        return 0
+    except Exception as e:
+        logger.error(f"Cohort scoring failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
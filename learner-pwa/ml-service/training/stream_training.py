@@ -0,0 +1,343 @@
+"""
+Streaming Training Script
+Trains models out of core from chunked datasets, with memory bounded by the chunk size
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.preprocessing import StandardScaler
+
+from models.assessment_classifier import AssessmentClassifier
+from models.learning_style_detector import LearningStyleDetector
+from models.dropout_predictor import DropoutPredictor
+from training.data_preprocessing import DataPreprocessor, read_frames, decode_nested
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODELS = ('assessment', 'learning_style', 'dropout')
+
+# Raw record fields that flat formats store as JSON strings
+NESTED_FIELDS = ('responses', 'timings', 'confidence', 'interactions', 'engagement_metrics', 'performance_history')
+
+preprocessor = DataPreprocessor()
+
+def read_labels(path, label, chunk_size):
+    """Distinct labels of a dataset, read without extracting features"""
+    labels = set()
+    for frame in read_frames(path, chunk_size, columns=[label]):
+        labels.update(frame[label].tolist())
+    return np.array(sorted(labels))
+
+def chunk_features(frame, schema, label):
+    """
+    Feature matrix and labels of one chunk
+
+    A chunk that has every schema feature as a column (such as the output of
+    generate_synthetic_data.py) is used as is; otherwise its rows are raw
+    records and features are extracted with the service's preprocessor.
+
+    Returns:
+        X, y: float64 features in schema order and labels
+    """
+    if all(feature in frame.columns for feature in schema.features):
+        X = frame[list(schema.features)].to_numpy(dtype=np.float64)
+    else:
+        records = frame.to_dict('records')
+        for record in records:
+            for field in NESTED_FIELDS:
+                if field in record:
+                    record[field] = decode_nested(record[field])
+        X = preprocessor.extract_features(schema, records).astype(np.float64)
+
+    return X, frame[label].to_numpy()
+
+class ChunkSpill:
+    """
+    Extracted training chunks spilled to a temporary directory
+
+    Features are extracted once while the scaler statistics are collected,
+    and the training passes read the chunks back from .npy files.
+    """
+
+    def __init__(self, directory=None):
+        self.path = tempfile.mkdtemp(prefix='stream-training-', dir=directory)
+        self.chunks = []
+        self.labels = []
+
+    def append(self, X, y):
+        index = len(self.chunks)
+        X_path = os.path.join(self.path, f'{index:06d}.X.npy')
+        y_path = os.path.join(self.path, f'{index:06d}.y.npy')
+        np.save(X_path, X)
+        np.save(y_path, y)
+        self.chunks.append((X_path, y_path))
+        self.labels.append(np.unique(y))
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def read(self, order=None):
+        """Yield the spilled (X, y) chunks, optionally in the given order"""
+        for index in (range(len(self.chunks)) if order is None else order):
+            X_path, y_path = self.chunks[index]
+            yield np.load(X_path), np.load(y_path, allow_pickle=True)
+
+    def read_group(self, indices):
+        """Read several spilled chunks as one (X, y)"""
+        parts = list(self.read(indices))
+        return np.concatenate([X for X, _ in parts]), np.concatenate([y for _, y in parts])
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def collect(path, schema, label, chunk_size, spill, validation_fraction=0.05, max_validation_rows=100000, seed=42):
+    """
+    First pass: extract, hold out validation rows and fit the scaler incrementally
+
+    Args:
+        path: Chunked dataset
+        schema: Feature schema of the model
+        label: Label column
+        chunk_size: Rows per chunk
+        spill: ChunkSpill receiving the training rows of every chunk
+        validation_fraction: Share of rows held out for validation
+        max_validation_rows: Cap on held-out rows kept in memory
+        seed: Seed of the validation split
+
+    Returns:
+        scaler, label_counts, X_val, y_val
+    """
+    rng = np.random.default_rng(seed)
+    scaler = StandardScaler()
+    label_counts = {}
+    X_val, y_val = [], []
+    n_val = 0
+
+    for frame in read_frames(path, chunk_size):
+        X, y = chunk_features(frame, schema, label)
+
+        held_out = rng.random(len(y)) < validation_fraction
+        held_out &= np.cumsum(held_out) <= max_validation_rows - n_val
+        if held_out.any():
+            X_val.append(X[held_out])
+            y_val.append(y[held_out])
+            n_val += int(held_out.sum())
+        X, y = X[~held_out], y[~held_out]
+
+        if len(y):
+            scaler.partial_fit(X)
+            for value, count in zip(*np.unique(y, return_counts=True)):
+                label_counts[value] = label_counts.get(value, 0) + int(count)
+            spill.append(X, y)
+
+        logger.info(f"Collected {sum(label_counts.values())} training and {n_val} validation rows")
+
+    if not label_counts:
+        raise ValueError(f"No training rows in {path}")
+
+    X_val = np.concatenate(X_val) if X_val else np.empty((0, schema.n_features))
+    y_val = np.concatenate(y_val) if y_val else np.empty(0)
+    return scaler, label_counts, X_val, y_val
+
+def group_chunks(chunk_labels, classes, max_groups):
+    """
+    Group consecutive chunks so that every group contains every class
+
+    Warm-started forests need every class in each fit, so a chunk missing
+    one is merged with the chunks after it, and a trailing incomplete run
+    joins the last group. Beyond max_groups (one per tree), consecutive
+    groups are merged further so that every chunk is still used.
+
+    Args:
+        chunk_labels: Labels present in each chunk
+        classes: Every label of the training data
+        max_groups: Largest number of groups
+
+    Returns:
+        Lists of chunk indices
+    """
+    groups = []
+    pending = []
+    seen = set()
+    for index, labels in enumerate(chunk_labels):
+        pending.append(index)
+        seen.update(labels.tolist())
+        if seen.issuperset(classes.tolist()):
+            groups.append(pending)
+            pending = []
+            seen = set()
+    if pending:
+        if groups:
+            groups[-1].extend(pending)
+        else:
+            groups.append(pending)
+
+    if len(groups) > max_groups:
+        bounds = np.linspace(0, len(groups), max_groups + 1).astype(int)
+        groups = [sum(groups[start:end], []) for start, end in zip(bounds[:-1], bounds[1:])]
+    return groups
+
+def train_streaming(input_path, model_name, label='label', chunk_size=100000, model_dir=None,
+                    n_estimators=100, epochs=5, validation_fraction=0.05, n_jobs=None, seed=42, spill_dir=None,
+                    resume=False, max_trees=None):
+    """
+    Train a model out of core from a chunked dataset
+
+    The scaler is fitted with partial_fit in a first pass that also extracts
+    and spills the training chunks. The dropout model is then trained with
+    SGD logistic regression over several epochs, and the forests grow an
+    equal share of their trees on every group of chunks (see group_chunks)
+    with warm start, weighting classes by their counts over the whole
+    dataset. Peak memory is one group plus the held-out validation rows;
+    groups are single chunks unless a chunk misses a class or there are
+    more chunks than trees.
+
+    With resume, the saved model is updated with the new data instead: the
+    forests keep their trees and scaler and grow n_estimators more, then
+    retire their oldest trees beyond max_trees, and the dropout model
+    continues with partial_fit. The cost is proportional to the new data.
+
+    Args:
+        input_path: CSV, Parquet or JSONL dataset of features or raw records
+        model_name: 'assessment', 'learning_style' or 'dropout'
+        label: Label column
+        chunk_size: Rows per chunk
+        model_dir: Directory to save the model to (defaults to models/saved)
+        n_estimators: Trees of a forest
+        epochs: Passes over the data for the dropout model
+        validation_fraction: Share of rows held out for validation
+        n_jobs: Cores used to build trees
+        seed: Random seed
+        spill_dir: Parent directory of the temporary chunk spill
+        resume: Update the model saved in model_dir instead of training a new one
+        max_trees: Trees a resumed forest keeps, oldest retired first (default: all)
+
+    Returns:
+        Validation metrics
+    """
+    model_dir = model_dir or str(Path(__file__).parent.parent / "models" / "saved")
+    if model_name == 'dropout':
+        model = DropoutPredictor(model_path=os.path.join(model_dir, 'dropout_predictor.pkl'))
+    elif model_name == 'assessment':
+        model = AssessmentClassifier(model_dir)
+    else:
+        model = LearningStyleDetector(model_dir)
+    if resume:
+        if model_name == 'dropout':
+            model.load(prefer_scorer=False)
+        else:
+            model.load(prefer_fused=False)
+        if not model.is_trained:
+            raise ValueError(f"No trained {model_name} model in {model_dir} to resume")
+        if model_name != 'dropout':
+            # New trees are fitted with every class of the saved forest
+            model.check_classes(read_labels(input_path, label, chunk_size), f"New data in {input_path}")
+    schema = model.feature_schema
+
+    start = time.time()
+    spill = ChunkSpill(spill_dir)
+    try:
+        scaler, label_counts, X_val, y_val = collect(
+            input_path, schema, label, chunk_size, spill, validation_fraction, seed=seed
+        )
+        n_train = sum(label_counts.values())
+        classes = np.array(sorted(label_counts))
+        logger.info(f"Training {model_name} on {n_train} rows in {len(spill)} chunks, labels {label_counts}")
+
+        # Balanced class weights from the global label counts; a resumed
+        # forest was checked above to have exactly these classes
+        class_weight = {c: n_train / (len(classes) * n) for c, n in label_counts.items()}
+
+        rng = np.random.default_rng(seed)
+        if model_name == 'dropout':
+            class_weight = {int(c): weight for c, weight in class_weight.items()}
+            if resume:
+                model.resume_online(random_state=seed)
+            else:
+                model.start_online(scaler, class_weight=class_weight, random_state=seed)
+            for epoch in range(epochs):
+                for X, y in spill.read(rng.permutation(len(spill))):
+                    order = rng.permutation(len(y))
+                    model.partial_fit(X[order], y[order].astype(int))
+                logger.info(f"Epoch {epoch + 1}/{epochs} done")
+            metrics = model.evaluate(X_val, y_val.astype(int)) if len(y_val) else {}
+        else:
+            if resume:
+                model.resume_streaming(class_weight=class_weight, random_state=seed, n_jobs=n_jobs)
+                model.check_classes(classes, f"Training rows of {input_path} (after holding out validation rows)")
+            else:
+                model.start_streaming(scaler, classes, class_weight=class_weight, random_state=seed, n_jobs=n_jobs)
+
+            # Spread the trees over the groups, every group getting at least one
+            chunk_labels = [model.encode_labels(labels) for labels in spill.labels]
+            groups = group_chunks(chunk_labels, model.classes, n_estimators)
+            trees = np.full(len(groups), n_estimators // len(groups))
+            trees[:n_estimators % len(groups)] += 1
+            logger.info(f"Growing {n_estimators} trees on {len(groups)} groups of chunks")
+            for indices, n_trees in zip(groups, trees):
+                model.grow(*spill.read_group(indices), int(n_trees))
+            if max_trees:
+                logger.info(f"Retired the {model.retire_trees(max_trees)} oldest trees")
+            model.finish_streaming()
+            metrics = {}
+            if len(y_val):
+                predicted = (model.predict(X_val) if model_name == 'assessment'
+                             else [r['learning_style'] for r in model.predict_style(X_val)])
+                metrics = {'val_accuracy': accuracy_score(y_val, predicted), 'val_samples': len(y_val)}
+
+        model.save()
+    finally:
+        spill.close()
+
+    metrics['train_samples'] = n_train
+    metrics['seconds'] = time.time() - start
+    logger.info(f"Streamed {model_name} training finished in {metrics['seconds']:.1f}s: {metrics}")
+    return metrics
+
+def main():
+    """Main streaming training function"""
+    parser = argparse.ArgumentParser(description="Train a model out of core from a chunked dataset")
+    parser.add_argument('input', help="Training data (.csv, .parquet or .jsonl) of feature columns or raw records")
+    parser.add_argument('--model', choices=MODELS, required=True, help="Model to train")
+    parser.add_argument('--label', default='label', help="Label column")
+    parser.add_argument('--chunk-size', type=int, default=100000, help="Rows per chunk")
+    parser.add_argument('--model-dir', default=None, help="Directory to save the model to (defaults to models/saved)")
+    parser.add_argument('--n-estimators', type=int, default=100, help="Trees of a forest (trees to add with --resume)")
+    parser.add_argument('--epochs', type=int, default=5, help="Passes over the data for the dropout model")
+    parser.add_argument('--validation-fraction', type=float, default=0.05, help="Share of rows held out for validation")
+    parser.add_argument('--n-jobs', type=int, default=None, help="Cores used to build trees")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    parser.add_argument('--spill-dir', default=None, help="Parent directory of the temporary chunk spill")
+    parser.add_argument('--resume', action='store_true', help="Update the saved model with the new data instead of training a new one")
+    parser.add_argument('--max-trees', type=int, default=None, help="Trees a resumed forest keeps, oldest retired first")
+    args = parser.parse_args()
+
+    try:
+        metrics = train_streaming(
+            args.input, args.model, args.label, args.chunk_size, args.model_dir, args.n_estimators,
+            args.epochs, args.validation_fraction, args.n_jobs, args.seed, args.spill_dir, args.resume, args.max_trees
+        )
+        print(json.dumps(metrics, default=float))
+        return 0
+    except Exception as e:
+        logger.error(f"Streaming training failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -5,22 +5,39 @@ Trains and saves ML models for the adaptive learning platform
 
 import os
 import sys
+import time
+import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 
 from models.assessment_classifier import AssessmentClassifier
 from models.learning_style_detector import LearningStyleDetector
+from models.dropout_predictor import DropoutPredictor
+from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
 import numpy as np
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def train_assessment_model():
-    """Train and save the assessment classifier model"""
+def train_assessment_model(n_samples=2000, n_jobs=None):
+    """
+    Train and save the assessment classifier model
+
+    Args:
+        n_samples: Synthetic training samples
+        n_jobs: Cores used to build the forest
+    """
     logger.info("Training Assessment Classifier...")
 
     try:
@@ -29,10 +46,10 @@ def train_assessment_model():
 
         # Generate synthetic training data
         logger.info("Generating synthetic training data...")
-        X, y = model.generate_synthetic_data(n_samples=2000)
+        X, y = model.generate_synthetic_data(n_samples=n_samples)
 
         # Train model
-        accuracy = model.train(X, y, test_size=0.2, random_state=42)
+        accuracy = model.train(X, y, test_size=0.2, random_state=42, n_jobs=n_jobs)
         logger.info(f"Assessment model trained with accuracy: {accuracy:.3f}")
         # Save model
         model.save()
@@ -44,8 +61,14 @@ def train_assessment_model():
         logger.error(f"Failed to train assessment model: {e}")
         return False
 
-def train_learning_style_model():
-    """Train and save the learning style detector model"""
+def train_learning_style_model(n_samples=2000, n_jobs=None):
+    """
+    Train and save the learning style detector model
+
+    Args:
+        n_samples: Synthetic training samples
+        n_jobs: Cores used to build the forest
+    """
     logger.info("Training Learning Style Detector...")
 
     try:
@@ -54,10 +77,10 @@ def train_learning_style_model():
 
         # Generate synthetic training data
         logger.info("Generating synthetic training data...")
-        X, y = model.generate_synthetic_data(n_samples=2000)
+        X, y = model.generate_synthetic_data(n_samples=n_samples)
 
         # Train model
-        accuracy = model.train(X, y, test_size=0.2, random_state=42)
+        accuracy = model.train(X, y, test_size=0.2, random_state=42, n_jobs=n_jobs)
         logger.info(f"Learning style model trained with accuracy: {accuracy:.3f}")
         # Save model
         model.save()
@@ -69,24 +92,165 @@ def train_learning_style_model():
         logger.error(f"Failed to train learning style model: {e}")
         return False
 
+def train_dropout_model(n_samples=2000):
+    """
+    Train and save the dropout predictor model
+
+    Args:
+        n_samples: Synthetic training samples
+    """
+    logger.info("Training Dropout Predictor...")
+
+    try:
+        # Initialize model
+        model = DropoutPredictor(
+            model_path=str(Path(__file__).parent.parent / "models" / "saved" / "dropout_predictor.pkl")
+        )
+
+        # Generate synthetic training data
+        logger.info("Generating synthetic training data...")
+        X, y = model.generate_synthetic_data(n_samples=n_samples)
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+
+        # Train model
+        metrics = model.train(X_train, y_train, X_val, y_val)
+        logger.info(f"Dropout model trained with validation AUC: {metrics['val_auc']:.3f}")
+        # Save model
+        model.save()
+        logger.info("Dropout model saved successfully")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to train dropout model: {e}")
+        return False
+
+# Training jobs: function and whether its estimator builds on several cores
+TRAINING_JOBS = {
+    'assessment': (train_assessment_model, True),
+    'learning_style': (train_learning_style_model, True),
+    'dropout': (train_dropout_model, False)
+}
+
+def split_cpu_budget(jobs, cpus):
+    """
+    Split a CPU budget between concurrent training jobs
+
+    Single-core jobs get one core each and the jobs that build in parallel
+    share the rest evenly, with at least one core per job.
+
+    Returns:
+        Dictionary of cores per job
+    """
+    parallel = [job for job in jobs if TRAINING_JOBS[job][1]]
+    shares = {job: 1 for job in jobs}
+    if parallel:
+        spare = max(cpus - (len(jobs) - len(parallel)), len(parallel))
+        for i, job in enumerate(parallel):
+            shares[job] = spare // len(parallel) + (i < spare % len(parallel))
+    return shares
+
+def _peak_memory_mb():
+    """Peak resident memory of this process in MB (None where unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_job(name, cores, n_samples):
+    """
+    Run one training job in a worker process
+
+    BLAS and OpenMP thread pools are limited to the job's cores, so
+    concurrent jobs stay within the CPU budget.
+
+    Args:
+        name: Key of TRAINING_JOBS
+        cores: Cores given to the job
+        n_samples: Synthetic training samples
+
+    Returns:
+        Dictionary with the job's success, wall-clock seconds and peak memory
+    """
+    train, parallel = TRAINING_JOBS[name]
+    start = time.time()
+    with threadpool_limits(limits=cores):
+        success = train(n_samples=n_samples, n_jobs=cores) if parallel else train(n_samples=n_samples)
+
+    return {
+        'job': name,
+        'success': success,
+        'cores': cores,
+        'seconds': time.time() - start,
+        'peak_memory_mb': _peak_memory_mb()
+    }
+
+def train_models(jobs=None, cpus=None, n_samples=2000):
+    """
+    Train models concurrently, one worker process per job
+
+    Every job gets a single-worker pool of its own, so its peak memory is
+    the job's own. A full retrain takes about as long as the slowest job.
+
+    Args:
+        jobs: Keys of TRAINING_JOBS (defaults to all)
+        cpus: CPU budget shared by the jobs (defaults to the CPU count)
+        n_samples: Synthetic training samples per model
+
+    Returns:
+        List of job results (see run_job)
+    """
+    jobs = list(jobs or TRAINING_JOBS)
+    cpus = cpus or os.cpu_count()
+    shares = split_cpu_budget(jobs, cpus)
+    logger.info(f"Training {', '.join(f'{job} ({shares[job]} cores)' for job in jobs)} within a budget of {cpus} cores")
+
+    start = time.time()
+    results = []
+    pools = [ProcessPoolExecutor(max_workers=1) for _ in jobs]
+    try:
+        futures = {pool.submit(run_job, job, shares[job], n_samples): job for pool, job in zip(pools, jobs)}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Training job {job} failed: {e}")
+                result = {'job': job, 'success': False, 'cores': shares[job], 'seconds': None, 'peak_memory_mb': None}
+            results.append(result)
+
+            if result['seconds'] is not None:
+                memory = f"{result['peak_memory_mb']:.0f} MB" if result['peak_memory_mb'] is not None else "n/a"
+                logger.info(f"{job}: {'ok' if result['success'] else 'failed'} in {result['seconds']:.1f}s "
+                            f"on {result['cores']} cores, peak memory {memory}")
+    finally:
+        for pool in pools:
+            pool.shutdown()
+
+    elapsed = time.time() - start
+    job_seconds = sum(r['seconds'] for r in results if r['seconds'] is not None)
+    logger.info(f"Trained {len(jobs)} models in {elapsed:.1f}s wall-clock ({job_seconds:.1f}s of job time)")
+    return results
+
 def main():
     """Main training function"""
+    parser = argparse.ArgumentParser(description="Train the service's models concurrently")
+    parser.add_argument('--jobs', nargs='+', choices=TRAINING_JOBS, default=None, help="Models to train (defaults to all)")
+    parser.add_argument('--cpus', type=int, default=None, help="CPU budget shared by the jobs (defaults to the CPU count)")
+    parser.add_argument('--samples', type=int, default=2000, help="Synthetic training samples per model")
+    args = parser.parse_args()
+
     logger.info("Starting ML model training...")
 
     # Create models directory if it doesn't exist
     models_dir = Path(__file__).parent.parent / "models" / "saved"
     models_dir.mkdir(parents=True, exist_ok=True)
 
-    success_count = 0
-    total_models = 2
-
-    # Train assessment classifier
-    if train_assessment_model():
-        success_count += 1
-
-    # Train learning style detector
-    if train_learning_style_model():
-        success_count += 1
+    results = train_models(args.jobs, args.cpus, args.samples)
+    success_count = sum(1 for r in results if r['success'])
+    total_models = len(results)
 
     logger.info(f"Training completed: {success_count}/{total_models} models trained successfully")
 
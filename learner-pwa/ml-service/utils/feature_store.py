@@ -0,0 +1,347 @@
+"""
+Feature Store
+Per-learner running aggregates that are updated per event and read in constant time
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+import logging
+import numpy as np
+from models.array_artifact import save_arrays, load_arrays
+from models.feature_schema import ASSESSMENT_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+# Response difficulties are rounded and clipped to 1..DIFFICULTY_LEVELS
+DIFFICULTY_LEVELS = 5
+
+ERROR_TYPES = ('conceptual', 'calculation', 'attention')
+
+COLUMNS = (
+    # Response counters
+    'responses', 'correct', 'help_requests', 'reviews', 'incorrect',
+    *(f'{error_type}_errors' for error_type in ERROR_TYPES),
+    # Welford count, mean and sum of squared deviations
+    'timing_count', 'timing_mean', 'timing_m2',
+    'confidence_count', 'confidence_mean', 'confidence_m2',
+    # Exponentially decayed counters, as of last_event
+    'decayed_responses', 'decayed_correct', 'last_event',
+    # Per-difficulty counters
+    *(f'level_{level}_responses' for level in range(1, DIFFICULTY_LEVELS + 1)),
+    *(f'level_{level}_correct' for level in range(1, DIFFICULTY_LEVELS + 1))
+)
+
+COLUMN = {name: i for i, name in enumerate(COLUMNS)}
+
+def _merge_moments(row, prefix, values):
+    """
+    Fold a batch of values into a row's running count, mean and M2
+
+    Uses the pairwise update of Chan et al., which reduces to Welford's
+    algorithm for a single value.
+    """
+    if len(values) == 0:
+        return
+
+    count, mean, m2 = (COLUMN[f'{prefix}_{name}'] for name in ('count', 'mean', 'm2'))
+    n_a, mean_a = row[count], row[mean]
+    n_b, mean_b = len(values), float(np.mean(values))
+    m2_b = float(np.sum((values - mean_b) ** 2))
+
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    row[count] = n
+    row[mean] = mean_a + delta * n_b / n
+    row[m2] += m2_b + delta * delta * n_a * n_b / n
+
+class FeatureStore:
+    """
+    In-memory store of running aggregates per learner
+
+    Every learner owns one row of a float64 matrix that grows by doubling.
+    New responses update counters, Welford moments and exponentially
+    decayed counters in place, so reading a learner's current features
+    costs the same whatever the length of their history. The store is
+    snapshotted to disk periodically and reloaded on startup.
+    """
+
+    def __init__(self, path=None, half_life_days=None, capacity=1024):
+        self.path = os.getenv('FEATURE_STORE_PATH', './data/feature_store') if path is None else path
+        self.half_life = (
+            float(os.getenv('FEATURE_DECAY_HALF_LIFE_DAYS', 14)) if half_life_days is None else half_life_days
+        ) * 86400.0
+        self._data = np.zeros((capacity, len(COLUMNS)))
+        self._rows = {}
+        self._user_ids = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._extractors = {}
+
+        # Metrics
+        self.updates = 0
+        self.snapshots = 0
+
+    def __len__(self):
+        return len(self._user_ids)
+
+    def _row(self, user_id):
+        """Row of a learner, allocated on first use (caller holds the lock)"""
+        row = self._rows.get(user_id)
+        if row is None:
+            row = len(self._user_ids)
+            if row == len(self._data):
+                self._data = np.concatenate([self._data, np.zeros_like(self._data)])
+            self._rows[user_id] = row
+            self._user_ids.append(user_id)
+        return row
+
+    def update(self, user_id, assessment_data, timestamp=None):
+        """
+        Fold new assessment responses into a learner's aggregates
+
+        Args:
+            user_id: Learner ID
+            assessment_data: Dictionary containing responses, timings, confidence
+            timestamp: Event time in epoch seconds (defaults to now)
+        """
+        responses = assessment_data.get('responses') or []
+        timings = np.asarray(assessment_data.get('timings') or [], dtype=np.float64)
+        confidence = np.asarray(assessment_data.get('confidence') or [], dtype=np.float64)
+        timestamp = time.time() if timestamp is None else float(timestamp)
+
+        correct = [bool(r.get('correct', False)) for r in responses]
+        levels = [
+            min(max(int(round(float(r.get('difficulty', 1)))), 1), DIFFICULTY_LEVELS)
+            for r in responses
+        ]
+
+        with self._lock:
+            index = self._row(user_id)
+            row = self._data[index]
+
+            row[COLUMN['responses']] += len(responses)
+            row[COLUMN['correct']] += sum(correct)
+            row[COLUMN['incorrect']] += len(responses) - sum(correct)
+            for r, is_correct, level in zip(responses, correct, levels):
+                row[COLUMN['help_requests']] += bool(r.get('help_requested', False))
+                row[COLUMN['reviews']] += bool(r.get('reviewed', False))
+                row[COLUMN[f'level_{level}_responses']] += 1
+                row[COLUMN[f'level_{level}_correct']] += is_correct
+                if not is_correct and r.get('error_type') in ERROR_TYPES:
+                    row[COLUMN[f"{r['error_type']}_errors"]] += 1
+
+            _merge_moments(row, 'timing', timings)
+            _merge_moments(row, 'confidence', confidence)
+
+            # Decay the counters to this event, then add it
+            decay = self._decay(timestamp - row[COLUMN['last_event']]) if row[COLUMN['last_event']] else 1.0
+            row[COLUMN['decayed_responses']] = row[COLUMN['decayed_responses']] * decay + len(responses)
+            row[COLUMN['decayed_correct']] = row[COLUMN['decayed_correct']] * decay + sum(correct)
+            row[COLUMN['last_event']] = max(row[COLUMN['last_event']], timestamp)
+
+            self.updates += 1
+            self._dirty = True
+
+    def _decay(self, elapsed):
+        """Decay factor of a counter after elapsed seconds"""
+        return 0.5 ** (max(elapsed, 0.0) / self.half_life)
+
+    def rows(self, user_ids):
+        """Copy the aggregate rows of learners (zeros for unknown learners)"""
+        with self._lock:
+            indices = [self._rows.get(user_id, -1) for user_id in user_ids]
+            rows = self._data[np.maximum(indices, 0)] if indices else np.zeros((0, len(COLUMNS)))
+        rows[np.asarray(indices) < 0] = 0.0
+        return rows
+
+    def features(self, user_ids, schema=ASSESSMENT_SCHEMA, out=None):
+        """
+        Current features of learners, laid out by a model's schema
+
+        Args:
+            user_ids: Learner IDs
+            schema: Feature schema of the model that will score the features
+            out: Optional preallocated buffer (len(user_ids), schema.n_features)
+
+        Returns:
+            Feature matrix; learners without responses get the schema defaults
+        """
+        if schema.name != ASSESSMENT_SCHEMA.name:
+            raise ValueError(f"The feature store holds no aggregates for {schema.name} features")
+
+        extractor = self._extractors.get(schema)
+        if extractor is None:
+            extractor = self._extractors[schema] = schema.compile(ASSESSMENT_SCHEMA.features, self._assessment_columns)
+        return extractor(self.rows(user_ids), out)
+
+    def _assessment_columns(self, rows):
+        """Yield assessment feature columns in ASSESSMENT_SCHEMA order from aggregate rows"""
+        defaults = ASSESSMENT_SCHEMA.default_features()
+        column = lambda name: rows[:, COLUMN[name]]
+
+        responses = column('responses')
+        has_responses = responses > 0
+
+        def feature(name, values, condition=None, fallback=None):
+            if condition is not None:
+                values = np.where(condition, values, fallback)
+            return np.where(has_responses, values, defaults[name])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            yield feature('accuracy', column('correct') / responses)
+
+            timing_count, timing_mean = column('timing_count'), column('timing_mean')
+            timing_std = np.sqrt(column('timing_m2') / timing_count)
+            yield feature('avg_response_time', timing_mean, timing_count > 0, 30.0)
+            yield feature('time_consistency', 1 / (1 + timing_std / timing_mean), timing_count > 0, 0.5)
+
+            confidence_count = column('confidence_count')
+            confidence_std = np.sqrt(column('confidence_m2') / confidence_count)
+            yield feature('avg_confidence', column('confidence_mean'), confidence_count > 0, 0.5)
+            yield feature('confidence_consistency', 1 - confidence_std, confidence_count > 0, 0.5)
+
+            # Accuracy per difficulty level, weighted by the levels answered
+            levels = np.arange(1, DIFFICULTY_LEVELS + 1, dtype=np.float64)
+            level_responses = rows[:, COLUMN['level_1_responses']:COLUMN['level_1_responses'] + DIFFICULTY_LEVELS]
+            level_correct = rows[:, COLUMN['level_1_correct']:COLUMN['level_1_correct'] + DIFFICULTY_LEVELS]
+            answered = level_responses > 0
+            level_accuracy = np.where(answered, level_correct / level_responses, 0.0)
+            total_weight = (answered * levels).sum(axis=1)
+            progression = (level_accuracy * levels).sum(axis=1) / total_weight
+            yield feature('difficulty_progression', progression, total_weight > 0, 0.5)
+
+            incorrect = column('incorrect')
+            severity = (
+                column('conceptual_errors') * 0.8 + column('calculation_errors') * 0.5
+                + column('attention_errors') * 0.2
+            ) / incorrect
+            yield feature('error_patterns', severity, incorrect > 0, 0.0)
+
+            yield feature('help_requests', column('help_requests') / responses)
+            yield feature('review_patterns', column('reviews') / responses)
+
+    def get_aggregates(self, user_id, now=None):
+        """
+        Running aggregates of one learner
+
+        Args:
+            user_id: Learner ID
+            now: Reference time for the decayed counters (defaults to now)
+
+        Returns:
+            Dictionary of counters and decayed rates, or None for unknown learners
+        """
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                return None
+            row = self._data[row].copy()
+
+        now = time.time() if now is None else now
+        decay = self._decay(now - row[COLUMN['last_event']])
+        decayed_responses = row[COLUMN['decayed_responses']]
+
+        return {
+            'responses': int(row[COLUMN['responses']]),
+            'correct': int(row[COLUMN['correct']]),
+            'recent_accuracy': float(row[COLUMN['decayed_correct']] / decayed_responses) if decayed_responses else None,
+            'responses_per_day': float(decayed_responses * decay * math.log(2) / (self.half_life / 86400.0)),
+            'last_event': float(row[COLUMN['last_event']])
+        }
+
+    def snapshot(self, path=None):
+        """
+        Write the store to disk if it changed since the last snapshot
+
+        Returns:
+            True if a snapshot was written
+        """
+        path = path or self.path
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = self._data[:len(self._user_ids)].copy()
+            user_ids = np.array(self._user_ids, dtype=str)
+            self._dirty = False
+
+        try:
+            save_arrays(path, {'data': data, 'user_ids': user_ids}, {
+                'columns': list(COLUMNS),
+                'half_life_days': self.half_life / 86400.0,
+                'saved_at': time.time()
+            })
+        except Exception:
+            self._dirty = True
+            raise
+
+        self.snapshots += 1
+        logger.info(f"Feature store snapshot of {len(user_ids)} learners saved to {path}")
+        return True
+
+    def load(self, path=None):
+        """
+        Replace the store's contents with a snapshot
+
+        Returns:
+            True if a snapshot was loaded
+        """
+        path = path or self.path
+        if not os.path.exists(path):
+            return False
+
+        arrays, meta = load_arrays(path, mmap=False)
+        if meta['columns'] != list(COLUMNS):
+            logger.warning(f"Ignoring feature store snapshot at {path} with different columns")
+            return False
+
+        data = arrays['data']
+        user_ids = arrays['user_ids'].tolist()
+        with self._lock:
+            self._data = np.zeros((max(len(data) * 2, 1024), len(COLUMNS)))
+            self._data[:len(data)] = data
+            self._user_ids = user_ids
+            self._rows = {user_id: i for i, user_id in enumerate(user_ids)}
+            self._dirty = False
+
+        logger.info(f"Feature store loaded with {len(user_ids)} learners from {path}")
+        return True
+
+    async def run(self, interval):
+        """
+        Snapshot the store every interval seconds
+
+        Args:
+            interval: Snapshot interval in seconds
+        """
+        logger.info(f"Snapshotting feature store every {interval}s to {self.path}")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.snapshot)
+            except Exception as e:
+                logger.error(f"Error snapshotting feature store: {e}")
+
+    def get_stats(self):
+        """Get occupancy and update counters"""
+        return {
+            'learners': len(self._user_ids),
+            'capacity': len(self._data),
+            'memory_bytes': self._data.nbytes,
+            'updates': self.updates,
+            'snapshots': self.snapshots,
+            'path': self.path
+        }
+
+    def clear(self):
+        """Drop all aggregates"""
+        with self._lock:
+            self._data[:] = 0.0
+            self._rows.clear()
+            self._user_ids.clear()
+            self._dirty = False
+
+# Shared store used by all API routers
+feature_store = FeatureStore()
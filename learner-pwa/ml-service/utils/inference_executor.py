@@ -0,0 +1,159 @@
+"""
+Inference Executor
+Runs CPU-bound feature extraction and model inference off the event loop
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODES = ('thread', 'process')
+
+def _timed_call(fn, args, kwargs):
+    """Run fn in a worker and report when it started and finished"""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+class InferenceExecutor:
+    """
+    Thread or process pool that all model calls go through
+
+    Thread mode shares the in-process models; NumPy and scikit-learn release
+    the GIL for most of their work. Process mode sidesteps the GIL entirely:
+    callables must then be module-level functions, and each worker imports
+    their module and holds its own copy of the models.
+    """
+
+    def __init__(self, mode=None, max_workers=None, sample_size=1000):
+        self.mode = (mode or os.getenv('INFERENCE_EXECUTOR', 'thread')).lower()
+        if self.mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode: {self.mode}")
+
+        self.max_workers = max_workers or int(os.getenv('MAX_WORKERS', 4))
+        self._pool = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self.max_wait = 0.0
+        self._recent_waits = deque(maxlen=sample_size)
+
+    def _get_pool(self):
+        """Create the worker pool on first use"""
+        with self._lock:
+            if self._pool is None:
+                if self.mode == 'process':
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='inference'
+                    )
+                logger.info(f"Started {self.mode} inference pool with {self.max_workers} workers")
+            return self._pool
+
+    @property
+    def queue_depth(self):
+        """Number of submitted calls still waiting for a free worker"""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run a callable in the pool and await its result
+
+        Args:
+            fn: Callable to execute (module-level in process mode)
+            *args, **kwargs: Arguments passed to fn
+
+        Returns:
+            The return value of fn
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            started, finished, result = await loop.run_in_executor(
+                self._get_pool(), _timed_call, fn, args, kwargs
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        wait = max(0.0, started - submitted)
+        self.completed += 1
+        self.total_wait += wait
+        self.total_run += finished - started
+        self.max_wait = max(self.max_wait, wait)
+        self._recent_waits.append(wait)
+
+        return result
+
+    def get_stats(self):
+        """Get queue depth and wait-time metrics for sizing the pool"""
+        recent = sorted(self._recent_waits)
+
+        def percentile(p):
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000.0
+
+        return {
+            'mode': self.mode,
+            'max_workers': self.max_workers,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait_ms': self.total_wait / self.completed * 1000.0 if self.completed else 0.0,
+            'p50_wait_ms': percentile(0.50),
+            'p95_wait_ms': percentile(0.95),
+            'max_wait_ms': self.max_wait * 1000.0,
+            'avg_run_ms': self.total_run / self.completed * 1000.0 if self.completed else 0.0
+        }
+
+    def recycle(self):
+        """
+        Replace process workers so they load freshly swapped models
+
+        Calls already submitted finish on the old workers; the next call
+        starts a new pool. Thread workers share the in-process models and
+        need no recycling.
+        """
+        if self.mode != 'process':
+            return
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+                logger.info("Recycled process inference pool")
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+# Shared executor used by all API routers
+inference_executor = InferenceExecutor()
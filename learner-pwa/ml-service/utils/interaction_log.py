@@ -0,0 +1,622 @@
+"""
+Interaction Log
+Append-only binary segments of learner interaction events, with per-learner running aggregates
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+import logging
+import numpy as np
+from models.array_artifact import save_arrays, load_arrays
+from models.feature_schema import LEARNING_STYLE_SCHEMA, DROPOUT_SCHEMA
+from training.data_preprocessing import INTERACTION_TYPES, SECONDS_PER_DAY, SECONDS_PER_WEEK
+
+logger = logging.getLogger(__name__)
+
+# Content types whose durations make up the learning style time shares
+CONTENT_TYPES = ('video', 'text', 'audio', 'interactive')
+
+# Event type codes are indices into this tuple and are stored on disk, so
+# new types may only be appended
+EVENT_TYPES = (*CONTENT_TYPES, *INTERACTION_TYPES, 'completion')
+
+EVENT_CODE = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+# On-disk event record: 25 bytes, little-endian, no padding
+EVENT_DTYPE = np.dtype([
+    ('user', '<u8'),        # Learner key (see user_key)
+    ('timestamp', '<f8'),   # Epoch seconds
+    ('duration', '<f4'),    # Seconds (0 when not reported)
+    ('score', '<f4'),       # nan when the event is not scored
+    ('type', 'u1')          # Index into EVENT_TYPES
+])
+
+COLUMNS = (
+    # Time spent per content type and events per type
+    *(f'{content_type}_time' for content_type in CONTENT_TYPES),
+    *(f'{event_type}_events' for event_type in EVENT_TYPES),
+    # Interaction pacing
+    'session_time', 'fast_interactions', 'slow_interactions',
+    'first_event', 'last_event',
+    # Least-squares sums of score against attempt number
+    'score_count', 'score_sum', 'score_x', 'score_xx', 'score_xy',
+    # Welford count, mean and sum of squared deviations of the gaps between events
+    'gap_count', 'gap_mean', 'gap_m2'
+)
+
+COLUMN = {name: i for i, name in enumerate(COLUMNS)}
+
+TIME_COLUMNS = slice(COLUMN['video_time'], COLUMN['video_time'] + len(CONTENT_TYPES))
+EVENT_COLUMNS = slice(COLUMN['video_events'], COLUMN['video_events'] + len(EVENT_TYPES))
+
+SEGMENT_NAME = re.compile(r'^(\d{10})-(\d{10})\.events$')
+
+def user_key(user_id):
+    """64-bit key of a learner ID as stored in event records"""
+    return int.from_bytes(hashlib.blake2b(str(user_id).encode(), digest_size=8).digest(), 'little')
+
+def _segment_name(first, last):
+    return f"{first:010d}-{last:010d}.events"
+
+class InteractionLog:
+    """
+    Append-only log of interaction events with per-learner aggregates
+
+    Event batches are appended as fixed-size binary records to the active
+    segment file, which is closed and replaced by a new one once it reaches
+    segment_bytes. Every batch is also folded into a float64 matrix of
+    running aggregates (one row per learner), so learning style and dropout
+    features are read without replaying history.
+
+    Compaction merges closed segments into one segment sorted by learner and
+    time, in size tiers: starting from the newest segment, older ones join
+    while they are no larger than the newer ones together. Every segment
+    then outgrows all newer ones combined, so the number of segments grows
+    logarithmically with the log and each event is rewritten a logarithmic
+    number of times.
+
+    The aggregates are snapshotted to <path>/aggregates together with the
+    last segment they include, and only segments a snapshot covers are
+    compacted. On startup the snapshot is restored and only the segments
+    written after it are replayed; without a usable snapshot the aggregates
+    are rebuilt from all segments.
+
+    Batches are folded in arrival order. When a batch holds events older
+    than a learner's latest folded event, its counters, content time, scores
+    and activity span are still exact, but the gaps and the score trend do
+    not reorder earlier events; a replay of compacted segments, which are in
+    time order, folds them as if they had arrived in order.
+
+    A segment named <first>-<last>.events holds the events of segments first
+    through last. A compaction commits by renaming its output into place, so
+    segments left behind by an interrupted compaction are covered by the
+    output and removed on the next load.
+    """
+
+    def __init__(self, path=None, segment_bytes=None, capacity=1024):
+        self.path = os.getenv('EVENT_LOG_PATH', './data/events') if path is None else path
+        self.segment_bytes = (
+            int(os.getenv('EVENT_SEGMENT_BYTES', 8 * 1024 * 1024)) if segment_bytes is None else segment_bytes
+        )
+        self._data = np.zeros((capacity, len(COLUMNS)))
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._active = None
+        self._active_seq = None
+        self._next_seq = 0
+        self._through = -1
+        self._dirty = False
+        self._extractors = {}
+
+        # Metrics
+        self.events = 0
+        self.batches = 0
+        self.compactions = 0
+        self.snapshots = 0
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.path, 'aggregates')
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, user_id):
+        return user_key(user_id) in self._rows
+
+    def _row(self, key):
+        """Row of a learner key, allocated on first use (caller holds the lock)"""
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._data):
+                self._data = np.concatenate([self._data, np.zeros_like(self._data)])
+            self._rows[key] = row
+        return row
+
+    def to_records(self, events):
+        """
+        Convert event dictionaries to on-disk records
+
+        Args:
+            events: Dictionaries with user_id, type and optional timestamp
+                (epoch seconds, defaults to now), duration and score
+
+        Returns:
+            Structured array of EVENT_DTYPE
+        """
+        now = time.time()
+        records = np.empty(len(events), dtype=EVENT_DTYPE)
+        records['user'] = [user_key(e['user_id']) for e in events]
+        records['type'] = [EVENT_CODE[e['type']] for e in events]
+        records['timestamp'] = [now if e.get('timestamp') is None else e['timestamp'] for e in events]
+        records['duration'] = [e.get('duration') or 0.0 for e in events]
+        records['score'] = [np.nan if e.get('score') is None else e['score'] for e in events]
+        return records
+
+    def append(self, events):
+        """
+        Append a batch of events to the log and fold it into the aggregates
+
+        Args:
+            events: Event dictionaries (see to_records) or an EVENT_DTYPE array
+
+        Returns:
+            Number of events appended
+        """
+        records = events if isinstance(events, np.ndarray) else self.to_records(events)
+        if len(records) == 0:
+            return 0
+
+        with self._lock:
+            if self._active is None:
+                os.makedirs(self.path, exist_ok=True)
+                self._active_seq = self._next_seq
+                self._next_seq += 1
+                self._active = open(os.path.join(self.path, _segment_name(self._active_seq, self._active_seq)), 'ab')
+            self._active.write(records.tobytes())
+            self._active.flush()
+            if self._active.tell() >= self.segment_bytes:
+                self._roll()
+
+            self._fold(records)
+            self.events += len(records)
+            self.batches += 1
+            self._dirty = True
+
+        return len(records)
+
+    def _roll(self):
+        """Close the active segment; the next append opens a new one (caller holds the lock)"""
+        if self._active is not None:
+            self._segments[(self._active_seq, self._active_seq)] = self._active.tell()
+            self._active.close()
+            self._active = None
+            self._active_seq = None
+
+    def _fold(self, records):
+        """
+        Fold a batch of events into the learners' aggregates (caller holds the lock)
+
+        Events are grouped by learner and ordered by time, and every aggregate
+        is updated for all learners of the batch at once.
+        """
+        records = records[np.lexsort((records['timestamp'], records['user']))]
+        keys, starts, inverse = np.unique(records['user'], return_index=True, return_inverse=True)
+        rows = np.fromiter((self._row(int(key)) for key in keys), dtype=np.intp, count=len(keys))
+        n = len(keys)
+
+        timestamps = records['timestamp']
+        durations = records['duration'].astype(np.float64)
+        scores = records['score'].astype(np.float64)
+        types = records['type'].astype(np.intp)
+
+        old = self._data[rows]
+        new = old.copy()
+        has_old = old[:, EVENT_COLUMNS].sum(axis=1) > 0
+
+        # Counters
+        n_types = len(EVENT_TYPES)
+        new[:, EVENT_COLUMNS] += np.bincount(inverse * n_types + types, minlength=n * n_types).reshape(n, n_types)
+        is_content = types < len(CONTENT_TYPES)
+        new[:, TIME_COLUMNS] += np.bincount(
+            inverse[is_content] * len(CONTENT_TYPES) + types[is_content],
+            weights=durations[is_content], minlength=n * len(CONTENT_TYPES)
+        ).reshape(n, len(CONTENT_TYPES))
+
+        is_session = types == EVENT_CODE['session']
+        is_interaction = (types >= len(CONTENT_TYPES)) & (types < len(CONTENT_TYPES) + len(INTERACTION_TYPES))
+        new[:, COLUMN['session_time']] += np.bincount(inverse[is_session], weights=durations[is_session], minlength=n)
+        new[:, COLUMN['fast_interactions']] += np.bincount(inverse[is_interaction & (durations < 10)], minlength=n)
+        new[:, COLUMN['slow_interactions']] += np.bincount(inverse[is_interaction & (durations > 60)], minlength=n)
+
+        # Activity span
+        ends = np.append(starts[1:], len(records)) - 1
+        first, last = timestamps[starts], timestamps[ends]
+        new[:, COLUMN['first_event']] = np.where(has_old, np.minimum(old[:, COLUMN['first_event']], first), first)
+        new[:, COLUMN['last_event']] = np.where(has_old, np.maximum(old[:, COLUMN['last_event']], last), last)
+
+        # Scores, numbered by attempt after the learner's earlier scores
+        is_scored = ~np.isnan(scores)
+        scored = inverse[is_scored]
+        y = scores[is_scored]
+        score_counts = np.bincount(scored, minlength=n)
+        attempt = np.arange(len(y)) - np.repeat(np.cumsum(score_counts) - score_counts, score_counts)
+        x = old[scored, COLUMN['score_count']] + attempt
+        for name, weights in (('score_sum', y), ('score_x', x), ('score_xx', x * x), ('score_xy', x * y)):
+            new[:, COLUMN[name]] += np.bincount(scored, weights=weights, minlength=n)
+        new[:, COLUMN['score_count']] += score_counts
+
+        # Gaps between consecutive events, including the gap from the
+        # learner's previous batch when this one comes after it
+        same = inverse[1:] == inverse[:-1]
+        carried = has_old & (first >= old[:, COLUMN['last_event']])
+        gap_ids = np.concatenate([inverse[1:][same], np.flatnonzero(carried)])
+        gaps = np.concatenate([np.diff(timestamps)[same], (first - old[:, COLUMN['last_event']])[carried]])
+
+        n_b = np.bincount(gap_ids, minlength=n).astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_b = np.bincount(gap_ids, weights=gaps, minlength=n) / n_b
+            m2_b = np.bincount(gap_ids, weights=(gaps - mean_b[gap_ids]) ** 2, minlength=n)
+
+            # Pairwise merge of Chan et al. with the running moments
+            n_a, mean_a = old[:, COLUMN['gap_count']], old[:, COLUMN['gap_mean']]
+            total = n_a + n_b
+            delta = mean_b - mean_a
+            merged = n_b > 0
+            new[:, COLUMN['gap_count']] = total
+            new[:, COLUMN['gap_mean']] = np.where(merged, mean_a + delta * n_b / total, mean_a)
+            new[:, COLUMN['gap_m2']] += np.where(merged, m2_b + delta * delta * n_a * n_b / total, 0.0)
+
+        self._data[rows] = new
+
+    def rows(self, user_ids):
+        """Copy the aggregate rows of learners (zeros for unknown learners)"""
+        keys = [user_key(user_id) for user_id in user_ids]
+        with self._lock:
+            indices = [self._rows.get(key, -1) for key in keys]
+            rows = self._data[np.maximum(indices, 0)] if indices else np.zeros((0, len(COLUMNS)))
+        rows[np.asarray(indices) < 0] = 0.0
+        return rows
+
+    def features(self, user_ids, schema, out=None):
+        """
+        Current features of learners from their logged interactions
+
+        Args:
+            user_ids: Learner IDs
+            schema: Learning style or dropout schema of the model that will score the features
+            out: Optional preallocated buffer (len(user_ids), schema.n_features)
+
+        Returns:
+            Feature matrix; learners without events get the schema defaults
+        """
+        extractor = self._extractors.get(schema)
+        if extractor is None:
+            if schema.name == LEARNING_STYLE_SCHEMA.name:
+                extractor = schema.compile(LEARNING_STYLE_SCHEMA.features, self._learning_style_columns)
+            elif schema.name == DROPOUT_SCHEMA.name:
+                extractor = schema.compile(DROPOUT_SCHEMA.features, self._dropout_columns)
+            else:
+                raise ValueError(f"The interaction log holds no aggregates for {schema.name} features")
+            self._extractors[schema] = extractor
+        return extractor(self.rows(user_ids), out)
+
+    def _learning_style_columns(self, rows):
+        """Yield learning style feature columns in LEARNING_STYLE_SCHEMA order from aggregate rows"""
+        defaults = LEARNING_STYLE_SCHEMA.default_features()
+        has_events = rows[:, EVENT_COLUMNS].sum(axis=1) > 0
+        column = lambda name: rows[:, COLUMN[name]]
+
+        def feature(name, values):
+            return np.where(has_events, values, defaults[name])
+
+        # Shares of the time spent on each content type
+        times = rows[:, TIME_COLUMNS]
+        total = times.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.where(total > 0, times / total, times)
+            avg_session = np.where(
+                column('session_events') > 0, column('session_time') / column('session_events'), 30.0
+            )
+
+        for i, name in enumerate(('video_watch_time', 'text_read_time', 'audio_listen_time', 'interactive_time')):
+            yield feature(name, shares[:, i])
+        yield feature('discussion_posts', column('discussion_events'))
+        yield feature('practice_sessions', column('practice_events'))
+        yield feature('quiz_attempts', column('quiz_events'))
+        yield feature('help_requests', column('help_events'))
+        yield feature('avg_session_duration', avg_session)
+        yield feature('content_reviews', column('review_events'))
+        yield feature('bookmarks', column('bookmark_events'))
+        yield feature('fast_interactions', column('fast_interactions'))
+        yield feature('slow_interactions', column('slow_interactions'))
+
+    def _dropout_columns(self, rows):
+        """Yield dropout feature columns in DROPOUT_SCHEMA order from aggregate rows, as of now"""
+        defaults = DROPOUT_SCHEMA.default_features()
+        has_events = rows[:, EVENT_COLUMNS].sum(axis=1) > 0
+        column = lambda name: rows[:, COLUMN[name]]
+        now = time.time()
+
+        def feature(name, values):
+            return np.where(has_events, values, defaults[name])
+
+        n, sum_y = column('score_count'), column('score_sum')
+        sum_x, sum_xx, sum_xy = column('score_x'), column('score_xx'), column('score_xy')
+        gap_count, gap_mean = column('gap_count'), column('gap_mean')
+        completed = column('completion_events')
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trend = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+            gap_std = np.sqrt(column('gap_m2') / gap_count)
+            regularity = 1 / (1 + gap_std / gap_mean)
+
+            yield feature('days_since_last_active', (now - column('last_event')) / SECONDS_PER_DAY)
+            yield feature('avg_score', np.where(n > 0, sum_y / n, 50.0))
+            yield feature('score_trend', np.where(n >= 2, trend, 0.0))
+            yield feature('modules_completed', completed)
+            yield feature('completion_velocity',
+                          completed / np.maximum((now - column('first_event')) / SECONDS_PER_WEEK, 1.0))
+            yield feature('session_regularity', np.where((gap_count >= 2) & (gap_mean > 0), regularity, 0.5))
+
+    def get_aggregates(self, user_id):
+        """
+        Event counters of one learner
+
+        Returns:
+            Dictionary of event counts, content time and activity span, or None for unknown learners
+        """
+        row = self.rows([user_id])[0]
+        counts = row[EVENT_COLUMNS]
+        if not counts.any():
+            return None
+
+        return {
+            'events': int(counts.sum()),
+            'event_counts': {name: int(c) for name, c in zip(EVENT_TYPES, counts) if c},
+            'content_time': {name: float(t) for name, t in zip(CONTENT_TYPES, row[TIME_COLUMNS])},
+            'first_event': float(row[COLUMN['first_event']]),
+            'last_event': float(row[COLUMN['last_event']])
+        }
+
+    def load(self):
+        """
+        Restore the aggregates from the snapshot and the segments written after it
+
+        Finishes interrupted compactions first. New events go to a new
+        segment after the existing ones.
+
+        Returns:
+            Number of events replayed from segments
+        """
+        if not os.path.isdir(self.path):
+            return 0
+
+        segments = []
+        for name in os.listdir(self.path):
+            match = SEGMENT_NAME.match(name)
+            if match:
+                segments.append((int(match.group(1)), int(match.group(2))))
+            elif name.endswith('.tmp'):
+                os.remove(os.path.join(self.path, name))
+
+        # Drop segments already merged into a compacted one
+        covered = [
+            (first, last) for first, last in segments
+            if any(f <= first and last <= l and (f, l) != (first, last) for f, l in segments)
+        ]
+        for first, last in covered:
+            os.remove(os.path.join(self.path, _segment_name(first, last)))
+        segments = sorted(set(segments) - set(covered))
+        snapshot = self._read_snapshot(segments)
+        through = -1 if snapshot is None else snapshot[2]['through']
+        tail = [(first, last) for first, last in segments if first > through]
+
+        replayed = 0
+        with self._lock:
+            self._roll()
+            if snapshot is None:
+                self._data[:] = 0.0
+                self._rows.clear()
+            else:
+                data, keys, _ = snapshot
+                self._data = np.zeros((max(len(data) * 2, len(self._data)), len(COLUMNS)))
+                self._data[:len(data)] = data
+                self._rows = {int(key): row for row, key in enumerate(keys)}
+            for first, last in tail:
+                records = self._read(first, last)
+                if len(records):
+                    self._fold(records)
+                replayed += len(records)
+            self._segments = {
+                segment: os.path.getsize(os.path.join(self.path, _segment_name(*segment))) for segment in segments
+            }
+            self._next_seq = max([through, *(last for _, last in segments)]) + 1
+            self._through = through
+            self._dirty = bool(tail)
+            self.events = replayed + (0 if snapshot is None else snapshot[2]['events'])
+
+        logger.info(f"Interaction log replayed {replayed} events from {len(tail)} of {len(segments)} segments "
+                    f"in {self.path} ({len(self._rows)} learners)")
+        return replayed
+
+    def _read_snapshot(self, segments):
+        """Aggregates snapshot as (data, keys, meta), or None if it is missing or unusable"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+
+        try:
+            arrays, meta = load_arrays(self.snapshot_path, mmap=False)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable interaction log snapshot at {self.snapshot_path}: {e}")
+            return None
+        if meta['columns'] != list(COLUMNS):
+            logger.warning(f"Ignoring interaction log snapshot at {self.snapshot_path} with different columns")
+            return None
+
+        # A segment spanning the boundary cannot be replayed in part
+        through = meta['through']
+        if any(first <= through < last for first, last in segments):
+            logger.warning(f"Ignoring interaction log snapshot at {self.snapshot_path}: "
+                           f"a segment spans its boundary")
+            return None
+        return arrays['data'], arrays['keys'], meta
+
+    def _read(self, first, last):
+        """Read the records of a segment, ignoring a partially written last record"""
+        path = os.path.join(self.path, _segment_name(first, last))
+        count = os.path.getsize(path) // EVENT_DTYPE.itemsize
+        return np.fromfile(path, dtype=EVENT_DTYPE, count=count)
+
+    def compact(self):
+        """
+        Merge the segments covered by the snapshot in tiers
+
+        A merged segment is sorted by learner and time, written to a
+        temporary file and renamed into place before its inputs are removed.
+
+        Returns:
+            True if segments were merged
+        """
+        merged = False
+        while True:
+            with self._lock:
+                inputs = self._tier(sorted(segment for segment in self._segments if segment[1] <= self._through))
+            if len(inputs) < 2:
+                return merged
+            self._merge(inputs)
+            merged = True
+
+    def _tier(self, segments):
+        """
+        Newest run of consecutive segments to merge (caller holds the lock)
+
+        Going back from a segment, older segments join the run while they are
+        no larger than the run so far; a larger one starts the next run.
+        """
+        tier, size = [], 0
+        for segment in reversed(segments):
+            if tier and self._segments[segment] > size:
+                if len(tier) >= 2:
+                    break
+                tier, size = [], 0
+            tier.append(segment)
+            size += self._segments[segment]
+        return tier[::-1]
+
+    def _merge(self, inputs):
+        """Merge consecutive segments into one sorted by learner and time"""
+        start = time.time()
+        records = np.concatenate([self._read(first, last) for first, last in inputs])
+        records = records[np.lexsort((records['timestamp'], records['user']))]
+
+        first, last = inputs[0][0], inputs[-1][1]
+        path = os.path.join(self.path, _segment_name(first, last))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            for segment in inputs:
+                del self._segments[segment]
+            self._segments[(first, last)] = records.nbytes
+        for segment in inputs:
+            os.remove(os.path.join(self.path, _segment_name(*segment)))
+
+        self.compactions += 1
+        logger.info(f"Compacted {len(inputs)} interaction log segments ({len(records)} events) "
+                    f"in {time.time() - start:.2f}s")
+
+    def snapshot(self):
+        """
+        Save the aggregates if events were appended since the last snapshot
+
+        The active segment is closed first, so the snapshot covers exactly
+        the segments up to the last one opened.
+
+        Returns:
+            True if a snapshot was written
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._roll()
+            through = self._next_seq - 1
+            keys = np.fromiter(self._rows, dtype=np.uint64, count=len(self._rows))
+            data = self._data[:len(keys)].copy()
+            events = self.events
+            self._through = through
+            self._dirty = False
+
+        try:
+            save_arrays(self.snapshot_path, {'data': data, 'keys': keys}, {
+                'columns': list(COLUMNS),
+                'through': through,
+                'events': events,
+                'saved_at': time.time()
+            })
+        except Exception:
+            self._dirty = True
+            raise
+
+        self.snapshots += 1
+        logger.info(f"Interaction log snapshot of {len(keys)} learners through segment {through} "
+                    f"saved to {self.snapshot_path}")
+        return True
+
+    async def run(self, interval):
+        """
+        Snapshot the aggregates and compact the log every interval seconds
+
+        Args:
+            interval: Compaction interval in seconds
+        """
+        logger.info(f"Compacting interaction log every {interval}s in {self.path}")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.snapshot)
+                await asyncio.to_thread(self.compact)
+            except Exception as e:
+                logger.error(f"Error snapshotting or compacting interaction log: {e}")
+
+    def close(self):
+        """Close the active segment"""
+        with self._lock:
+            self._roll()
+
+    def get_stats(self):
+        """Get event counters and segment sizes"""
+        with self._lock:
+            segments = len(self._segments) + (self._active is not None)
+            segment_bytes = sum(self._segments.values()) + (self._active.tell() if self._active is not None else 0)
+
+        return {
+            'learners': len(self._rows),
+            'events': self.events,
+            'batches': self.batches,
+            'segments': segments,
+            'segment_bytes': segment_bytes,
+            'compactions': self.compactions,
+            'snapshots': self.snapshots,
+            'snapshot_through': self._through,
+            'path': self.path
+        }
+
+    def clear(self):
+        """Drop all aggregates (segments on disk are kept)"""
+        with self._lock:
+            self._data[:] = 0.0
+            self._rows.clear()
+
+# Shared log used by all API routers
+interaction_log = InteractionLog()
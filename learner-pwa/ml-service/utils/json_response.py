@@ -0,0 +1,131 @@
+"""
+JSON Responses
+Fast JSON rendering for trusted internal results, with pre-serialized fragments
+"""
+
+import json
+import logging
+import numpy as np
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+class JSONFragment:
+    """
+    Immutable, already-serialized JSON value
+
+    Build fragments once (for example at import time) from values that only
+    depend on a small discrete key; render_json() copies their bytes into
+    the response body as-is.
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, value):
+        object.__setattr__(self, 'data', render_json(value))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("JSONFragment is immutable")
+
+    def __repr__(self):
+        return f"JSONFragment({self.data.decode()})"
+
+def _default(value):
+    """Encode values the JSON encoders do not handle natively"""
+    if isinstance(value, JSONFragment) and orjson is not None:
+        return orjson.Fragment(value.data)
+    if hasattr(value, 'model_dump'):
+        return value.model_dump()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _render_stdlib(value):
+    """Serialize with the json module, splicing fragments in by hand"""
+    if isinstance(value, JSONFragment):
+        return value.data
+    if isinstance(value, dict):
+        return b'{' + b','.join(
+            _render_stdlib(str(key)) + b':' + _render_stdlib(item) for key, item in value.items()
+        ) + b'}'
+    if isinstance(value, (list, tuple)):
+        return b'[' + b','.join(_render_stdlib(item) for item in value) + b']'
+    if hasattr(value, 'model_dump'):
+        return _render_stdlib(value.model_dump())
+    return json.dumps(value, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def render_json(value):
+    """
+    Serialize a value to compact JSON bytes
+
+    Uses orjson when it is installed and the json module otherwise. Values
+    may contain JSONFragment instances, pydantic models and NumPy arrays or
+    scalars at any depth.
+
+    Args:
+        value: Value to serialize
+
+    Returns:
+        UTF-8 encoded JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return _render_stdlib(value)
+
+class FastJSONResponse(Response):
+    """JSON response rendered with render_json()"""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return render_json(content)
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    NDJSON streaming response whose body generator reads the request body
+
+    StreamingResponse watches for client disconnects by reading receive()
+    while it streams, which would swallow request body messages that the
+    generator still needs. Here the generator owns receive(); a disconnect
+    surfaces to it as ClientDisconnect when it reads the next body chunk.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def ml_response(data, method, confidence=None, success=True, error=None):
+    """
+    Build an MLResponse-shaped response from trusted internal results
+
+    Skips constructing and re-validating MLResponse: the body is rendered
+    directly, so data must already be JSON-compatible (fragments, NumPy
+    values and pydantic models are accepted).
+
+    Args:
+        data: Response payload
+        method: ML method used
+        confidence: Prediction confidence
+        success: Whether the request succeeded
+        error: Error message, if any
+
+    Returns:
+        FastJSONResponse
+    """
+    return FastJSONResponse({
+        'success': success,
+        'data': data,
+        'error': error,
+        'method': method,
+        'confidence': confidence
+    })
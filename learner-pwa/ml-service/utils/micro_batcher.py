@@ -0,0 +1,103 @@
+"""
+Micro-Batching Scheduler
+Coalesces concurrent single-row predictions into one vectorized model call
+"""
+
+import asyncio
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv('PREDICTION_BATCH_SIZE', 32))
+DEFAULT_MAX_WAIT_MS = float(os.getenv('PREDICTION_BATCH_WAIT_MS', 2))
+
+class MicroBatcher:
+    """
+    Gathers feature rows submitted within a short window and scores them together
+
+    Rows are flushed when max_batch_size rows are pending or max_wait_ms has
+    elapsed since the first pending row, whichever comes first. The predict
+    function is a coroutine function that receives a 2D matrix and must return
+    one result per row, in order.
+    """
+
+    def __init__(self, predict_fn, name='model', max_batch_size=None, max_wait_ms=None):
+        self.predict_fn = predict_fn
+        self.name = name
+        self.max_batch_size = max_batch_size or DEFAULT_MAX_BATCH_SIZE
+        self.max_wait = (DEFAULT_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, row, *args):
+        """
+        Queue a single feature row and wait for its prediction
+
+        Args:
+            row: 1D feature vector (or a 1-row matrix)
+            *args: Extra hashable arguments for predict_fn; only rows with
+                identical arguments are batched together
+
+        Returns:
+            The prediction for this row
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending.setdefault(args, [])
+        pending.append((np.asarray(row, dtype=float).reshape(-1), future))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(args)
+        elif args not in self._timers:
+            self._timers[args] = loop.call_later(self.max_wait, self._flush, args)
+
+        return await future
+
+    def _flush(self, args):
+        """Hand all rows pending for the given arguments to a scoring task"""
+        timer = self._timers.pop(args, None)
+        if timer is not None:
+            timer.cancel()
+
+        items = self._pending.pop(args, [])
+        if not items:
+            return
+
+        task = asyncio.ensure_future(self._run_batch(items, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, items, args):
+        """Score a batch of rows and resolve their futures"""
+        X = np.vstack([row for row, _ in items])
+        try:
+            results = await self.predict_fn(X, *args)
+        except Exception as e:
+            logger.error(f"Batched prediction failed for {self.name}: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(items)
+
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self):
+        """Get batching statistics"""
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'avg_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0
+        }
@@ -0,0 +1,204 @@
+"""
+Online Learning
+Micro-batched partial_fit updates of the live dropout predictor from labeled outcomes
+"""
+
+import asyncio
+import copy
+import os
+import threading
+import logging
+import numpy as np
+from models.registry import model_registry, MODEL_FACTORIES
+from utils.inference_executor import inference_executor
+
+logger = logging.getLogger(__name__)
+
+class OnlineDropoutLearner:
+    """
+    Keeps the dropout predictor current with observed outcomes
+
+    Outcomes are buffered per model version. Once batch_size of them are
+    pending, the version's online copy of the predictor (loaded from its
+    pickle and continued with DropoutPredictor.resume_online) is updated
+    with partial_fit, and a shallow copy of it is swapped into the registry:
+    predictions use the new weights right away and cached ones are dropped.
+    Updated models are checkpointed to their artifact directory by flush().
+    In process executor mode, where workers load models from disk, the swap
+    waits for the checkpoint, so the worker pool is recycled at most once
+    per checkpoint instead of after every micro-batch.
+
+    Outcomes are only accepted once the model is loaded and their features
+    match its schema, and they stay pending until an update succeeds.
+
+    A reload from artifacts the learner did not write, such as a batch
+    retrain, discards the online copy; later outcomes update the new model.
+    """
+
+    def __init__(self, registry=None, batch_size=None):
+        self.registry = model_registry if registry is None else registry
+        self.batch_size = int(os.getenv('DROPOUT_ONLINE_BATCH_SIZE', 256)) if batch_size is None else batch_size
+        self._models = {}
+        self._pending = {}
+        self._checkpointed = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+        # Metrics
+        self.outcomes = 0
+        self.updates = 0
+        self.checkpoints = 0
+
+    def add(self, X, y, version=None):
+        """
+        Buffer labeled outcomes and apply them once a micro-batch is full
+
+        Args:
+            X: Feature matrix in the dropout predictor's schema
+            y: Labels (0=retained, 1=dropped out)
+            version: Model version (defaults to DEFAULT_MODEL_VERSION)
+
+        Returns:
+            Number of outcomes still pending for the version
+
+        Raises:
+            ValueError: If the model cannot be updated online or the features
+                do not match its schema; no outcomes are accepted then
+        """
+        version = self.registry.resolve_version(version)
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=int)
+
+        with self._lock:
+            model = self._model(version)
+            model.feature_schema.check(X.shape[1], 'dropout outcome features for dropout_predictor')
+
+            self._pending.setdefault(version, []).append((X, y))
+            self.outcomes += len(y)
+            if self._pending_count(version) >= self.batch_size:
+                try:
+                    self._update(version)
+                except Exception as e:
+                    logger.error(f"Error updating dropout_predictor {version}, keeping outcomes pending: {e}")
+            return self._pending_count(version)
+
+    def _pending_count(self, version):
+        return sum(len(y) for _, y in self._pending.get(version, []))
+
+    def _model(self, version):
+        """Online copy of a version's predictor, loaded on first use (caller holds the lock)"""
+        model = self._models.get(version)
+        if model is None:
+            model = MODEL_FACTORIES['dropout_predictor'](self.registry.model_dir(version))
+            model.load(prefer_scorer=False)
+            model.resume_online()
+            self._models[version] = model
+            self._checkpointed[version] = self._mtime(model)
+            logger.info(f"Started online updates of dropout_predictor {version}")
+        return model
+
+    @staticmethod
+    def _mtime(model):
+        try:
+            return os.path.getmtime(model.model_path)
+        except OSError:
+            return None
+
+    def _update(self, version):
+        """Apply a version's pending outcomes and swap in the result (caller holds the lock)"""
+        model = self._model(version)
+        pending = self._pending[version]
+        X = np.concatenate([X for X, _ in pending])
+        y = np.concatenate([y for _, y in pending])
+
+        # Outcomes are dropped only once they are learned
+        model.partial_fit(X, y)
+        self._pending[version] = []
+        self.updates += 1
+        self._dirty.add(version)
+        logger.info(f"Updated dropout_predictor {version} with {len(y)} outcomes")
+
+        if inference_executor.mode != 'process':
+            self._swap(version)
+
+    def _swap(self, version):
+        """Serve a snapshot of a version's online model (caller holds the lock)"""
+        self.registry.swap('dropout_predictor', version, copy.copy(self._models[version]))
+
+    def _checkpoint(self, version):
+        """Save a version's online model (caller holds the lock)"""
+        model = self._models[version]
+        model.save()
+        self._checkpointed[version] = self._mtime(model)
+        self._dirty.discard(version)
+        self.checkpoints += 1
+
+        # Process workers reload from disk when the swap recycles the pool
+        if inference_executor.mode == 'process':
+            self._swap(version)
+
+    def flush(self):
+        """
+        Apply all pending outcomes and checkpoint updated models
+
+        Returns:
+            Versions checkpointed
+        """
+        with self._lock:
+            for version in [version for version in self._pending if self._pending_count(version)]:
+                try:
+                    self._update(version)
+                except Exception as e:
+                    logger.error(f"Error updating dropout_predictor {version}: {e}")
+
+            saved = []
+            for version in list(self._dirty):
+                try:
+                    self._checkpoint(version)
+                    saved.append(version)
+                except Exception as e:
+                    logger.error(f"Error checkpointing dropout_predictor {version}: {e}")
+            return saved
+
+    def model_reloaded(self, name, version):
+        """Reload listener: discard an online copy superseded by new artifacts"""
+        if name != 'dropout_predictor':
+            return
+
+        with self._lock:
+            model = self._models.get(version)
+            if model is not None and self._mtime(model) != self._checkpointed.get(version):
+                del self._models[version]
+                self._dirty.discard(version)
+                logger.info(f"dropout_predictor {version} was replaced on disk, restarting online updates from it")
+
+    async def run(self, interval):
+        """
+        Apply pending outcomes and checkpoint every interval seconds
+
+        Args:
+            interval: Checkpoint interval in seconds
+        """
+        logger.info(f"Checkpointing online dropout updates every {interval}s")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Error flushing online dropout updates: {e}")
+
+    def get_stats(self):
+        """Get outcome, update and checkpoint counters"""
+        with self._lock:
+            return {
+                'batch_size': self.batch_size,
+                'outcomes': self.outcomes,
+                'updates': self.updates,
+                'checkpoints': self.checkpoints,
+                'pending': {version: self._pending_count(version) for version in self._pending},
+                'online_versions': sorted(self._models),
+                'unsaved_versions': sorted(self._dirty)
+            }
+
+# Shared learner used by all API routers
+online_dropout_learner = OnlineDropoutLearner()
@@ -0,0 +1,140 @@
+"""
+Prediction Cache
+In-process LRU + TTL cache of model outputs keyed by feature vector
+"""
+
+import hashlib
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class PredictionCache:
+    """
+    Cache of predictions keyed by model, version, generation and features
+
+    Entries expire ttl seconds after they were stored, and the least
+    recently used entry is evicted beyond max_size. The model generation is
+    part of the key and swapped models are invalidated explicitly, so a hot
+    reload never serves predictions from the previous copy. Cached results
+    are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = int(os.getenv('PREDICTION_CACHE_SIZE', 10000)) if max_size is None else max_size
+        self.ttl = float(os.getenv('PREDICTION_CACHE_TTL', 300)) if ttl is None else ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    @staticmethod
+    def key(name, version, generation, row, *args):
+        """
+        Build the cache key for a feature row
+
+        Args:
+            name: Model name
+            version: Model version
+            generation: Registry generation of the model
+            row: Feature vector
+            *args: Extra hashable arguments that affect the prediction
+
+        Returns:
+            Hashable cache key
+        """
+        digest = hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(), digest_size=16)
+        if args:
+            digest.update(repr(args).encode())
+        return (name, version, generation, digest.digest())
+
+    def get(self, key):
+        """Get a cached prediction, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store a prediction, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return the cached prediction for key, computing it on a miss
+
+        Args:
+            key: Key built with key()
+            compute: Zero-argument callable returning an awaitable prediction
+
+        Returns:
+            The prediction
+        """
+        if not self.enabled:
+            return await compute()
+
+        value = self.get(key)
+        if value is None:
+            value = await compute()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, name=None, version=None):
+        """Drop cached predictions of a model version (all entries by default)"""
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if (name is None or key[0] == name) and (version is None or key[1] == version)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached predictions for {name or 'all models'}")
+
+    def get_stats(self):
+        """Get hit/miss counters and occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+    def clear(self):
+        """Drop all cached predictions"""
+        with self._lock:
+            self._entries.clear()
+
+# Shared cache used by all API routers
+prediction_cache = PredictionCache()